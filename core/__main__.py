@@ -135,13 +135,6 @@ except:
     logger.error('Preparing ZMQ failed, probably no IPython possible!')
 
 
-# Disable standard garbage collector and run it from the event loop to
-# improve stability.
-# (see garbage_collector in the doc for more information)
-from .garbage_collector import GarbageCollector
-gc = GarbageCollector(interval=1.0, debug=False)
-
-
 # define a watchdog for our application
 from .parentpoller import ParentPollerWindows, ParentPollerUnix
 
@@ -1,7 +1,11 @@
+import collections
 import gc
+import threading
+import time
 
 from qtpy.QtCore import QObject
 from qtpy.QtCore import QTimer
+from qtpy.QtCore import Signal
 from qtpy.QtCore import Slot
 import logging
 logger = logging.getLogger('gc')
@@ -15,10 +19,21 @@ class GarbageCollector(QObject):
     This is done to ensure that garbage collection only happens in the GUI
     thread, as otherwise Qt can crash.
 
+    The pause of every collection is measured. Generation 2 collections,
+    which traverse all tracked objects, are only run right away if their
+    expected pause fits into the pause budget. Otherwise they are deferred
+    to an idle window, i.e. no module is locked by a running measurement,
+    or until they have been deferred for max_deferral seconds.
+
     Parameters
     ==========
     @param interval float: timeout interval in seconds. Default: 1s
     @param debug bool: debug output. Default: False
+    @param pause_budget float: maximum pause of a generation 2 collection
+                               outside of idle windows in seconds. Default: 20ms
+    @param max_deferral float: maximum time a generation 2 collection is
+                               deferred in seconds. Default: 60s
+    @param is_idle callable: returns True in idle windows. Default: always idle
 
     Version history:
     - Original:
@@ -28,24 +43,129 @@ class GarbageCollector(QObject):
     - Modified: qudi
     '''
 
-    def __init__(self, interval=1.0, debug=False):
+    sigStatisticsUpdated = Signal()
+
+    def __init__(self, interval=1.0, debug=False, pause_budget=0.02, max_deferral=60.,
+                 is_idle=None):
         """
         Initializes garbage collector
 
         @param interval float: timeout interval in seconds. Default: 1s
         @param debug bool: debug output. Default: False
+        @param pause_budget float: maximum generation 2 pause outside of idle windows in s
+        @param max_deferral float: maximum deferral of a generation 2 collection in s
+        @param is_idle callable: returns True in idle windows. Default: always idle
         """
         super().__init__()
         self.debug = debug
         if debug:
             gc.set_debug(gc.DEBUG_LEAK)
+        self.pause_budget = pause_budget
+        self.max_deferral = max_deferral
+        self.is_idle = is_idle
+
+        # the last collections: dicts with generation, start time, pause, counts and
+        # number of collected and uncollectable objects
+        self.history = collections.deque(maxlen=1000)
+        self._stats_lock = threading.Lock()
+        self._generation_stats = [self._empty_statistics() for _ in range(3)]
+        self._current = None
+        self._gen2_pending_since = None
+        self._gen2_deferred = 0
+        gc.callbacks.append(self._gc_callback)
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.check)
 
         self.threshold = gc.get_threshold()
         gc.disable()
-        self.timer.start(interval * 1000)
+        self.timer.start(int(interval * 1000))
+
+    @staticmethod
+    def _empty_statistics():
+        return {'collections': 0, 'total_pause': 0., 'max_pause': 0., 'last_pause': 0.,
+                'collected': 0, 'uncollectable': 0}
+
+    def _gc_callback(self, phase, info):
+        """
+        Callback of the python garbage collector measuring every collection,
+        also the ones not started by this class.
+        """
+        if phase == 'start':
+            self._current = (time.perf_counter(), time.time(), gc.get_count())
+            return
+        if self._current is None:
+            return
+        start, timestamp, count = self._current
+        self._current = None
+        pause = time.perf_counter() - start
+        generation = info['generation']
+        record = {'generation': generation,
+                  'timestamp': timestamp,
+                  'pause': pause,
+                  'count': count,
+                  'collected': info['collected'],
+                  'uncollectable': info['uncollectable']}
+        with self._stats_lock:
+            self.history.append(record)
+            stats = self._generation_stats[generation]
+            stats['collections'] += 1
+            stats['total_pause'] += pause
+            stats['max_pause'] = max(stats['max_pause'], pause)
+            stats['last_pause'] = pause
+            stats['collected'] += info['collected']
+            stats['uncollectable'] += info['uncollectable']
+
+    def get_statistics(self):
+        """
+        Get the pause statistics of all garbage collections.
+
+        @return dict: 'generations': list with a dict of statistics for each
+                      generation (collections, total_pause, max_pause,
+                      last_pause, mean_pause, collected, uncollectable),
+                      'gen2_deferred': number of deferred generation 2
+                      collections, 'gen2_pending': seconds a generation 2
+                      collection is pending, 'count': current gc counts
+        """
+        with self._stats_lock:
+            generations = [dict(stats) for stats in self._generation_stats]
+        for stats in generations:
+            stats['mean_pause'] = (stats['total_pause'] / stats['collections']
+                                   if stats['collections'] else 0.)
+        pending = self._gen2_pending_since
+        return {'generations': generations,
+                'gen2_deferred': self._gen2_deferred,
+                'gen2_pending': 0. if pending is None else time.monotonic() - pending,
+                'count': gc.get_count()}
+
+    def get_history(self):
+        """
+        Get the last garbage collections.
+
+        @return list: dicts with generation, timestamp, pause, count, collected, uncollectable
+        """
+        with self._stats_lock:
+            return list(self.history)
+
+    def reset_statistics(self):
+        """
+        Clear the pause statistics and the collection history.
+        """
+        with self._stats_lock:
+            self.history.clear()
+            self._generation_stats = [self._empty_statistics() for _ in range(3)]
+        self._gen2_deferred = 0
+        self.sigStatisticsUpdated.emit()
+
+    def stop(self):
+        """
+        Stop collecting on the timer, restore automatic garbage collection and
+        remove the pause measurement.
+        """
+        self.timer.stop()
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        gc.enable()
 
     @Slot()
     def check(self):
@@ -68,10 +188,49 @@ class GarbageCollector(QObject):
                     logger.debug('collecting gen 1, found: {0:d} unreachable'
                                  ''.format(num))
                 if l2 > self.threshold[2]:
-                    num = gc.collect(2)
-                    if self.debug:
-                        logger.debug('collecting gen 2, found: {0:d} '
-                                     'unreachable'.format(num))
+                    self._collect_gen2()
+            self.sigStatisticsUpdated.emit()
+        elif self._gen2_pending_since is not None:
+            self._collect_gen2()
+            self.sigStatisticsUpdated.emit()
+
+    def _collect_gen2(self):
+        """
+        Run a generation 2 collection if its expected pause fits into the
+        pause budget, the application is idle or the collection has been
+        deferred for too long.
+        """
+        now = time.monotonic()
+        if self._gen2_pending_since is None:
+            self._gen2_pending_since = now
+        with self._stats_lock:
+            stats = self._generation_stats[2]
+            # the first collection measures the pause
+            expected_pause = stats['last_pause'] if stats['collections'] else 0.
+        if (expected_pause > self.pause_budget
+                and now - self._gen2_pending_since < self.max_deferral
+                and not self._idle()):
+            self._gen2_deferred += 1
+            return
+        num = gc.collect(2)
+        self._gen2_pending_since = None
+        if self.debug:
+            logger.debug('collecting gen 2, found: {0:d} '
+                         'unreachable'.format(num))
+        with self._stats_lock:
+            pause = self._generation_stats[2]['last_pause']
+        if pause > self.pause_budget:
+            logger.debug('Generation 2 garbage collection paused the main thread for '
+                         '{0:.1f} ms.'.format(pause * 1e3))
+
+    def _idle(self):
+        if self.is_idle is None:
+            return True
+        try:
+            return bool(self.is_idle())
+        except Exception:
+            logger.exception('Idle check of the garbage collector failed.')
+            return True
 
     def debug_cycles(self):
         """
@@ -25,9 +25,14 @@ Originally distributed under MIT/X11 license. See documentation/MITLicense.txt f
 """
 
 
+import atexit
+import copy
 import logging
 import logging.handlers
+import queue
 import sys
+import threading
+import time
 import traceback
 import functools
 from qtpy import QtCore
@@ -77,8 +82,9 @@ class QtLogFormatter(logging.Formatter):
 class QtLogHandler(QtCore.QObject, logging.Handler):
     """Log handler for displaying log records in a QT gui.
 
-      For each log record the Qt signal sigLoggedMessage is emitted
-      with a dictionary as parameter. The keys of this dictionary are:
+      The log records are collected and the Qt signal sigLoggedMessages is
+      emitted with a list of dictionaries whenever the handler is flushed.
+      The keys of these dictionaries are:
         - name: logger name
         - message: the message
         - timestamp: the creation time of the log record
@@ -92,29 +98,154 @@ class QtLogHandler(QtCore.QObject, logging.Handler):
       @param int level: log level, defaults to NOTSET
     """
 
-    sigLoggedMessage = QtCore.Signal(object)
-    """signal emitted for each log record"""
+    sigLoggedMessages = QtCore.Signal(object)
+    """signal emitted with a list of log records on each flush"""
 
     def __init__(self, parent=None, level=0):
         QtCore.QObject.__init__(self, parent)
         logging.Handler.__init__(self, level)
         self.setFormatter(QtLogFormatter())
+        self._entries = list()
 
     def emit(self, record):
         """Emit function of handler.
 
-          Formats the log record and emits :sigLoggedMessage:
+          Formats the log record and adds it to the next batch.
 
           @param object record: :logging.LogRecord:
         """
-        record = self.format(record)
-        if record:
-            self.sigLoggedMessage.emit(record)
+        entry = self.format(record)
+        if entry:
+            with self.lock:
+                self._entries.append(entry)
+
+    def flush(self):
+        """Emits :sigLoggedMessages: with all records collected since the last flush.
+        """
+        with self.lock:
+            entries, self._entries = self._entries, list()
+        if entries:
+            self.sigLoggedMessages.emit(entries)
+
+
+class RateLimitFilter(logging.Filter):
+    """Filter limiting the rate of log records from a single call site.
+
+      Only records with the attribute rate_limit are limited, so the limit is
+      opted in at the call site, e.g.
+          self.log.debug('Position {0}'.format(pos), extra={'rate_limit': 1})
+      passes at most one record per second from this line. The number of
+      suppressed records is appended to the next record passing the filter.
+    """
+
+    def __init__(self, name=''):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        # call site: [time of last passed record, number of suppressed records]
+        self._call_sites = dict()
+
+    def filter(self, record):
+        """Filter function.
+
+          @param object record: :logging.LogRecord:
+
+          @return bool: True if the record should be logged
+        """
+        interval = getattr(record, 'rate_limit', None)
+        if not interval:
+            return True
+        call_site = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            state = self._call_sites.setdefault(call_site, [None, 0])
+            if state[0] is not None and record.created - state[0] < interval:
+                state[1] += 1
+                return False
+            suppressed = state[1]
+            state[0] = record.created
+            state[1] = 0
+        if suppressed:
+            record.msg = '{0} [{1:d} similar messages suppressed]'.format(
+                record.getMessage(), suppressed)
+            record.args = None
+        return True
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler only putting log records into a queue.
+
+      Contrary to the standard library handler the records are not formatted,
+      except for merging the message arguments. Formatting, file I/O and Qt
+      signals are left to the QueueListener thread.
+    """
+
+    def prepare(self, record):
+        """Prepares a record for queuing.
+
+          @param object record: :logging.LogRecord:
+
+          @return object: :logging.LogRecord: copy of the record
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+class QueueListener(logging.handlers.QueueListener):
+    """Queue listener handling log records in batches.
+
+      After the first record arrives, further records are collected for up to
+      batch_interval seconds. The collected records are handled one by one and
+      the handlers are flushed once per batch, so the QtLogHandler emits one
+      signal per batch.
+
+      @param queue queue: queue the QueueHandler puts the records in
+      @param handlers: handlers of the log records
+      @param float batch_interval: maximum delay of a record in seconds
+      @param int batch_size: maximum number of records in a batch
+    """
+
+    def __init__(self, queue, *handlers, batch_interval=0.1, batch_size=1000):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+
+    def _monitor(self):
+        while True:
+            records = [self.dequeue(True)]
+            deadline = time.monotonic() + self.batch_interval
+            while records[-1] is not self._sentinel and len(records) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    records.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            for record in records:
+                if record is not self._sentinel:
+                    self.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+            for _ in records:
+                self.queue.task_done()
+            if records[-1] is self._sentinel:
+                break
+
+
+# listener running the handlers in a background thread
+log_listener = None
 
 
 def initialize_logger():
     """sets up the logger including a console, file and qt handler
+
+      Loggers only put their records into a queue. The handlers are run by
+      the QueueListener in a background thread, so logging does not block
+      measurement threads with formatting and file I/O.
     """
+    global log_listener
     # initialize logger
     logging.basicConfig(format="%(message)s", level=logging.INFO)
     logging.addLevelName(logging.CRITICAL, 'critical')
@@ -127,7 +258,8 @@ def initialize_logger():
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
     # set level of stream handler which logs to stderr
-    logger.handlers[0].setLevel(logging.WARNING)
+    stream_handler = logger.handlers[0]
+    stream_handler.setLevel(logging.WARNING)
 
     # add file logger
     rotating_file_handler = logging.handlers.RotatingFileHandler(
@@ -137,17 +269,48 @@ def initialize_logger():
         datefmt="%Y-%m-%d %H:%M:%S"))
     rotating_file_handler.doRollover()
     rotating_file_handler.setLevel(logging.DEBUG)
-    logger.addHandler(rotating_file_handler)
 
     # add Qt log handler
     qt_log_handler = QtLogHandler()
     qt_log_handler.setLevel(logging.DEBUG)
-    logging.getLogger().addHandler(qt_log_handler)
+
+    # the handlers run in the listener thread, loggers only feed the queue
+    log_queue = queue.Queue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    logger.removeHandler(stream_handler)
+    logger.addHandler(queue_handler)
+    log_listener = QueueListener(
+        log_queue, stream_handler, rotating_file_handler, qt_log_handler)
+    log_listener.start()
+    # runs before logging.shutdown, which was registered earlier
+    atexit.register(stop_logger)
 
     for logger_name in ['core', 'gui', 'logic', 'hardware']:
             logging.getLogger(logger_name).setLevel(logging.DEBUG)
 
 
+def stop_logger():
+    """Handles all queued log records and stops the listener thread.
+    """
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+
+def get_qt_log_handler():
+    """Get the handler emitting the log records as Qt signals.
+
+      @return object: :QtLogHandler: or None if the logger is not initialized
+    """
+    if log_listener is not None:
+        for handler in log_listener.handlers:
+            if isinstance(handler, QtLogHandler):
+                return handler
+    return None
+
+
 # global variables used by exception handler
 original_excepthook = None
 _blockLogging = False
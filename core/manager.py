@@ -40,6 +40,7 @@ from .util.modules import toposort, isBase
 from collections import OrderedDict
 from .logger import register_exception_handler
 from .threadmanager import ThreadManager
+from .garbage_collector import GarbageCollector
 # try to import RemoteObjectManager. Might fail if rpyc is not installed.
 try:
     from .remote import RemoteObjectManager
@@ -115,6 +116,11 @@ class Manager(QtCore.QObject):
             self.tm = ThreadManager()
             logger.debug('Main thread is {0}'.format(QtCore.QThread.currentThreadId()))
 
+            # Disable standard garbage collector and run it from the event loop to
+            # improve stability. Long collections wait until no module is locked.
+            # (see garbage_collector in the doc for more information)
+            self.gc = GarbageCollector(interval=1.0, debug=False, is_idle=self.noModuleLocked)
+
             # Task runner
             self.tr = None
 
@@ -187,6 +193,13 @@ class Manager(QtCore.QObject):
                     except:
                         logger.exception('Remote server could not be started.')
 
+            if 'gc_pause_budget' in self.tree['global']:
+                try:
+                    self.gc.pause_budget = float(self.tree['global']['gc_pause_budget'])
+                except (TypeError, ValueError):
+                    logger.error('"gc_pause_budget" entry in "global" section of '
+                                 'configuration file is not a number.')
+
             logger.info('Qudi started.')
 
             # Load startup things from config here
@@ -926,6 +939,20 @@ class Manager(QtCore.QObject):
             return False
         return self.tree['loaded'][base][name].module_state() in ('idle', 'running', 'locked')
 
+    def noModuleLocked(self):
+        """Returns whether no loaded module is locked, e.g. by a running measurement.
+
+          @return bool: True if no module is locked
+        """
+        for base, mods in self.tree['loaded'].items():
+            for name, module in mods.items():
+                try:
+                    if module.module_state() == 'locked':
+                        return False
+                except:
+                    pass
+        return True
+
     def findBase(self, name):
         """ Find base for a given module name.
           @param str name: module name
@@ -1378,6 +1405,8 @@ class Manager(QtCore.QObject):
                 logger.info('Deactivating module {0}.{1}'.format(base, module))
                 self.deactivateModule(base, module)
             QtCore.QCoreApplication.processEvents()
+        if self.rm is not None:
+            self.rm.closeConnections()
         self.sigManagerQuit.emit(self, False)
 
     @QtCore.Slot()
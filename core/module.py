@@ -247,12 +247,12 @@ class ModuleMeta(type(QtCore.QObject)):
 
         # Accumulate Connector, ConfigOption and StatusVar info from parent classes
         for base in reversed(bases):
-            if hasattr(base, '_connectors'):
-                connectors.update(copy.deepcopy(base._connectors))
+            if hasattr(base, '_conn'):
+                connectors.update(copy.deepcopy(base._conn))
             if hasattr(base, '_config_options'):
                 config_options.update(copy.deepcopy(base._config_options))
-            if hasattr(base, '_stat_var'):
-                status_vars.update(copy.deepcopy(base._stat_var))
+            if hasattr(base, '_stat_vars'):
+                status_vars.update(copy.deepcopy(base._stat_vars))
 
         # Collect this classes Connector and ConfigOption and StatusVar into dictionaries
         for key, value in attrs.items():
@@ -20,13 +20,18 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 
+import copy
 import logging
 logger = logging.getLogger(__name__)
 
 from qtpy.QtCore import QObject
 from urllib.parse import urlparse
 import ssl
+import threading
+import time
+from .util.interfaces import get_constant_methods
 from .util.models import DictTableModel, ListTableModel
+from .util.network import pack_array, netobtain
 import rpyc
 from rpyc.utils.server import ThreadedServer
 from rpyc.utils.authenticators import SSLAuthenticator
@@ -47,6 +52,7 @@ class RemoteObjectManager(QObject):
         self.remoteModules.headers[0] = 'Remote Modules'
         self.sharedModules = DictTableModel()
         self.sharedModules.headers[0] = 'Shared Modules'
+        self.connectionPool = RemoteConnectionPool()
 
     def makeRemoteService(self):
         """ A function that returns a class containing a module list hat can be manipulated from the host.
@@ -95,6 +101,45 @@ class RemoteObjectManager(QObject):
                         logger.error('Client requested a module that is not '
                                 'shared.')
                         return None
+
+            def exposed_getConstantMethods(self, name):
+                """ Return the names of the methods of a shared module whose results can be cached.
+
+                  @param str name: unique module name
+
+                  @return tuple(str): names of the methods marked with constant_method
+                """
+                name = str(name)
+                if name not in self.modules.storage:
+                    return tuple()
+                return get_constant_methods(type(self.modules.storage[name]))
+
+            def exposed_getArrayData(self, array, compress=False):
+                """ Pack a numpy array of this process for a fast transfer as raw buffer.
+
+                  @param numpy.ndarray array: array, usually passed back as netref by the client
+                  @param bool compress: compress the buffer with zlib
+
+                  @return tuple: packed array, see core.util.network.pack_array, or None if the
+                                 object is no packable numpy array
+                """
+                return pack_array(array, compress)
+
+            def exposed_callBatch(self, module, calls, compress=False):
+                """ Call several methods of a module and return all results at once.
+
+                  @param object module: module, usually passed back as netref by the client
+                  @param tuple calls: tuple of (str method name, tuple args, tuple kwargs items)
+                  @param bool compress: compress returned numpy arrays
+
+                  @return tuple: (bool is_array, value) per call, arrays are packed
+                """
+                results = list()
+                for name, args, kwargs in calls:
+                    value = getattr(module, name)(*args, **dict(kwargs))
+                    packed = pack_array(value, compress)
+                    results.append((False, value) if packed is None else (True, packed))
+                return tuple(results)
         return RemoteModuleService
 
     def createServer(self, hostname, port, certfile=None, keyfile=None):
@@ -157,7 +202,8 @@ class RemoteObjectManager(QObject):
         """
         parsed = urlparse(url)
         name = parsed.path.replace('/', '')
-        return self.getRemoteModule(parsed.hostname, parsed.port, name)
+        return self.getRemoteModule(
+            parsed.hostname, parsed.port, name, certfile=certfile, keyfile=keyfile)
 
     def getRemoteModule(self, host, port, name, certfile=None, keyfile=None):
         """ Get a remote module via its host, port and name.
@@ -170,10 +216,16 @@ class RemoteObjectManager(QObject):
 
           @return object: remote module
         """
-        module = RemoteModule(host, port, name, certfile=certfile, keyfile=keyfile)
+        module = RemoteModule(
+            self.connectionPool, host, port, name, certfile=certfile, keyfile=keyfile)
         self.remoteModules.append(module)
         return module.module
 
+    def closeConnections(self):
+        """ Close all connections to remote module servers.
+        """
+        self.connectionPool.close()
+
 
 class RPyCServer(QObject):
     """ Contains a RPyC server that serves modules to remote computers. Runs in a QThread.
@@ -213,18 +265,202 @@ class RPyCServer(QObject):
         self.server.start()
 
 
-class RemoteModule:
-    """ This class represents a module on a remote computer and holds a reference to it.
+class RemoteConnectionPool:
+    """ Holds one rpyc connection per remote module server, shared by all modules on that server.
+        Broken connections are reestablished with an exponential backoff.
     """
-    def __init__(self, host, port, name, certfile=None, keyfile=None):
+    # delay before the first reconnection attempt in s, doubled for every further attempt
+    reconnect_delay = 0.5
+    reconnect_attempts = 5
+
+    def __init__(self):
+        self._connections = dict()
+        # guards the dicts, connecting and the reconnect backoff hold the lock of the server only
+        self._lock = threading.Lock()
+        self._server_locks = dict()
+
+    def getConnection(self, host, port, certfile=None, keyfile=None, broken=None):
+        """ Get the connection to a remote module server, connecting if necessary.
+
+          @param str host: host that the remote module server is running on
+          @param int port: port that the remote module server is listening on
+          @param str certfile: filename of certificate or None if SSL is not used
+          @param str keyfile: filename of key or None if SSL is not used
+          @param rpyc.Connection broken: connection found broken by the caller, it is replaced
+                                         if it is still the pooled one
+
+          @return rpyc.Connection: connection to the server
+        """
+        key = (host, port, certfile, keyfile)
+        with self._lock:
+            server_lock = self._server_locks.setdefault(key, threading.Lock())
+        with server_lock:
+            with self._lock:
+                connection = self._connections.get(key)
+            if connection is not None and not connection.closed and connection is not broken:
+                return connection
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            delay = self.reconnect_delay
+            for attempt in range(self.reconnect_attempts):
+                try:
+                    connection = self._connect(host, port, certfile, keyfile)
+                    break
+                except (OSError, EOFError):
+                    if attempt == self.reconnect_attempts - 1:
+                        with self._lock:
+                            self._connections.pop(key, None)
+                        raise
+                    logger.warning('Connection to remote module server {0}:{1} failed, '
+                                   'retrying in {2} s.'.format(host, port, delay))
+                    time.sleep(delay)
+                    delay *= 2
+            with self._lock:
+                self._connections[key] = connection
+            return connection
+
+    @staticmethod
+    def _connect(host, port, certfile=None, keyfile=None):
+        """ Open a new connection with TCP keepalive so that dead servers are detected.
+        """
         if certfile is not None and keyfile is not None:
-            self.connection = rpyc.ssl_connect(
+            return rpyc.ssl_connect(
                 host,
                 port=port,
                 config={'allow_all_attrs': True},
                 certfile=certfile,
-                keyfile=keyfile)
-        else:
-            self.connection = rpyc.connect(host, port, config={'allow_all_attrs': True})
-        self.module = self.connection.root.getModule(name)
+                keyfile=keyfile,
+                keepalive=True)
+        return rpyc.connect(host, port, config={'allow_all_attrs': True}, keepalive=True)
+
+    def close(self):
+        """ Close all pooled connections.
+        """
+        with self._lock:
+            for connection in self._connections.values():
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+
+
+class RemoteModule:
+    """ This class represents a module on a remote computer and holds a reference to it.
+    """
+    def __init__(self, pool, host, port, name, certfile=None, keyfile=None):
+        self._pool = pool
+        self._address = (host, port, certfile, keyfile)
         self.name = name
+        self.connection = None
+        self.netref = None
+        self.constant_methods = tuple()
+        self._cache = dict()
+        self._lock = threading.RLock()
+        self._connect()
+        self.module = RemoteModuleProxy(self)
+
+    def __str__(self):
+        return self.name
+
+    def _connect(self, broken=None):
+        """ Get the connection from the pool and the reference to the module.
+        """
+        self.connection = self._pool.getConnection(*self._address, broken=broken)
+        root = self.connection.root
+        self.netref = root.getModule(self.name)
+        try:
+            self.constant_methods = tuple(root.getConstantMethods(self.name))
+        except AttributeError:
+            # server without support for constant methods
+            self.constant_methods = tuple()
+        self._cache.clear()
+
+    def reconnect(self):
+        """ Reestablish the connection to the remote module server.
+        """
+        with self._lock:
+            logger.warning('Reconnecting to remote module {0}.'.format(self.name))
+            self._connect(broken=self.connection)
+
+    def getAttribute(self, name):
+        """ Get an attribute of the remote module, reconnecting once if the connection broke.
+
+          @param str name: attribute name
+
+          @return object: attribute, usually a netref
+        """
+        if self.connection.closed:
+            self.reconnect()
+        try:
+            value = getattr(self.netref, name)
+        except (EOFError, ConnectionError):
+            self.reconnect()
+            value = getattr(self.netref, name)
+        if name in self.constant_methods:
+            return self._cachedMethod(name, value)
+        return value
+
+    def _cachedMethod(self, name, method):
+        """ Wrap a constant method of the remote module so that each result is fetched once.
+            Every call returns its own copy of the result, so callers can not change the cache.
+        """
+        def copied(value):
+            if isinstance(value, rpyc.core.netref.BaseNetref):
+                return value
+            return copy.deepcopy(value)
+
+        def cached(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try:
+                with self._lock:
+                    value = self._cache[key]
+            except TypeError:
+                # unhashable arguments
+                return method(*args, **kwargs)
+            except KeyError:
+                value = method(*args, **kwargs)
+                try:
+                    value = netobtain(value)
+                except Exception:
+                    # not transferable by value, keep the reference
+                    pass
+                with self._lock:
+                    self._cache[key] = value
+            return copied(value)
+        return cached
+
+    def clearCache(self):
+        """ Forget the cached results of the constant methods.
+        """
+        with self._lock:
+            self._cache.clear()
+
+
+class RemoteModuleProxy:
+    """ Stands in for a remote module: attribute access is passed to the module on the server.
+    """
+    is_remote_proxy = True
+
+    def __init__(self, remote_module):
+        object.__setattr__(self, '_remote_module', remote_module)
+
+    @property
+    def netref(self):
+        """ Current rpyc reference to the remote module. """
+        return self._remote_module.netref
+
+    def __getattr__(self, name):
+        return self._remote_module.getAttribute(name)
+
+    def __setattr__(self, name, value):
+        setattr(self._remote_module.netref, name, value)
+
+    def __dir__(self):
+        return dir(self._remote_module.netref)
+
+    def __repr__(self):
+        return '<remote module {0}>'.format(self._remote_module.name)
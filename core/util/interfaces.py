@@ -41,6 +41,32 @@ class TaskMetaclass(QObjectMeta, abc.ABCMeta):
     pass
 
 
+def constant_method(func):
+    """
+    Decorator for interface methods whose return value does not change while the module is
+    loaded, e.g. hardware constraints. The results of these methods are cached for remote
+    modules. The marker is found on the interface, so implementations need not repeat it.
+    """
+    func._qudi_constant_method = True
+    return func
+
+
+def get_constant_methods(cls):
+    """
+    Get the names of all methods of a class or one of its bases marked with constant_method.
+
+    @param type cls: class to inspect
+
+    @return tuple(str): method names
+    """
+    names = set()
+    for base in cls.__mro__:
+        for name, value in vars(base).items():
+            if getattr(value, '_qudi_constant_method', False):
+                names.add(name)
+    return tuple(sorted(names))
+
+
 class ScalarConstraint:
     """
     Constraint definition for a scalar variable hardware parameter.
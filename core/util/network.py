@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """
-Check if something is a rpyc remote object and transfer it
+Check if something is a rpyc remote object and transfer it.
+Numpy arrays are transferred as raw buffers, calls can be batched or run asynchronously.
 
 Qudi is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
@@ -19,13 +20,254 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import threading
+import time
+import weakref
+import zlib
+from concurrent.futures import Future
+import numpy as np
+import rpyc
 import rpyc.core.netref
 import rpyc.utils.classic
 
-def netobtain(obj):
+# per-call latency statistics of remote calls, name: [number of calls, total time, max time]
+_latency_lock = threading.Lock()
+_latencies = dict()
+
+# whether the remote side of a connection offers getArrayData, connection: bool
+_array_transfer_support = weakref.WeakKeyDictionary()
+
+# netref class names of the numpy arrays transferred as raw buffers
+_array_class_names = frozenset(('numpy.ndarray', 'numpy.memmap'))
+
+
+def record_latency(name, duration):
+    """ Add the duration of a remote call to the latency statistics.
+
+    @param str name: name of the call
+    @param float duration: duration of the call in seconds
     """
+    with _latency_lock:
+        stats = _latencies.setdefault(name, [0, 0., 0.])
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] = max(stats[2], duration)
+
+
+def get_latency_statistics():
+    """ Get the latency statistics of all remote calls made through this module.
+
+    @return dict: name: dict with 'calls', 'mean' and 'max' latency in seconds
+    """
+    with _latency_lock:
+        return {name: {'calls': count, 'mean': total / count, 'max': maximum}
+                for name, (count, total, maximum) in _latencies.items()}
+
+
+def pack_array(array, compress=False):
+    """ Pack a numpy array into a header and its raw buffer for a fast transfer.
+
+    @param numpy.ndarray array: array to pack, object arrays can not be packed
+    @param bool compress: compress the buffer with zlib
+
+    @return tuple: (str dtype, tuple shape, bool compressed, bytes data) or None
+    """
+    if not isinstance(array, np.ndarray) or array.dtype.hasobject:
+        return None
+    data = np.ascontiguousarray(array).tobytes()
+    if compress:
+        data = zlib.compress(data, 1)
+    return array.dtype.str, tuple(int(n) for n in array.shape), bool(compress), data
+
+
+def unpack_array(packed):
+    """ Restore a numpy array packed with pack_array.
+
+    @param tuple packed: (str dtype, tuple shape, bool compressed, bytes data)
+
+    @return numpy.ndarray: writeable array
+    """
+    dtype, shape, compressed, data = packed
+    if compressed:
+        data = zlib.decompress(data)
+    return np.frombuffer(bytearray(data), dtype=np.dtype(dtype)).reshape(shape)
+
+
+def _get_connection(obj):
+    """ Get the rpyc connection of a netref. """
+    conn = object.__getattribute__(obj, '____conn__')
+    if isinstance(conn, weakref.ref):
+        conn = conn()
+    return conn
+
+
+def _is_array_netref(obj):
+    """ Whether a netref refers to a numpy array, decided from its class name without a round
+    trip.
+    """
+    try:
+        return object.__getattribute__(obj, '____id_pack__')[0] in _array_class_names
+    except AttributeError:
+        return False
+
+
+def _supports_array_transfer(connection):
+    """ Whether the remote side of a connection offers getArrayData, asked once per connection.
+    """
+    try:
+        return _array_transfer_support[connection]
+    except KeyError:
+        supported = hasattr(connection.root, 'getArrayData')
+        _array_transfer_support[connection] = supported
+        return supported
+
+
+def netobtain(obj, compress=False):
+    """ Get a local copy of a remote object.
+
+    Remote numpy arrays are transferred as raw buffer in one round trip, if the remote side
+    offers it. Everything else is transferred by the generic rpyc protocol.
+
+    @param object obj: any object, only rpyc netrefs are transferred
+    @param bool compress: compress numpy arrays for the transfer
+
+    @return object: local object
     """
     if isinstance(obj, rpyc.core.netref.BaseNetref):
-        return rpyc.utils.classic.obtain(obj)
+        start_time = time.perf_counter()
+        packed = None
+        if _is_array_netref(obj):
+            connection = _get_connection(obj)
+            if _supports_array_transfer(connection):
+                packed = connection.root.getArrayData(obj, compress)
+        if packed is not None:
+            result = unpack_array(packed)
+        else:
+            result = rpyc.utils.classic.obtain(obj)
+        record_latency('netobtain', time.perf_counter() - start_time)
+        return result
     else:
         return obj
+
+
+def netbatch(module, calls, compress=False):
+    """ Call several methods of a module in one round trip.
+
+    @param object module: local module, remote module or its netref
+    @param list calls: list of (str method name, tuple args, dict kwargs)
+    @param bool compress: compress returned numpy arrays for the transfer
+
+    @return list: return values of the calls. Arrays are returned as local copies,
+                  other values like the remote method would return them.
+    """
+    calls = tuple((str(name), tuple(args), tuple(dict(kwargs).items()))
+                  for name, args, kwargs in calls)
+    if getattr(type(module), 'is_remote_proxy', False):
+        module = module.netref
+    if not isinstance(module, rpyc.core.netref.BaseNetref):
+        return [getattr(module, name)(*args, **dict(kwargs)) for name, args, kwargs in calls]
+
+    start_time = time.perf_counter()
+    results = _get_connection(module).root.callBatch(module, calls, compress)
+    results = [unpack_array(value) if is_array else value for is_array, value in results]
+    record_latency('netbatch', time.perf_counter() - start_time)
+    return results
+
+
+class _AsyncCallServer:
+    """ Serves rpyc connections in a background thread while asynchronous calls on them are
+    pending, so that their results arrive without the caller waiting for them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        # connection: dict of pending rpyc AsyncResult: callback called with connection errors
+        self._pending = dict()
+        self._thread = None
+
+    def add(self, connection, async_result, error_callback):
+        with self._lock:
+            self._pending.setdefault(connection, dict())[async_result] = error_callback
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='netasync-server', daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def remove(self, connection, async_result):
+        with self._lock:
+            pending = self._pending.get(connection)
+            if pending is not None:
+                pending.pop(async_result, None)
+                if not pending:
+                    del self._pending[connection]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._lock.wait()
+                connections = list(self._pending)
+            for connection in connections:
+                try:
+                    # returns early if another thread is receiving on this connection
+                    connection.serve(0.01)
+                except Exception as e:
+                    with self._lock:
+                        pending = self._pending.pop(connection, dict())
+                    for error_callback in pending.values():
+                        error_callback(e)
+
+
+_async_call_server = _AsyncCallServer()
+
+
+def netasync(method, *args, **kwargs):
+    """ Call a method of a remote module without waiting for the result.
+
+    Independent calls, e.g. to several remote devices, run concurrently instead of paying
+    one network round trip after another. The returned future completes in a background
+    thread, so done callbacks should only hand the result over, e.g. by emitting a Qt
+    signal. Methods of local objects are called directly and return a finished future.
+
+    @param callable method: bound method of a remote module (a netref) or a local object
+    @param args: positional arguments of the call
+    @param kwargs: keyword arguments of the call
+
+    @return concurrent.futures.Future: future of the return value of the call
+    """
+    future = Future()
+    future.set_running_or_notify_cancel()
+    if not isinstance(method, rpyc.core.netref.BaseNetref):
+        try:
+            future.set_result(method(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    connection = _get_connection(method)
+    start_time = time.perf_counter()
+    async_result = rpyc.async_(method)(*args, **kwargs)
+
+    done_lock = threading.Lock()
+
+    def done(result):
+        with done_lock:
+            if future.done():
+                return
+            _async_call_server.remove(connection, async_result)
+            record_latency('netasync', time.perf_counter() - start_time)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                return
+            try:
+                future.set_result(result.value)
+            except Exception as e:
+                future.set_exception(e)
+
+    _async_call_server.add(connection, async_result, done)
+    async_result.add_callback(done)
+    # the result may have arrived in the server thread while the callback was added
+    if async_result.ready:
+        done(async_result)
+    return future
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a widget showing the garbage collection statistics.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+from qtpy.QtWidgets import QWidget, QTableWidgetItem
+from qtpy import uic
+import os
+
+
+class GarbageCollectorWidget(QWidget):
+    """ Shows the pause statistics of the qudi garbage collector to diagnose measurement jitter.
+    """
+
+    def __init__(self):
+        super().__init__()
+        this_dir = os.path.dirname(__file__)
+        ui_file = os.path.join(this_dir, 'ui_gcwidget.ui')
+
+        # Load it
+        uic.loadUi(ui_file, self)
+        self._gc = None
+
+    def setGarbageCollector(self, garbage_collector):
+        """ Show the statistics of a garbage collector.
+
+          @param object garbage_collector: qudi GarbageCollector, None to disconnect
+        """
+        if self._gc is not None:
+            self._gc.sigStatisticsUpdated.disconnect(self.updateStatistics)
+            self.resetButton.clicked.disconnect()
+        self._gc = garbage_collector
+        if self._gc is not None:
+            self._gc.sigStatisticsUpdated.connect(self.updateStatistics)
+            self.resetButton.clicked.connect(self._gc.reset_statistics)
+            self.updateStatistics()
+
+    def updateStatistics(self):
+        """ Update the table with the current statistics, if the widget is visible.
+        """
+        if self._gc is None or not self.isVisible():
+            return
+        statistics = self._gc.get_statistics()
+        for row, stats in enumerate(statistics['generations']):
+            values = ('{0:d}'.format(stats['collections']),
+                      '{0:.2f}'.format(stats['last_pause'] * 1e3),
+                      '{0:.2f}'.format(stats['mean_pause'] * 1e3),
+                      '{0:.2f}'.format(stats['max_pause'] * 1e3),
+                      '{0:d}'.format(stats['collected']),
+                      '{0:d}'.format(stats['uncollectable']))
+            for column, value in enumerate(values):
+                self.statisticsTableWidget.setItem(row, column, QTableWidgetItem(value))
+        self.deferredLabel.setText('Deferred gen 2 collections: {0:d}'.format(
+            statistics['gen2_deferred']))
+        self.budgetLabel.setText('Pause budget: {0:.1f} ms'.format(self._gc.pause_budget * 1e3))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.updateStatistics()
@@ -289,6 +289,7 @@ class LogWidget(QtWidgets.QWidget):
     """
     sigDisplayEntry = QtCore.Signal(object)  # for thread-safetyness
     sigAddEntry = QtCore.Signal(object)  # for thread-safetyness
+    sigAddEntries = QtCore.Signal(object)  # for thread-safetyness
     sigScrollToAnchor = QtCore.Signal(object)  # for internal use.
 
     def __init__(self, manager=None, **kwargs):
@@ -345,6 +346,7 @@ class LogWidget(QtWidgets.QWidget):
         self.sigDisplayEntry.connect(self.displayEntry,
                                      QtCore.Qt.QueuedConnection)
         self.sigAddEntry.connect(self.addEntry, QtCore.Qt.QueuedConnection)
+        self.sigAddEntries.connect(self.addEntries, QtCore.Qt.QueuedConnection)
         self.filterTree.itemChanged.connect(self.setCheckStates)
 
     def setManager(self, manager):
@@ -380,18 +382,39 @@ class LogWidget(QtWidgets.QWidget):
         if not isGuiThread:
             self.sigAddEntry.emit(entry)
             return
-        if self.model.rowCount() > self.logLength:
-            self.model.removeRows(0, self.model.rowCount() - self.logLength)
-        text = entry['message']
-        if entry.get('exception') is not None:
-            if 'reasons' in entry['exception']:
-                text += '\n' + entry['exception']['reasons']
-            if 'message' in entry['exception']:
-                text += '\n' + entry['exception']['message']
-            for line in entry['exception']['traceback']:
-                text += '\n' + str(line)
-        logEntry = [entry['name'], entry['timestamp'], entry['level'], text]
-        self.model.addRow(self.model.rowCount(), logEntry)
+        self.addEntries([entry])
+
+    def addEntries(self, entries):
+        """Add a batch of log entries to the log view.
+
+          The view is only updated and scrolled once per batch.
+
+          @param list entries: log entries in dict format
+        """
+        # for thread-safetyness:
+        isGuiThread = QtCore.QThread.currentThread(
+        ) == QtCore.QCoreApplication.instance().thread()
+        if not isGuiThread:
+            self.sigAddEntries.emit(entries)
+            return
+        if not entries:
+            return
+        entries = entries[-self.logLength:]
+        excess = self.model.rowCount() + len(entries) - self.logLength
+        if excess > 0:
+            self.model.removeRows(0, excess)
+        logEntries = list()
+        for entry in entries:
+            text = entry['message']
+            if entry.get('exception') is not None:
+                if 'reasons' in entry['exception']:
+                    text += '\n' + entry['exception']['reasons']
+                if 'message' in entry['exception']:
+                    text += '\n' + entry['exception']['message']
+                for line in entry['exception']['traceback']:
+                    text += '\n' + str(line)
+            logEntries.append([entry['name'], entry['timestamp'], entry['level'], text])
+        self.model.addRows(self.model.rowCount(), logEntries)
         self.output.scrollToBottom()
 
     def displayEntry(self, entry):
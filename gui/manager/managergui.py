@@ -143,9 +143,9 @@ class ManagerGui(GUIBase):
         self._manager.sigShutdownAcknowledge.connect(self.promptForShutdown)
         # Log widget
         self._mw.logwidget.setManager(self._manager)
-        for loghandler in logging.getLogger().handlers:
-            if isinstance(loghandler, core.logger.QtLogHandler):
-                loghandler.sigLoggedMessage.connect(self.handleLogEntry)
+        qt_log_handler = core.logger.get_qt_log_handler()
+        if qt_log_handler is not None:
+            qt_log_handler.sigLoggedMessages.connect(self.handleLogEntries)
         # Module widgets
         self.sigStartModule.connect(self._manager.startModule)
         self.sigReloadModule.connect(self._manager.restartModuleRecursive)
@@ -164,6 +164,8 @@ class ManagerGui(GUIBase):
         self.startIPythonWidget()
         # thread widget
         self._mw.threadWidget.threadListView.setModel(self._manager.tm)
+        # garbage collector widget
+        self._mw.gcWidget.setGarbageCollector(self._manager.gc)
         # remote widget
         # hide remote menu item if rpyc is not available
         self._mw.actionRemoteView.setVisible(self._manager.rm is not None)
@@ -184,6 +186,7 @@ class ManagerGui(GUIBase):
         self._mw.configDisplayDockWidget.hide()
         self._mw.remoteDockWidget.hide()
         self._mw.threadDockWidget.hide()
+        self._mw.gcDockWidget.hide()
         self._mw.show()
 
     def on_deactivate(self):
@@ -192,6 +195,7 @@ class ManagerGui(GUIBase):
         self.stopIPythonWidget()
         self.stopIPython()
         self.checkTimer.stop()
+        self._mw.gcWidget.setGarbageCollector(None)
         if len(self.modlist) > 0:
             self.checkTimer.timeout.disconnect()
         self.sigStartModule.disconnect()
@@ -240,24 +244,28 @@ class ManagerGui(GUIBase):
         self._mw.consoleDockWidget.setVisible(True)
         self._mw.remoteDockWidget.setVisible(False)
         self._mw.threadDockWidget.setVisible(False)
+        self._mw.gcDockWidget.setVisible(False)
         self._mw.logDockWidget.setVisible(True)
 
         self._mw.actionConfigurationView.setChecked(False)
         self._mw.actionConsoleView.setChecked(True)
         self._mw.actionRemoteView.setChecked(False)
         self._mw.actionThreadsView.setChecked(False)
+        self._mw.actionGarbageCollectorView.setChecked(False)
         self._mw.actionLogView.setChecked(True)
 
         self._mw.configDisplayDockWidget.setFloating(False)
         self._mw.consoleDockWidget.setFloating(False)
         self._mw.remoteDockWidget.setFloating(False)
         self._mw.threadDockWidget.setFloating(False)
+        self._mw.gcDockWidget.setFloating(False)
         self._mw.logDockWidget.setFloating(False)
 
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.configDisplayDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(2), self._mw.consoleDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.remoteDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.threadDockWidget)
+        self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.gcDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.logDockWidget)
 
     def handleLogEntry(self, entry):
@@ -266,9 +274,18 @@ class ManagerGui(GUIBase):
 
             @param dict entry: Log entry
         """
-        self._mw.logwidget.addEntry(entry)
-        if entry['level'] == 'error' or entry['level'] == 'critical':
-            self.errorDialog.show(entry)
+        self.handleLogEntries([entry])
+
+    def handleLogEntries(self, entries):
+        """ Forward a batch of log entries to the log widget and show an error
+            popup for each error message.
+
+            @param list entries: Log entries
+        """
+        self._mw.logwidget.addEntries(entries)
+        for entry in entries:
+            if entry['level'] == 'error' or entry['level'] == 'critical':
+                self.errorDialog.show(entry)
 
     def startIPython(self):
         """ Create an IPython kernel manager and kernel.
@@ -300,7 +300,15 @@ class BlockEditorTableModel(QtCore.QAbstractTableModel):
         elif role == self.analogParameterRole and isinstance(data, dict):
             col_offset = 3 if self.digital_channels else 2
             chnl = self.analog_channels[(index.column() - col_offset) // 2]
-            self._pulse_block[index.row()].pulse_function[chnl].__init__(**data)
+            # Sampling function instances are shared within the PulseBlock, replace the element
+            old_elem = self._pulse_block[index.row()]
+            pulse_function = old_elem.pulse_function.copy()
+            pulse_function[chnl] = type(pulse_function[chnl])(**data)
+            new_elem = PulseBlockElement(init_length_s=old_elem.init_length_s,
+                                         increment_s=old_elem.increment_s,
+                                         pulse_function=pulse_function,
+                                         digital_high=old_elem.digital_high)
+            self._pulse_block[index.row()] = new_elem
         elif role == self.pulseBlockRole and isinstance(data, PulseBlock):
             self._pulse_block = copy.deepcopy(data)
             self._pulse_block.name = 'EDITOR CONTAINER'
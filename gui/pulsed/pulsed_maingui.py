@@ -24,8 +24,9 @@ import numpy as np
 import os
 import pyqtgraph as pg
 import datetime
+import time
 
-from core.module import Connector, StatusVar
+from core.module import Connector, ConfigOption, StatusVar
 from core.util import units
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog
@@ -158,6 +159,9 @@ class PulsedMeasurementGui(GUIBase):
     _ana_param_second_plot_y_axis_name_text = StatusVar('ana_param_second_plot_y_axis_name_LineEdit', 'Ft Signal')
     _ana_param_second_plot_y_axis_unit_text = StatusVar('ana_param_second_plot_y_axis_unit_LineEdit', '')
 
+    # maximum number of redraws of the measurement plots per second
+    _max_plot_update_rate = ConfigOption('max_plot_update_rate', 10)
+
     _show_raw_data = StatusVar(default=False)
     _show_laser_index = StatusVar(default=0)
     _ana_param_errorbars = StatusVar('ana_param_errorbars_CheckBox', False)
@@ -182,6 +186,17 @@ class PulsedMeasurementGui(GUIBase):
         self._pgs = GeneratorSettingDialog()
         self._pm_cfg = PredefinedMethodsConfigDialog()
 
+        # delays redraws of the measurement plots when the data is updated faster than
+        # _max_plot_update_rate
+        self._plot_update_timer = QtCore.QTimer()
+        self._plot_update_timer.setSingleShot(True)
+        self._plot_update_timer.timeout.connect(self._update_measurement_plots)
+        self._last_plot_update = 0.
+        # raw/laser data array and the sum over its lasers/gates
+        self._laser_sum_cache = (None, None)
+        # name, laser index and version of the data shown in the laser plot
+        self._laser_plot_state = None
+
         self._mw.tabWidget.addTab(self._pa, 'Analysis')
         self._mw.tabWidget.addTab(self._pe, 'Pulse Extraction')
         self._mw.tabWidget.addTab(self._pg, 'Pulse Generator')
@@ -236,6 +251,11 @@ class PulsedMeasurementGui(GUIBase):
         self._disconnect_dialog_signals()
         self._disconnect_logic_signals()
 
+        self._plot_update_timer.stop()
+        self._plot_update_timer.timeout.disconnect()
+        self._laser_sum_cache = (None, None)
+        self._release_laser_snapshot()
+
         self._mw.close()
         return
 
@@ -2234,10 +2254,22 @@ class PulsedMeasurementGui(GUIBase):
 
     @QtCore.Slot()
     def measurement_data_updated(self):
-        """
+        """ Redraw the measurement plots, at most _max_plot_update_rate times per second.
 
-        @return:
+        Updates arriving faster are combined into one delayed redraw.
         """
+        if self._plot_update_timer.isActive():
+            return
+        remaining_time = self._last_plot_update + 1 / self._max_plot_update_rate - time.perf_counter()
+        if remaining_time > 0:
+            self._plot_update_timer.start(int(np.ceil(remaining_time * 1000)))
+        else:
+            self._update_measurement_plots()
+        return
+
+    def _update_measurement_plots(self):
+        """ Update all measurement plots with the current data of the logic. """
+        self._last_plot_update = time.perf_counter()
         signal_data = self.pulsedmasterlogic().signal_data
         signal_alt_data = self.pulsedmasterlogic().signal_alt_data
         measurement_error = self.pulsedmasterlogic().measurement_error
@@ -2248,25 +2280,9 @@ class PulsedMeasurementGui(GUIBase):
         # Change second plot combobox if it has been changed in the logic
         self.second_plot_changed(self.pulsedmasterlogic().alternative_data_type)
 
-        # create ErrorBarItems
-        tmp_array = signal_data[0, 1:] - signal_data[0, :-1]
-        if len(tmp_array) > 0:
-            beamwidth = tmp_array.min() if tmp_array.min() > 0 else tmp_array.max()
-        else:
-            beamwidth = 0
-        del tmp_array
-        beamwidth /= 3
-        self.signal_image_error_bars.setData(x=signal_data[0],
-                                             y=signal_data[1],
-                                             top=measurement_error[1],
-                                             bottom=measurement_error[1],
-                                             beam=beamwidth)
-        if signal_data.shape[0] > 2 and measurement_error.shape[0] > 2:
-            self.signal_image_error_bars2.setData(x=signal_data[0],
-                                                  y=signal_data[2],
-                                                  top=measurement_error[2],
-                                                  bottom=measurement_error[2],
-                                                  beam=beamwidth)
+        # ErrorBarItems are only updated while they are shown
+        if self._pa.ana_param_errorbars_CheckBox.isChecked():
+            self._update_error_bars()
 
         # dealing with the actual signal plot
         self.signal_image.setData(x=signal_data[0], y=signal_data[1])
@@ -2287,6 +2303,31 @@ class PulsedMeasurementGui(GUIBase):
         self.update_laser_data()
         return
 
+    def _update_error_bars(self):
+        """ Set the data of the ErrorBarItems from the current measurement data. """
+        signal_data = self.pulsedmasterlogic().signal_data
+        measurement_error = self.pulsedmasterlogic().measurement_error
+
+        tmp_array = signal_data[0, 1:] - signal_data[0, :-1]
+        if len(tmp_array) > 0:
+            beamwidth = tmp_array.min() if tmp_array.min() > 0 else tmp_array.max()
+        else:
+            beamwidth = 0
+        del tmp_array
+        beamwidth /= 3
+        self.signal_image_error_bars.setData(x=signal_data[0],
+                                             y=signal_data[1],
+                                             top=measurement_error[1],
+                                             bottom=measurement_error[1],
+                                             beam=beamwidth)
+        if signal_data.shape[0] > 2 and measurement_error.shape[0] > 2:
+            self.signal_image_error_bars2.setData(x=signal_data[0],
+                                                  y=signal_data[2],
+                                                  top=measurement_error[2],
+                                                  bottom=measurement_error[2],
+                                                  beam=beamwidth)
+        return
+
     @QtCore.Slot()
     def fit_clicked(self):
         """Fits the current data"""
@@ -2607,6 +2648,7 @@ class PulsedMeasurementGui(GUIBase):
         """
         is_alternating = self.signal_image2 in self._pa.pulse_analysis_PlotWidget.items()
         if show_bars:
+            self._update_error_bars()
             if self.signal_image_error_bars not in self._pa.pulse_analysis_PlotWidget.items():
                 self._pa.pulse_analysis_PlotWidget.addItem(self.signal_image_error_bars)
             if is_alternating and self.signal_image_error_bars2 not in self._pa.pulse_analysis_PlotWidget.items():
@@ -2652,6 +2694,9 @@ class PulsedMeasurementGui(GUIBase):
                                             pen={'color': palette.c4, 'width': 1},
                                             movable=True)
         self.lasertrace_image = pg.PlotDataItem(np.arange(10), np.zeros(10), pen=palette.c1)
+        # min/max decimation to the visible pixel width, so long traces stay fast to draw
+        self.lasertrace_image.setDownsampling(auto=True, method='peak')
+        self.lasertrace_image.setClipToView(True)
         self._pe.laserpulses_PlotWidget.addItem(self.lasertrace_image)
         self._pe.laserpulses_PlotWidget.addItem(self.sig_start_line)
         self._pe.laserpulses_PlotWidget.addItem(self.sig_end_line)
@@ -2931,22 +2976,27 @@ class PulsedMeasurementGui(GUIBase):
         """
         laser_index = self._pe.laserpulses_ComboBox.currentIndex()
         show_raw = self._pe.laserpulses_display_raw_CheckBox.isChecked()
-        is_gated = len(self.pulsedmasterlogic().raw_data.shape) > 1
+
+        # Get a read-only snapshot of the data, skip the redraw if nothing changed
+        data_name = 'raw_data' if show_raw else 'laser_data'
+        version, data = self.pulsedmasterlogic().get_published_measurement_data(data_name)
+        if data is None:
+            return
+        plot_state = (data_name, laser_index, version)
+        if plot_state == self._laser_plot_state:
+            self.pulsedmasterlogic().release_published_measurement_data(data_name, version)
+            return
+        # The plot keeps the new snapshot, hand back the one shown before
+        self._release_laser_snapshot()
+        self._laser_plot_state = plot_state
 
         # Determine the right array to plot as y-data
-        if show_raw:
-            if is_gated:
-                if laser_index == 0:
-                    y_data = np.sum(self.pulsedmasterlogic().raw_data, axis=0)
-                else:
-                    y_data = self.pulsedmasterlogic().raw_data[laser_index - 1]
-            else:
-                y_data = self.pulsedmasterlogic().raw_data
+        if show_raw and data.ndim == 1:
+            y_data = data
+        elif laser_index == 0:
+            y_data = self._get_laser_sum(data)
         else:
-            if laser_index == 0:
-                y_data = np.sum(self.pulsedmasterlogic().laser_data, axis=0)
-            else:
-                y_data = self.pulsedmasterlogic().laser_data[laser_index - 1]
+            y_data = data[laser_index - 1]
 
         # Calculate the x-axis of the laser plot here
         bin_width = self.pulsedmasterlogic().fast_counter_settings['bin_width']
@@ -2956,4 +3006,24 @@ class PulsedMeasurementGui(GUIBase):
         self.lasertrace_image.setData(x=x_data, y=y_data)
         return
 
+    def _release_laser_snapshot(self):
+        """ Hand the data snapshot shown in the laser plot back to the logic. """
+        if self._laser_plot_state is not None:
+            data_name, laser_index, version = self._laser_plot_state
+            self.pulsedmasterlogic().release_published_measurement_data(data_name, version)
+            self._laser_plot_state = None
+        return
+
+    def _get_laser_sum(self, data):
+        """ Sum of the data over all lasers/gates. The logic publishes a new snapshot on every
+        update, so the sum is only calculated again for a new snapshot.
+
+        @param numpy.ndarray data: 2D array of the raw or laser data
+
+        @return numpy.ndarray: 1D sum over the first axis
+        """
+        if self._laser_sum_cache[0] is not data:
+            self._laser_sum_cache = (data, np.sum(data, axis=0))
+        return self._laser_sum_cache[1]
+
 
@@ -20,6 +20,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import numpy as np
+import threading
 import time
 
 from core.module import Base, Connector, ConfigOption
@@ -39,6 +40,12 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
 
     # config
     _clock_frequency = ConfigOption('clock_frequency', 100, missing='warn')
+    _num_points = ConfigOption('number_of_emitters', 500)
+    # only emitters closer than this many sigma to the scanned line are evaluated
+    _cutoff_sigma = ConfigOption('emitter_cutoff_sigma', 5.)
+    # timing model: a line takes pixels / clock_frequency plus a fixed setup time per line
+    _simulate_timing = ConfigOption('simulate_timing', True)
+    _line_setup_time = ConfigOption('line_setup_time', 0.)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -49,9 +56,12 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
 
         self._position_range = [[0, 100e-6], [0, 100e-6], [0, 100e-6], [0, 1e-6]]
         self._current_position = [0, 0, 0, 0][0:len(self.get_scanner_axes())]
-        self._num_points = 500
         self._cavity_position_range = [0, 20e-6]
 
+        # frame scanning runs in its own thread
+        self._frame_thread = None
+        self._frame_stop = threading.Event()
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -115,9 +125,12 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
         # offset
         self._points_z[:, 3] = 0
 
+        self._build_emitter_index()
+
     def on_deactivate(self):
         """ Deactivate properly the confocal scanner dummy.
         """
+        self.stop_frame_scan()
         self.reset_hardware()
 
     def reset_hardware(self):
@@ -311,28 +324,119 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
         if np.shape(line_path)[1] != self._line_length:
             self._set_up_line(np.shape(line_path)[1])
 
-        count_data = np.random.uniform(0, 2e4, self._line_length)
-        z_data = line_path[2, :]
+        return self._acquire_path(line_path, self._line_setup_time)
 
-        #TODO: Change the gaussian function here to the one from fitlogic and delete the local modules to calculate
-        #the gaussian functions
-        x_data = np.array(line_path[0, :])
-        y_data = np.array(line_path[1, :])
-        for i in range(self._num_points):
-            count_data += self.twoD_gaussian_function((x_data, y_data), *(self._points[i])
-                ) * self.gaussian_function(np.array(z_data), *(self._points_z[i]))
+    def _acquire_path(self, line_path, setup_time=0., record_counts=True):
+        """ Simulates driving the scanner along a path and counting photons on the way.
+
+        @param float[][4] line_path: array of 4-part tuples defining the voltage points
+        @param float setup_time: time needed to set up the hardware before the path is started
+        @param bool record_counts: whether the counts have to be calculated
 
-        time.sleep(self._line_length * 1. / self._clock_frequency)
-        time.sleep(self._line_length * 1. / self._clock_frequency)
+        @return float[k][3]: the photon counts per second, None if record_counts is False
+        """
+        start_time = time.perf_counter()
+        line_length = np.shape(line_path)[1]
+
+        line_counts = None
+        if record_counts:
+            count_data = np.random.uniform(0, 2e4, line_length)
+
+            x_data = np.asarray(line_path[0, :], dtype=float)
+            y_data = np.asarray(line_path[1, :], dtype=float)
+            z_data = np.asarray(line_path[2, :], dtype=float)
+            emitters = self._get_emitters_near_line(x_data, y_data)
+            if emitters.size > 0:
+                count_data += self._emitter_signal(x_data, y_data, z_data, emitters)
+
+            line_counts = np.array([
+                    count_data,
+                    5e5 - count_data,
+                    np.ones(count_data.shape) * line_path[1, 0] * 100
+                ]).transpose()
+
+        if self._simulate_timing:
+            line_time = line_length / self._clock_frequency + setup_time
+            remaining_time = line_time - (time.perf_counter() - start_time)
+            if remaining_time > 0:
+                time.sleep(remaining_time)
 
         # update the scanner position instance variable
         self._current_position = list(line_path[:, -1])
 
-        return np.array([
-                count_data,
-                5e5 - count_data,
-                np.ones(count_data.shape) * line_path[1, 0] * 100
-            ]).transpose()
+        return line_counts
+
+    def get_frame_scan_supported(self):
+        """ Whether the hardware can scan a whole frame with scan_frame.
+
+        @return bool: True if scan_frame and stop_frame_scan are implemented
+        """
+        return True
+
+    def scan_frame(self, line_paths, return_paths, row_callback, start_path=None):
+        """ Sets up the complete raster of a frame once and scans it in the background.
+
+        @param list(float[n][k]) line_paths: paths of the scan lines for the n scanner axes
+        @param list(float[n][l]) return_paths: paths driven after each scan line, same length
+                                               as line_paths
+        @param callable row_callback: function called with (int row, float[k][m] counts)
+        @param float[n][j] start_path: optional path driven before the first line
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if len(line_paths) != len(return_paths):
+            self.log.error('Number of scan lines ({0:d}) and return lines ({1:d}) differ.'
+                           ''.format(len(line_paths), len(return_paths)))
+            return -1
+
+        # a previous frame may still drive its last return line
+        if self._frame_thread is not None:
+            self._frame_thread.join()
+
+        self._frame_stop.clear()
+        self._frame_thread = threading.Thread(
+            target=self._run_frame,
+            args=(line_paths, return_paths, row_callback, start_path),
+            name='ConfocalScannerDummyFrame',
+            daemon=True)
+        self._frame_thread.start()
+        return 0
+
+    def _run_frame(self, line_paths, return_paths, row_callback, start_path):
+        """ Scans all lines of a frame. Runs in the frame thread.
+        """
+        row = 0
+        try:
+            # the raster is set up only once for the whole frame
+            setup_time = self._line_setup_time
+            if start_path is not None:
+                self._acquire_path(np.asarray(start_path), setup_time, record_counts=False)
+                setup_time = 0.
+
+            for row, (line_path, return_path) in enumerate(zip(line_paths, return_paths)):
+                if self._frame_stop.is_set():
+                    return
+                line_counts = self._acquire_path(np.asarray(line_path), setup_time)
+                setup_time = 0.
+                if self._frame_stop.is_set():
+                    return
+                row_callback(row, line_counts)
+                self._acquire_path(np.asarray(return_path), record_counts=False)
+        except:
+            self.log.exception('Frame scan failed.')
+            if not self._frame_stop.is_set():
+                row_callback(row, np.array([[-1.]]))
+
+    def stop_frame_scan(self):
+        """ Aborts a running frame scan and waits until the scanner is idle.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        self._frame_stop.set()
+        if self._frame_thread is not None:
+            self._frame_thread.join()
+            self._frame_thread = None
+        return 0
 
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards.
@@ -352,6 +456,89 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
         self.log.debug('ConfocalScannerDummy>close_scanner_clock')
         return 0
 
+    def _build_emitter_index(self):
+        """ Sort the emitters into square xy grid buckets for fast lookup along a scan line.
+
+        The bucket size is the cutoff distance of the brightest/widest emitter, so all emitters
+        contributing to a pixel are found in the buckets overlapping the line bounding box
+        extended by one bucket.
+        """
+        max_sigma = np.abs(self._points[:, 3:5]).max() if self._num_points > 0 else 0
+        max_sigma = max(max_sigma, 1e-12)
+        self._cutoff_distance = self._cutoff_sigma * max_sigma
+        self._bucket_size = self._cutoff_distance
+        self._bucket_origin = np.array([self._position_range[0][0], self._position_range[1][0]])
+
+        bucket_xy = np.floor(
+            (self._points[:, 1:3] - self._bucket_origin) / self._bucket_size).astype(int)
+        self._bucket_shape = np.maximum(bucket_xy.max(axis=0) + 1, 1) if self._num_points > 0 \
+            else np.array([1, 1])
+        bucket_xy = np.clip(bucket_xy, 0, self._bucket_shape - 1)
+        bucket_id = bucket_xy[:, 0] * self._bucket_shape[1] + bucket_xy[:, 1]
+
+        # CSR like layout: emitters sorted by bucket, bucket i owns [start[i], start[i + 1])
+        self._bucket_order = np.argsort(bucket_id, kind='stable')
+        self._bucket_start = np.searchsorted(
+            bucket_id[self._bucket_order], np.arange(np.prod(self._bucket_shape) + 1))
+
+    def _get_emitters_near_line(self, x_data, y_data):
+        """ Get the indices of all emitters within the cutoff distance of the given line.
+
+        @param numpy.ndarray x_data: x positions of the line
+        @param numpy.ndarray y_data: y positions of the line
+
+        @return numpy.ndarray: indices into self._points
+        """
+        lower = np.array([x_data.min(), y_data.min()]) - self._cutoff_distance
+        upper = np.array([x_data.max(), y_data.max()]) + self._cutoff_distance
+        b_min = np.floor((lower - self._bucket_origin) / self._bucket_size).astype(int)
+        b_max = np.floor((upper - self._bucket_origin) / self._bucket_size).astype(int)
+        b_min = np.clip(b_min, 0, self._bucket_shape - 1)
+        b_max = np.clip(b_max, 0, self._bucket_shape - 1)
+
+        # buckets along y are contiguous for a fixed x bucket index
+        chunks = list()
+        for bx in range(b_min[0], b_max[0] + 1):
+            first = bx * self._bucket_shape[1]
+            chunks.append(self._bucket_order[
+                self._bucket_start[first + b_min[1]]:self._bucket_start[first + b_max[1] + 1]])
+        if not chunks:
+            return np.empty(0, dtype=int)
+        candidates = np.concatenate(chunks)
+
+        # drop candidates outside of the exact bounding box
+        pos = self._points[candidates, 1:3]
+        inside = np.all((pos >= lower) & (pos <= upper), axis=1)
+        return candidates[inside]
+
+    def _emitter_signal(self, x_data, y_data, z_data, emitters):
+        """ Vectorized fluorescence of the given emitters along a line.
+
+        Evaluates the same model as twoD_gaussian_function * gaussian_function for all given
+        emitters at once.
+
+        @param numpy.ndarray x_data: x positions of the line
+        @param numpy.ndarray y_data: y positions of the line
+        @param numpy.ndarray z_data: z positions of the line
+        @param numpy.ndarray emitters: indices of the emitters to evaluate
+
+        @return numpy.ndarray: summed counts per pixel
+        """
+        amplitude, x_zero, y_zero, sigma_x, sigma_y, theta, offset = \
+            (col[:, np.newaxis] for col in self._points[emitters].T)
+        z_amplitude, z_zero, z_sigma, z_offset = \
+            (col[:, np.newaxis] for col in self._points_z[emitters].T)
+
+        a = (np.cos(theta)**2) / (2 * sigma_x**2) + (np.sin(theta)**2) / (2 * sigma_y**2)
+        b = -(np.sin(2 * theta)) / (4 * sigma_x**2) + (np.sin(2 * theta)) / (4 * sigma_y**2)
+        c = (np.sin(theta)**2) / (2 * sigma_x**2) + (np.cos(theta)**2) / (2 * sigma_y**2)
+        dx = x_data[np.newaxis, :] - x_zero
+        dy = y_data[np.newaxis, :] - y_zero
+        xy_signal = offset + amplitude * np.exp(-(a * dx**2 + 2 * b * dx * dy + c * dy**2))
+        z_signal = z_offset + z_amplitude * np.exp(
+            -(z_data[np.newaxis, :] - z_zero)**2 / (2 * z_sigma**2))
+        return np.sum(xy_signal * z_signal, axis=0)
+
 ############################################################################
 #                                                                          #
 #    the following two functions are needed to fluoreschence signal        #
@@ -162,6 +162,48 @@ class ConfocalScannerInterface(metaclass=InterfaceMetaclass):
         """
         pass
 
+    def get_frame_scan_supported(self):
+        """ Whether the hardware can scan a whole frame with scan_frame.
+
+        Frame scanning is optional, hardware not overriding this method is scanned line by line.
+
+        @return bool: True if scan_frame and stop_frame_scan are implemented
+        """
+        return False
+
+    def scan_frame(self, line_paths, return_paths, row_callback, start_path=None):
+        """ Sets up the complete raster of a frame once and scans it in the background.
+
+        The scanner drives start_path (if given) and then each line of line_paths followed by
+        the corresponding return path, without configuring the hardware again between the lines.
+        Counts are only recorded on the lines of line_paths. As soon as a line is acquired
+        row_callback(row, counts) is called with the index of the line in line_paths and the
+        photon counts per second float[k][m] of its k pixels for the m channels. On an error
+        row_callback is called with counts np.array([[-1.]]) and the frame is aborted.
+
+        row_callback is called from a thread of the hardware, so it should only hand the data
+        over, e.g. by emitting a Qt signal or putting it into a queue.
+
+        @param list(float[n][k]) line_paths: paths of the scan lines for the n scanner axes
+        @param list(float[n][l]) return_paths: paths driven after each scan line, same length
+                                               as line_paths
+        @param callable row_callback: function called with (int row, float[k][m] counts)
+        @param float[n][j] start_path: optional path driven before the first line
+
+        @return int: error code (0:OK, -1:error)
+        """
+        self.log.error('Frame scanning is not supported by this scanner.')
+        return -1
+
+    def stop_frame_scan(self):
+        """ Aborts a running frame scan and waits until the scanner is idle.
+
+        row_callback of scan_frame is not called anymore after this method returned.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        return 0
+
     @abc.abstractmethod
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards.
@@ -21,7 +21,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import abc
-from core.util.interfaces import InterfaceMetaclass
+from core.util.interfaces import InterfaceMetaclass, constant_method
 
 
 class FastCounterInterface(metaclass=InterfaceMetaclass):
@@ -30,6 +30,7 @@ class FastCounterInterface(metaclass=InterfaceMetaclass):
     _modtype = 'FastCounterInterface'
     _modclass = 'interface'
 
+    @constant_method
     @abc.abstractmethod
     def get_constraints(self):
         """ Retrieve the hardware constrains from the Fast counting device.
@@ -21,7 +21,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import abc
-from core.util.interfaces import InterfaceMetaclass
+from core.util.interfaces import InterfaceMetaclass, constant_method
 
 
 class MagnetInterface(metaclass=InterfaceMetaclass):
@@ -32,6 +32,7 @@ class MagnetInterface(metaclass=InterfaceMetaclass):
     _modtype = 'MagnetInterface'
     _modclass = 'interface'
 
+    @constant_method
     @abc.abstractmethod
     def get_constraints(self):
         """ Retrieve the hardware constrains from the magnet driving device.
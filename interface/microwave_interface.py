@@ -21,7 +21,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import abc
-from core.util.interfaces import InterfaceMetaclass
+from core.util.interfaces import InterfaceMetaclass, constant_method
 from core.util.units import in_range
 from enum import Enum
 
@@ -203,6 +203,7 @@ class MicrowaveInterface(metaclass=InterfaceMetaclass):
         """
         pass
 
+    @constant_method
     @abc.abstractmethod
     def get_limits(self):
         """ Return the device-specific limits in a nested dictionary.
@@ -21,7 +21,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import abc
-from core.util.interfaces import InterfaceMetaclass
+from core.util.interfaces import InterfaceMetaclass, constant_method
 
 
 class MotorInterface(metaclass=InterfaceMetaclass):
@@ -34,6 +34,7 @@ class MotorInterface(metaclass=InterfaceMetaclass):
     _modtype = 'MotorInterface'
     _modclass = 'interface'
 
+    @constant_method
     @abc.abstractmethod
     def get_constraints(self):
         """ Retrieve the hardware constrains from the motor device.
@@ -22,7 +22,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 
 import abc
-from core.util.interfaces import InterfaceMetaclass, ScalarConstraint
+from core.util.interfaces import InterfaceMetaclass, ScalarConstraint, constant_method
 
 
 class PulserInterface(metaclass=InterfaceMetaclass):
@@ -33,6 +33,7 @@ class PulserInterface(metaclass=InterfaceMetaclass):
     _modtype = 'PulserInterface'
     _modclass = 'interface'
 
+    @constant_method
     @abc.abstractmethod
     def get_constraints(self):
         """
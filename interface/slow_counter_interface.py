@@ -22,7 +22,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 import abc
 from enum import Enum
-from core.util.interfaces import InterfaceMetaclass
+from core.util.interfaces import InterfaceMetaclass, constant_method
 
 
 class SlowCounterInterface(metaclass=InterfaceMetaclass):
@@ -31,6 +31,7 @@ class SlowCounterInterface(metaclass=InterfaceMetaclass):
     _modtype = 'SlowCounterInterface'
     _modclass = 'interface'
 
+    @constant_method
     @abc.abstractmethod
     def get_constraints(self):
         """ Retrieve the hardware constrains from the counter device.
@@ -22,16 +22,18 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 from collections import OrderedDict
 from copy import copy
+import os
+import shutil
+import tempfile
 import time
 import datetime
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 from io import BytesIO
 
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
 from core.module import Connector, ConfigOption, StatusVar
+from logic.scan_image import ScanImage, draw_scan_figure
 
 
 class OldConfigFileError(Exception):
@@ -44,6 +46,12 @@ class OldConfigFileError(Exception):
 class ConfocalHistoryEntry(QtCore.QObject):
     """ This class contains all relevant parameters of a Confocal scan.
         It provides methods to extract, restore and serialize this data.
+
+        Only the count channels of the images are kept, the coordinates are
+        recreated from ranges and resolution on restore. Count arrays that did
+        not change since the previous history entry are shared (read-only)
+        instead of copied, and old entries can be spilled to memory-mapped
+        files on disk.
     """
 
     def __init__(self, confocal):
@@ -132,22 +140,27 @@ class ConfocalHistoryEntry(QtCore.QObject):
 
         confocal.initialize_image()
         try:
-            if confocal.xy_image.shape == self.xy_image.shape:
-                confocal.xy_image = np.copy(self.xy_image)
+            if confocal.xy_image[:, :, 3:].shape == self.xy_counts.shape:
+                confocal.xy_image[:, :, 3:] = self.xy_counts
         except AttributeError:
-            self.xy_image = np.copy(confocal.xy_image)
+            self.xy_counts = self._read_only_copy(confocal.xy_image[:, :, 3:])
 
         confocal._zscan = True
         confocal.initialize_image()
         try:
-            if confocal.depth_image.shape == self.depth_image.shape:
-                confocal.depth_image = np.copy(self.depth_image)
+            if confocal.depth_image[:, :, 3:].shape == self.depth_counts.shape:
+                confocal.depth_image[:, :, 3:] = self.depth_counts
         except AttributeError:
-            self.depth_image = np.copy(confocal.depth_image)
+            self.depth_counts = self._read_only_copy(confocal.depth_image[:, :, 3:])
         confocal._zscan = False
 
-    def snapshot(self, confocal):
-        """ Extract all necessary data from a confocal logic and keep it for later use """
+    def snapshot(self, confocal, previous=None):
+        """ Extract all necessary data from a confocal logic and keep it for later use
+
+        @param ConfocalLogic confocal: the logic to take the snapshot from
+        @param list previous: optional, history entries whose count arrays are
+                              shared if the images did not change since then
+        """
         self.current_x = confocal._current_x
         self.current_y = confocal._current_y
         self.current_z = confocal._current_z
@@ -172,11 +185,57 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.point1 = np.copy(confocal.point1)
         self.point2 = np.copy(confocal.point2)
         self.point3 = np.copy(confocal.point3)
-        self.xy_image = np.copy(confocal.xy_image)
-        self.depth_image = np.copy(confocal.depth_image)
-
-    def serialize(self):
-        """ Give out a dictionary that can be saved via the usual means """
+        if previous is None:
+            previous = []
+        self.xy_counts = self._share_or_copy(
+            confocal.xy_image[:, :, 3:], [entry.xy_counts for entry in previous])
+        self.depth_counts = self._share_or_copy(
+            confocal.depth_image[:, :, 3:], [entry.depth_counts for entry in previous])
+
+    @staticmethod
+    def _read_only_copy(array):
+        """ Copy an array and protect the copy against modification, so that it can be shared. """
+        array = np.array(array)
+        array.flags.writeable = False
+        return array
+
+    def _share_or_copy(self, counts, candidates):
+        """ Return an equal array from candidates or a read-only copy of counts. """
+        for candidate in candidates:
+            if candidate.shape == counts.shape and np.array_equal(candidate, counts):
+                return candidate
+        return self._read_only_copy(counts)
+
+    def is_spilled(self):
+        """ Check whether the count arrays of this entry are memory-mapped files. """
+        return isinstance(self.xy_counts, np.memmap) and isinstance(self.depth_counts, np.memmap)
+
+    def spill(self, directory, history):
+        """ Move the count arrays to memory-mapped files in the given directory.
+
+        @param str directory: the directory to write the files to
+        @param list history: all history entries, entries sharing an array with
+                             this one get the memory-mapped array as well
+        """
+        for name in ('xy_counts', 'depth_counts'):
+            array = getattr(self, name)
+            if isinstance(array, np.memmap):
+                continue
+            handle, filename = tempfile.mkstemp(suffix='.npy', prefix=name + '_', dir=directory)
+            with os.fdopen(handle, 'wb') as file:
+                np.save(file, array)
+            mapped = np.load(filename, mmap_mode='r')
+            for entry in history:
+                if getattr(entry, name, None) is array:
+                    setattr(entry, name, mapped)
+
+    def serialize(self, shared=None):
+        """ Give out a dictionary that can be saved via the usual means
+
+        @param dict shared: optional, maps id() of already serialized count arrays
+                            to the key of the status variable containing them.
+                            Arrays found here are stored as a reference only.
+        """
         serialized = dict()
         serialized['focus_position'] = [self.current_x, self.current_y, self.current_z, self.current_a]
         serialized['x_range'] = list(self.image_x_range)
@@ -197,8 +256,13 @@ class ConfocalHistoryEntry(QtCore.QObject):
         serialized['tilt_point3'] = list(self.point3)
         serialized['tilt_reference'] = [self.tilt_reference_x, self.tilt_reference_y]
         serialized['tilt_slope'] = [self.tilt_slope_x, self.tilt_slope_y]
-        serialized['xy_image'] = self.xy_image
-        serialized['depth_image'] = self.depth_image
+        for name in ('xy_counts', 'depth_counts'):
+            array = getattr(self, name)
+            if shared is not None and id(array) in shared:
+                serialized[name + '_ref'] = shared[id(array)]
+            else:
+                # memory-mapped files are removed on deactivation, so load them
+                serialized[name] = np.array(array) if isinstance(array, np.memmap) else array
         return serialized
 
     def deserialize(self, serialized):
@@ -236,16 +300,20 @@ class ConfocalHistoryEntry(QtCore.QObject):
             self.point2 = np.array(serialized['tilt_point2'])
         if 'tilt_point3' in serialized and len(serialized['tilt_point3']) == 3:
             self.point3 = np.array(serialized['tilt_point3'])
-        if 'xy_image' in serialized:
-            if isinstance(serialized['xy_image'], np.ndarray):
-                self.xy_image = serialized['xy_image']
-            else:
-                raise OldConfigFileError()
-        if 'depth_image' in serialized:
-            if isinstance(serialized['depth_image'], np.ndarray):
-                self.depth_image = serialized['depth_image'].copy()
+        for name, old_name in (('xy_counts', 'xy_image'), ('depth_counts', 'depth_image')):
+            if name in serialized:
+                array = serialized[name]
+            elif old_name in serialized:
+                # images saved with coordinates, drop them
+                if not isinstance(serialized[old_name], np.ndarray):
+                    raise OldConfigFileError()
+                array = np.ascontiguousarray(serialized[old_name][:, :, 3:])
             else:
+                continue
+            if not isinstance(array, np.ndarray):
                 raise OldConfigFileError()
+            array.flags.writeable = False
+            setattr(self, name, array)
 
 
 class ConfocalLogic(GenericLogic):
@@ -255,14 +323,25 @@ class ConfocalLogic(GenericLogic):
     _modclass = 'confocallogic'
     _modtype = 'logic'
 
+    # class of the history entries, scanning logics based on this one can extend it
+    _history_entry_class = ConfocalHistoryEntry
+
     # declare connectors
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # dtype of the counts in xy_image and depth_image
+    image_dtype = ConfigOption('image_dtype', 'float32', missing='nothing')
+
     # status vars
     _clock_frequency = StatusVar('clock_frequency', 500)
     return_slowness = StatusVar(default=50)
     max_history_length = StatusVar(default=10)
+    # number of newest history entries kept in memory, older ones are spilled to disk
+    history_memory_length = StatusVar(default=3)
+    # hand the whole image to the scanner at once if the hardware supports it
+    frame_scanning = StatusVar(default=True)
 
     # signals
     signal_start_scanning = QtCore.Signal(str)
@@ -272,6 +351,8 @@ class ConfocalLogic(GenericLogic):
     signal_xy_image_updated = QtCore.Signal()
     signal_depth_image_updated = QtCore.Signal()
     signal_change_position = QtCore.Signal(str)
+    # emitted from the scanner while a frame is scanned, carries row index and counts
+    _sigFrameRowScanned = QtCore.Signal(int, object)
     signal_xy_data_saved = QtCore.Signal()
     signal_depth_data_saved = QtCore.Signal()
     signal_tilt_correction_active = QtCore.Signal(bool)
@@ -297,6 +378,9 @@ class ConfocalLogic(GenericLogic):
         self.depth_scan_dir_is_xz = True
         self.depth_img_is_xz = True
         self.permanent_scan = False
+        # frame scan state, the frame starts at image row _frame_row_offset
+        self._frame_scan_active = False
+        self._frame_row_offset = 0
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -309,11 +393,14 @@ class ConfocalLogic(GenericLogic):
         self.y_range = self._scanning_device.get_position_range()[1]
         self.z_range = self._scanning_device.get_position_range()[2]
 
+        self._history_dir = tempfile.mkdtemp(prefix='qudi_confocal_history_')
+
         # restore here ...
+        self._resolve_history_references()
         self.history = []
         for i in reversed(range(1, self.max_history_length)):
             try:
-                new_history_item = ConfocalHistoryEntry(self)
+                new_history_item = self._history_entry_class(self)
                 new_history_item.deserialize(
                     self._statusVariables['history_{0}'.format(i)])
                 self.history.append(new_history_item)
@@ -326,21 +413,23 @@ class ConfocalLogic(GenericLogic):
                 self.log.warning(
                         'Restoring history {0} failed.'.format(i))
         try:
-            new_state = ConfocalHistoryEntry(self)
+            new_state = self._history_entry_class(self)
             new_state.deserialize(self._statusVariables['history_0'])
             new_state.restore(self)
         except:
-            new_state = ConfocalHistoryEntry(self)
+            new_state = self._history_entry_class(self)
             new_state.restore(self)
         finally:
             self.history.append(new_state)
 
         self.history_index = len(self.history) - 1
+        self._spill_history()
 
         # Sets connections between signals and functions
         self.signal_scan_lines_next.connect(self._scan_line, QtCore.Qt.QueuedConnection)
         self.signal_start_scanning.connect(self.start_scanner, QtCore.Qt.QueuedConnection)
         self.signal_continue_scanning.connect(self.continue_scanner, QtCore.Qt.QueuedConnection)
+        self._sigFrameRowScanned.connect(self._frame_row_scanned, QtCore.Qt.QueuedConnection)
 
         self._change_position('activation')
 
@@ -349,15 +438,92 @@ class ConfocalLogic(GenericLogic):
 
         @return int: error code (0:OK, -1:error)
         """
-        closing_state = ConfocalHistoryEntry(self)
-        closing_state.snapshot(self)
+        closing_state = self._history_entry_class(self)
+        closing_state.snapshot(self, self.history[-1:])
         self.history.append(closing_state)
         histindex = 0
+        shared = dict()
         for state in reversed(self.history):
-            self._statusVariables['history_{0}'.format(histindex)] = state.serialize()
+            key = 'history_{0}'.format(histindex)
+            serialized = state.serialize(shared)
+            for name in ('xy_counts', 'depth_counts'):
+                if name in serialized:
+                    shared[id(getattr(state, name))] = key
+            self._statusVariables[key] = serialized
             histindex += 1
+
+        # close the memory maps before removing their files
+        removed = self.history
+        self.history = []
+        self._release_history_entries(removed)
+        shutil.rmtree(self._history_dir, ignore_errors=True)
         return 0
 
+    def _resolve_history_references(self):
+        """ Replace references to count arrays of other history status variables by the arrays.
+
+        Identical images are only saved once, see ConfocalHistoryEntry.serialize.
+        """
+        for key, serialized in self._statusVariables.items():
+            if not key.startswith('history_') or not isinstance(serialized, dict):
+                continue
+            for name in ('xy_counts', 'depth_counts'):
+                ref = serialized.get(name + '_ref')
+                if ref is None:
+                    continue
+                try:
+                    serialized[name] = self._statusVariables[ref][name]
+                except (KeyError, TypeError):
+                    self.log.warning('Could not resolve history image reference {0}.'.format(ref))
+
+    def _add_history_entry(self):
+        """ Take a snapshot of the current state and append it to the history. """
+        new_history = self._history_entry_class(self)
+        candidates = [self.history[-1]] if self.history else []
+        if 0 <= self.history_index < len(self.history) - 1:
+            candidates.append(self.history[self.history_index])
+        new_history.snapshot(self, candidates)
+        self.history.append(new_history)
+        if len(self.history) > self.max_history_length:
+            self._release_history_entries([self.history.pop(0)])
+        self.history_index = len(self.history) - 1
+        self._spill_history()
+
+    def _release_history_entries(self, removed):
+        """ Close and delete the memory-mapped files of removed history entries, which are not
+        used by an entry left in the history.
+
+        @param list removed: the entries removed from the history
+        """
+        for name in ('xy_counts', 'depth_counts'):
+            kept = [getattr(entry, name, None) for entry in self.history]
+            for entry in removed:
+                array = getattr(entry, name, None)
+                if not isinstance(array, np.memmap) or any(array is other for other in kept):
+                    continue
+                # no entry may refer to the memory map after it is closed
+                for other in removed:
+                    if getattr(other, name, None) is array:
+                        setattr(other, name, None)
+                filename = array.filename
+                array._mmap.close()
+                try:
+                    os.remove(filename)
+                except OSError:
+                    self.log.warning('Could not delete confocal history file {0}.'.format(filename))
+
+    def _spill_history(self):
+        """ Move all but the newest history_memory_length entries to memory-mapped files. """
+        num_spilled = max(len(self.history) - max(int(self.history_memory_length), 1), 0)
+        for entry in self.history[:num_spilled]:
+            if entry.is_spilled():
+                continue
+            try:
+                entry.spill(self._history_dir, self.history)
+            except OSError:
+                self.log.exception('Could not spill confocal history to disk.')
+                return
+
     def switch_hardware(self, to_on=False):
         """ Switches the Hardware off or on.
 
@@ -495,40 +661,28 @@ class ConfocalLogic(GenericLogic):
             # depth scan is in xz plane
             if self.depth_img_is_xz:
                 #self._image_horz_axis = self._X
-                # creates an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._X),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = np.full(
-                    (len(self._image_vert_axis), len(self._X)), self._XL)
-
-                self.depth_image[:, :, 1] = self._current_y * np.ones(
-                    (len(self._image_vert_axis), len(self._X)))
-
-                z_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
+                # image with the counts of each pixel, x varies along the lines
+                self.depth_image = ScanImage(
+                    len(self._image_vert_axis),
+                    len(self._X),
+                    len(self.get_scanner_count_channels()),
+                    [(ScanImage.COLUMN, self._XL),
+                     (ScanImage.ROW, self._current_y),
+                     (ScanImage.ROW, self._Z)],
+                    dtype=self.image_dtype)
 
             # depth scan is yz plane instead of xz plane
             else:
                 #self._image_horz_axis = self._Y
-                # creats an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._Y),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = self._current_x * np.ones(
-                    (len(self._image_vert_axis), len(self._Y)))
-
-                self.depth_image[:, :, 1] = np.full(
-                    (len(self._image_vert_axis), len(self._Y)), self._YL)
-
-                z_value_matrix = np.full((len(self._Y), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
+                # image with the counts of each pixel, y varies along the lines
+                self.depth_image = ScanImage(
+                    len(self._image_vert_axis),
+                    len(self._Y),
+                    len(self.get_scanner_count_channels()),
+                    [(ScanImage.ROW, self._current_x),
+                     (ScanImage.COLUMN, self._YL),
+                     (ScanImage.ROW, self._Z)],
+                    dtype=self.image_dtype)
 
                 # now we are scanning along the y-axis, so we need a new return line along Y:
                 self._return_YL = np.linspace(self._YL[-1], self._YL[0], self.return_slowness)
@@ -540,21 +694,15 @@ class ConfocalLogic(GenericLogic):
         else:
             #self._image_horz_axis = self._X
             self._image_vert_axis = self._Y
-            # creats an image where each pixel will be [x,y,z,counts]
-            self.xy_image = np.zeros((
-                    len(self._image_vert_axis),
-                    len(self._X),
-                    3 + len(self.get_scanner_count_channels())
-                ))
-
-            self.xy_image[:, :, 0] = np.full(
-                (len(self._image_vert_axis), len(self._X)), self._XL)
-
-            y_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Y)
-            self.xy_image[:, :, 1] = y_value_matrix.transpose()
-
-            self.xy_image[:, :, 2] = self._current_z * np.ones(
-                (len(self._image_vert_axis), len(self._X)))
+            # image with the counts of each pixel, z is stored per line
+            self.xy_image = ScanImage(
+                len(self._image_vert_axis),
+                len(self._X),
+                len(self.get_scanner_count_channels()),
+                [(ScanImage.COLUMN, self._XL),
+                 (ScanImage.ROW, self._Y),
+                 (ScanImage.ROW, self._current_z)],
+                dtype=self.image_dtype)
 
             self.sigImageXYInitialized.emit()
         return 0
@@ -590,7 +738,7 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
-        self.signal_scan_lines_next.emit()
+        self._start_scan_lines()
         return 0
 
     def continue_scanner(self):
@@ -619,7 +767,7 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
-        self.signal_scan_lines_next.emit()
+        self._start_scan_lines()
         return 0
 
     def kill_scanner(self):
@@ -627,6 +775,12 @@ class ConfocalLogic(GenericLogic):
 
         @return int: error code (0:OK, -1:error)
         """
+        if self._frame_scan_active:
+            self._frame_scan_active = False
+            try:
+                self._scanning_device.stop_frame_scan()
+            except Exception:
+                self.log.exception('Could not stop the frame scan.')
         try:
             self._scanning_device.close_scanner()
         except Exception as e:
@@ -725,33 +879,15 @@ class ConfocalLogic(GenericLogic):
                 else:
                     self._xy_line_pos = self._scan_counter
                 # add new history entry
-                new_history = ConfocalHistoryEntry(self)
-                new_history.snapshot(self)
-                self.history.append(new_history)
-                if len(self.history) > self.max_history_length:
-                    self.history.pop(0)
-                self.history_index = len(self.history) - 1
+                self._add_history_entry()
                 return
 
         image = self.depth_image if self._zscan else self.xy_image
-        n_ch = len(self.get_scanner_axes())
-        s_ch = len(self.get_scanner_count_channels())
 
         try:
             if self._scan_counter == 0:
-                # make a line from the current cursor position to
-                # the starting position of the first scan line of the scan
-                rs = self.return_slowness
-                lsx = np.linspace(self._current_x, image[self._scan_counter, 0, 0], rs)
-                lsy = np.linspace(self._current_y, image[self._scan_counter, 0, 1], rs)
-                lsz = np.linspace(self._current_z, image[self._scan_counter, 0, 2], rs)
-                if n_ch <= 3:
-                    start_line = np.vstack([lsx, lsy, lsz][0:n_ch])
-                else:
-                    start_line = np.vstack(
-                        [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
                 # move to the start position of the scan, counts are thrown away
-                start_line_counts = self._scanning_device.scan_line(start_line)
+                start_line_counts = self._scanning_device.scan_line(self._get_start_line(image))
                 if np.any(start_line_counts == -1):
                     self.stopRequested = True
                     self.signal_scan_lines_next.emit()
@@ -759,18 +895,10 @@ class ConfocalLogic(GenericLogic):
 
             # adjust z of line in image to current z before building the line
             if not self._zscan:
-                z_shape = image[self._scan_counter, :, 2].shape
-                image[self._scan_counter, :, 2] = self._current_z * np.ones(z_shape)
+                image[self._scan_counter, :, 2] = self._current_z
 
             # make a line in the scan, _scan_counter says which one it is
-            lsx = image[self._scan_counter, :, 0]
-            lsy = image[self._scan_counter, :, 1]
-            lsz = image[self._scan_counter, :, 2]
-            if n_ch <= 3:
-                line = np.vstack([lsx, lsy, lsz][0:n_ch])
-            else:
-                line = np.vstack(
-                    [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
+            line, return_line = self._get_scan_line_paths(image, self._scan_counter)
 
             # scan the line in the scan
             line_counts = self._scanning_device.scan_line(line, pixel_clock=True)
@@ -779,36 +907,6 @@ class ConfocalLogic(GenericLogic):
                 self.signal_scan_lines_next.emit()
                 return
 
-            # make a line to go to the starting position of the next scan line
-            if self.depth_img_is_xz or not self._zscan:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                        self._return_XL,
-                        image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                        image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape)
-                    ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            self._return_XL,
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape),
-                            np.ones(self._return_XL.shape) * self._current_a
-                        ])
-            else:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape)
-                        ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape),
-                            np.ones(self._return_YL.shape) * self._current_a
-                        ])
-
             # return the scanner to the start of next line, counts are thrown away
             return_line_counts = self._scanning_device.scan_line(return_line)
             if np.any(return_line_counts == -1):
@@ -817,15 +915,7 @@ class ConfocalLogic(GenericLogic):
                 return
 
             # update image with counts from the line we just scanned
-            if self._zscan:
-                if self.depth_img_is_xz:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                else:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                self.signal_depth_image_updated.emit()
-            else:
-                self.xy_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                self.signal_xy_image_updated.emit()
+            self._set_line_counts(self._scan_counter, line_counts)
 
             # next line in scan
             self._scan_counter += 1
@@ -847,6 +937,138 @@ class ConfocalLogic(GenericLogic):
             self.stop_scanning()
             self.signal_scan_lines_next.emit()
 
+    def _get_start_line(self, image):
+        """ Make a line from the current cursor position to the start of the current scan line.
+
+        @param ScanImage image: image which is scanned
+
+        @return float[n][k]: path for the n scanner axes
+        """
+        n_ch = len(self.get_scanner_axes())
+        rs = self.return_slowness
+        lsx = np.linspace(self._current_x, image[self._scan_counter, 0, 0], rs)
+        lsy = np.linspace(self._current_y, image[self._scan_counter, 0, 1], rs)
+        lsz = np.linspace(self._current_z, image[self._scan_counter, 0, 2], rs)
+        if n_ch <= 3:
+            return np.vstack([lsx, lsy, lsz][0:n_ch])
+        return np.vstack([lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
+
+    def _get_scan_line_paths(self, image, row):
+        """ Make the scan line of an image row and the line returning to its start.
+
+        @param ScanImage image: image which is scanned
+        @param int row: index of the image row
+
+        @return tuple(float[n][k], float[n][l]): scan line and return line for the n scanner axes
+        """
+        n_ch = len(self.get_scanner_axes())
+        lsx = image[row, :, 0]
+        lsy = image[row, :, 1]
+        lsz = image[row, :, 2]
+        if n_ch <= 3:
+            line = np.vstack([lsx, lsy, lsz][0:n_ch])
+        else:
+            line = np.vstack([lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
+
+        # make a line to go to the starting position of the next scan line
+        if self.depth_img_is_xz or not self._zscan:
+            return_axis = self._return_XL
+            return_line = [
+                return_axis,
+                image[row, 0, 1] * np.ones(return_axis.shape),
+                image[row, 0, 2] * np.ones(return_axis.shape)]
+        else:
+            return_axis = self._return_YL
+            return_line = [
+                image[row, 0, 1] * np.ones(return_axis.shape),
+                return_axis,
+                image[row, 0, 2] * np.ones(return_axis.shape)]
+        if n_ch <= 3:
+            return_line = np.vstack(return_line[0:n_ch])
+        else:
+            return_line = np.vstack(return_line + [np.ones(return_axis.shape) * self._current_a])
+        return line, return_line
+
+    def _set_line_counts(self, row, line_counts):
+        """ Write the counts of a scanned line into the image and notify about the update.
+
+        @param int row: index of the image row
+        @param float[k][m] line_counts: counts of the k pixels for the m count channels
+        """
+        s_ch = len(self.get_scanner_count_channels())
+        if self._zscan:
+            self.depth_image[row, :, 3:3 + s_ch] = line_counts
+            self.signal_depth_image_updated.emit()
+        else:
+            self.xy_image[row, :, 3:3 + s_ch] = line_counts
+            self.signal_xy_image_updated.emit()
+
+    def _start_scan_lines(self):
+        """ Start acquiring the image from the current line on.
+
+        If the scanner supports it and frame_scanning is enabled, all remaining lines including
+        the return lines are handed to the scanner at once and the counts arrive row by row in
+        _frame_row_scanned. Otherwise the image is scanned line by line in _scan_line.
+        """
+        self._frame_scan_active = False
+        if not self.frame_scanning or not self._scanning_device.get_frame_scan_supported():
+            self.signal_scan_lines_next.emit()
+            return
+
+        image = self.depth_image if self._zscan else self.xy_image
+        rows = range(self._scan_counter, np.size(self._image_vert_axis))
+        if not self._zscan:
+            image[self._scan_counter:, :, 2] = self._current_z
+        start_line = self._get_start_line(image) if self._scan_counter == 0 else None
+        paths = [self._get_scan_line_paths(image, row) for row in rows]
+
+        self._frame_row_offset = self._scan_counter
+        self._frame_scan_active = True
+        status = self._scanning_device.scan_frame(
+            [line for line, _ in paths],
+            [return_line for _, return_line in paths],
+            self._sigFrameRowScanned.emit,
+            start_path=start_line)
+        if status < 0:
+            self.log.error('Starting the frame scan failed.')
+            self._frame_scan_active = False
+            self.stopRequested = True
+            self.signal_scan_lines_next.emit()
+
+    def _frame_row_scanned(self, row, line_counts):
+        """ Handle a row of a running frame scan. Called in the logic thread.
+
+        @param int row: index of the row in the frame
+        @param float[k][m] line_counts: counts of the k pixels for the m count channels
+        """
+        if not self._frame_scan_active:
+            return
+        # stopping and cleaning up is done in _scan_line
+        if self.stopRequested or np.any(line_counts == -1):
+            self.stopRequested = True
+            self.signal_scan_lines_next.emit()
+            return
+
+        try:
+            self._set_line_counts(self._frame_row_offset + row, line_counts)
+            self._scan_counter = self._frame_row_offset + row + 1
+
+            if self._scan_counter >= np.size(self._image_vert_axis):
+                if not self.permanent_scan:
+                    self.stop_scanning()
+                    if self._zscan:
+                        self._zscan_continuable = False
+                    else:
+                        self._xyscan_continuable = False
+                    self.signal_scan_lines_next.emit()
+                else:
+                    self._scan_counter = 0
+                    self._start_scan_lines()
+        except:
+            self.log.exception('The scan went wrong, killing the scanner.')
+            self.stop_scanning()
+            self.signal_scan_lines_next.emit()
+
     def save_xy_data(self, colorscale_range=None, percentile_range=None):
         """ Save the current confocal xy data to file.
 
@@ -1050,122 +1272,9 @@ class ConfocalLogic(GenericLogic):
 
         @return: fig fig: a matplotlib figure object to be saved to file.
         """
-        if scan_axis is None:
-            scan_axis = ['X', 'Y']
-
-        # If no colorbar range was given, take full range of data
-        if cbar_range is None:
-            cbar_range = [np.min(data), np.max(data)]
-
-        # Scale color values using SI prefix
-        prefix = ['', 'k', 'M', 'G']
-        prefix_count = 0
-        image_data = data
-        draw_cb_range = np.array(cbar_range)
-        image_dimension = image_extent.copy()
-
-        while draw_cb_range[1] > 1000:
-            image_data = image_data/1000
-            draw_cb_range = draw_cb_range/1000
-            prefix_count = prefix_count + 1
-
-        c_prefix = prefix[prefix_count]
-
-
-        # Scale axes values using SI prefix
-        axes_prefix = ['', 'm', r'$\mathrm{\mu}$', 'n']
-        x_prefix_count = 0
-        y_prefix_count = 0
-
-        while np.abs(image_dimension[1]-image_dimension[0]) < 1:
-            image_dimension[0] = image_dimension[0] * 1000.
-            image_dimension[1] = image_dimension[1] * 1000.
-            x_prefix_count = x_prefix_count + 1
-
-        while np.abs(image_dimension[3] - image_dimension[2]) < 1:
-            image_dimension[2] = image_dimension[2] * 1000.
-            image_dimension[3] = image_dimension[3] * 1000.
-            y_prefix_count = y_prefix_count + 1
-
-        x_prefix = axes_prefix[x_prefix_count]
-        y_prefix = axes_prefix[y_prefix_count]
-
-        # Use qudi style
-        plt.style.use(self._save_logic.mpl_qd_style)
-
-        # Create figure
-        fig, ax = plt.subplots()
-
-        # Create image plot
-        cfimage = ax.imshow(image_data,
-                            cmap=plt.get_cmap('inferno'), # reference the right place in qd
-                            origin="lower",
-                            vmin=draw_cb_range[0],
-                            vmax=draw_cb_range[1],
-                            interpolation='none',
-                            extent=image_dimension
-                            )
-
-        ax.set_aspect(1)
-        ax.set_xlabel(scan_axis[0] + ' position (' + x_prefix + 'm)')
-        ax.set_ylabel(scan_axis[1] + ' position (' + y_prefix + 'm)')
-        ax.spines['bottom'].set_position(('outward', 10))
-        ax.spines['left'].set_position(('outward', 10))
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.get_xaxis().tick_bottom()
-        ax.get_yaxis().tick_left()
-
-        # draw the crosshair position if defined
-        if crosshair_pos is not None:
-            trans_xmark = mpl.transforms.blended_transform_factory(
-                ax.transData,
-                ax.transAxes)
-
-            trans_ymark = mpl.transforms.blended_transform_factory(
-                ax.transAxes,
-                ax.transData)
-
-            ax.annotate('', xy=(crosshair_pos[0]*np.power(1000,x_prefix_count), 0),
-                        xytext=(crosshair_pos[0]*np.power(1000,x_prefix_count), -0.01), xycoords=trans_xmark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-
-            ax.annotate('', xy=(0, crosshair_pos[1]*np.power(1000,y_prefix_count)),
-                        xytext=(-0.01, crosshair_pos[1]*np.power(1000,y_prefix_count)), xycoords=trans_ymark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-
-        # Draw the colorbar
-        cbar = plt.colorbar(cfimage, shrink=0.8)#, fraction=0.046, pad=0.08, shrink=0.75)
-        cbar.set_label('Fluorescence (' + c_prefix + 'c/s)')
-
-        # remove ticks from colorbar for cleaner image
-        cbar.ax.tick_params(which=u'both', length=0)
-
-        # If we have percentile information, draw that to the figure
-        if percentile_range is not None:
-            cbar.ax.annotate(str(percentile_range[0]),
-                             xy=(-0.3, 0.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate(str(percentile_range[1]),
-                             xy=(-0.3, 1.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate('(percentile)',
-                             xy=(-0.3, 0.5),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
+        fig = draw_scan_figure(data, image_extent, scan_axis=scan_axis, cbar_range=cbar_range,
+                               percentile_range=percentile_range, crosshair_pos=crosshair_pos,
+                               mpl_style=self._save_logic.mpl_qd_style)
         self.signal_draw_figure_completed.emit()
         return fig
 
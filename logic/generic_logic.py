@@ -18,6 +18,7 @@ along with Qudi. If not, see <http://www.gnu.org/licenses/>.
 Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
+import numpy as np
 from qtpy import QtCore
 from core.module import Base
 from core.util.mutex import Mutex
@@ -38,6 +39,13 @@ class GenericLogic(Base):
         super().__init__(**kwargs)
         self.taskLock = Mutex()
 
+        # published data arrays, name: (version, read-only snapshot)
+        self._published_data = dict()
+        # buffers of data published with copy=True,
+        # name: list of [buffer, version, number of readers holding it]
+        self._publish_buffers = dict()
+        self._publish_lock = Mutex()
+
     @QtCore.Slot(QtCore.QThread)
     def moveToThread(self, thread):
         super().moveToThread(thread)
@@ -61,3 +69,108 @@ class GenericLogic(Base):
                 return self._manager.tr
             else:
                 raise Exception('Tried to access task runner without loading one!')
+
+    def publish_data(self, name, data, copy=False):
+        """ Publish an array as read-only snapshot for other threads, e.g. the GUI.
+
+          @param str name: name of the published data
+          @param numpy.ndarray data: array to publish
+          @param bool copy: copy the data into a buffer instead of handing over the array
+
+          @return int: version of the published data, increased with every call
+
+          Without copy the logic hands over the array and must not modify it afterwards,
+          i.e. it has to replace it by a new array for the next update.
+          With copy the data is copied into one of two alternating buffers. A buffer is only
+          reused once every reader has handed its snapshot back with release_published_data,
+          otherwise a new buffer is allocated, so readers never see the data change.
+        """
+        data = np.asarray(data)
+        with self._publish_lock:
+            version = self._published_data.get(name, (0, None))[0] + 1
+            if copy:
+                data = self._get_free_publish_buffer(name, data, version)
+            else:
+                # a handed over array does not need to be tracked
+                self._publish_buffers.pop(name, None)
+            snapshot = data.view()
+            snapshot.flags.writeable = False
+            self._published_data[name] = (version, snapshot)
+        return version
+
+    def _get_free_publish_buffer(self, name, data, version):
+        """ Copy data into a publish buffer of name which is not held by any reader.
+
+          @param str name: name of the published data
+          @param numpy.ndarray data: array to copy
+          @param int version: version the buffer is published with
+
+          @return numpy.ndarray: the filled buffer
+        """
+        current_version = self._published_data.get(name, (0, None))[0]
+        buffers = self._publish_buffers.get(name, list())
+        current = None
+        free = None
+        for entry in buffers:
+            buf, buf_version, readers = entry
+            if buf_version == current_version:
+                current = entry
+            elif free is None and readers == 0 \
+                    and buf.shape == data.shape and buf.dtype == data.dtype:
+                free = entry
+        if free is None:
+            free = [np.empty_like(data), version, 0]
+        else:
+            free[1] = version
+        # Keep the published buffer and the new one. A dropped buffer is never reused, so
+        # readers still holding it keep a valid snapshot.
+        self._publish_buffers[name] = [free] if current is None else [free, current]
+        free[0][...] = data
+        return free[0]
+
+    def get_published_data(self, name, last_version=None):
+        """ Get the latest snapshot of published data.
+
+          @param str name: name of the published data
+          @param int last_version: optional, version the caller already has
+
+          @return tuple(int, numpy.ndarray): version and read-only snapshot of the data.
+                                             The snapshot is None if nothing has been published
+                                             under name or if the version equals last_version.
+
+          Every returned snapshot has to be handed back with release_published_data once the
+          caller does not use it anymore, otherwise its buffer can not be reused.
+        """
+        with self._publish_lock:
+            version, snapshot = self._published_data.get(name, (0, None))
+            if snapshot is None or (last_version is not None and version == last_version):
+                return version, None
+            for entry in self._publish_buffers.get(name, list()):
+                if entry[1] == version:
+                    entry[2] += 1
+                    break
+        return version, snapshot
+
+    def release_published_data(self, name, version):
+        """ Hand back a snapshot obtained with get_published_data.
+
+          @param str name: name of the published data
+          @param int version: version of the snapshot
+
+          The buffer of the snapshot can be reused once all readers have released it.
+        """
+        with self._publish_lock:
+            for entry in self._publish_buffers.get(name, list()):
+                if entry[1] == version:
+                    entry[2] = max(entry[2] - 1, 0)
+                    break
+
+    def get_published_version(self, name):
+        """ Get the version of published data without accessing it.
+
+          @param str name: name of the published data
+
+          @return int: version of the data, 0 if nothing has been published under name
+        """
+        with self._publish_lock:
+            return self._published_data.get(name, (0, None))[0]
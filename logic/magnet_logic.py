@@ -86,6 +86,9 @@ class MagnetLogic(GenericLogic):
     align_2d_axis1_step = StatusVar('align_2d_axis1_step', 1e-3)
     align_2d_axis1_vel = StatusVar('align_2d_axis1_vel', 10e-6)
     curr_2d_pathway_mode = StatusVar('curr_2d_pathway_mode', 'snake-wise')
+    # adaptive pathway: start with every n-th grid point and refine around the extremum
+    adaptive_2d_coarse_factor = StatusVar('adaptive_2d_coarse_factor', 4)
+    adaptive_2d_find_max = StatusVar('adaptive_2d_find_max', True)
 
     _checktime = StatusVar('_checktime', 2.5)
     _1D_axis0_data = StatusVar('_1D_axis0_data', np.zeros(2))
@@ -224,7 +227,8 @@ class MagnetLogic(GenericLogic):
         self._sigStepwiseAlignmentNext.connect(self._stepwise_loop_body,
                                                QtCore.Qt.QueuedConnection)
 
-        self.pathway_modes = ['spiral-in', 'spiral-out', 'snake-wise', 'diagonal-snake-wise']
+        self.pathway_modes = ['spiral-in', 'spiral-out', 'snake-wise', 'diagonal-snake-wise',
+                              'adaptive']
 
         # relative movement settings
 
@@ -505,6 +509,11 @@ class MagnetLogic(GenericLogic):
                     'patharray.'.format(self.current_2d_pathway_mode))
             return [], []
 
+        elif self.curr_2d_pathway_mode == 'adaptive':
+            return self._create_2d_adaptive_pathway(axis0_name, axis0_range, axis0_step,
+                                                    axis1_name, axis1_range, axis1_step,
+                                                    init_pos, axis0_vel, axis1_vel)
+
         # choose the snake-wise as default for now.
         else:
 
@@ -639,6 +648,124 @@ class MagnetLogic(GenericLogic):
         return pathway, back_map
 
 
+    def _create_2d_adaptive_pathway(self, axis0_name, axis0_range, axis0_step,
+                                    axis1_name, axis1_range, axis1_step, init_pos,
+                                    axis0_vel=None, axis1_vel=None):
+        """ Create the coarse starting pathway of the adaptive 2D alignment.
+
+        The points lie on the same grid as the snake-wise pathway, but only
+        every adaptive_2d_coarse_factor-th point along each axis is measured.
+        Whenever the pathway is finished, _extend_2d_adaptive_pathway appends
+        the points of the next finer grid around the extremum found so far,
+        until the full resolution is reached. The back_map indices refer to
+        the full grid, so the results end up in the usual 2D matrices.
+
+        @return tuple(list, dict): pathway and back_map, see _create_2d_pathway
+        """
+        grid = dict()
+        grid['axis0_name'] = axis0_name
+        grid['axis1_name'] = axis1_name
+        grid['axis0_start'] = round(init_pos[axis0_name] - axis0_range/2, 7)
+        grid['axis1_start'] = round(init_pos[axis1_name] - axis1_range/2, 7)
+        grid['axis0_step'] = axis0_step
+        grid['axis1_step'] = axis1_step
+        grid['axis0_num'] = int(axis0_range/axis0_step) + 1
+        grid['axis1_num'] = int(axis1_range/axis1_step) + 1
+        grid['axis0_vel'] = axis0_vel
+        grid['axis1_vel'] = axis1_vel
+        grid['stride'] = max(int(self.adaptive_2d_coarse_factor), 1)
+        self._adaptive_2d_grid = grid
+
+        # always include the last grid point, so that the whole range is covered
+        axis0_indices = list(range(0, grid['axis0_num'], grid['stride']))
+        if axis0_indices[-1] != grid['axis0_num'] - 1:
+            axis0_indices.append(grid['axis0_num'] - 1)
+        axis1_indices = list(range(0, grid['axis1_num'], grid['stride']))
+        if axis1_indices[-1] != grid['axis1_num'] - 1:
+            axis1_indices.append(grid['axis1_num'] - 1)
+
+        pathway = []
+        back_map = dict()
+        self._append_2d_adaptive_points(pathway, back_map, axis0_indices, axis1_indices)
+        return pathway, back_map
+
+    def _append_2d_adaptive_points(self, pathway, back_map, axis0_indices, axis1_indices,
+                                   skip_indices=None):
+        """ Append the grid points axis0_indices x axis1_indices snake-wise to the pathway.
+
+        @param list pathway: pathway to extend
+        @param dict back_map: back_map to extend
+        @param list axis0_indices: grid indices along axis0
+        @param list axis1_indices: grid indices along axis1
+        @param set skip_indices: optional, (axis0_index, axis1_index) tuples to leave out
+
+        @return int: number of appended points
+        """
+        grid = self._adaptive_2d_grid
+        if skip_indices is None:
+            skip_indices = set()
+
+        num_before = len(pathway)
+        path_index = len(pathway)
+        for row, axis1_index in enumerate(axis1_indices):
+            axis0_row = axis0_indices if row % 2 == 0 else axis0_indices[::-1]
+            for axis0_index in axis0_row:
+                if (axis0_index, axis1_index) in skip_indices:
+                    continue
+                axis0_pos = round(grid['axis0_start'] + axis0_index * grid['axis0_step'], 7)
+                axis1_pos = round(grid['axis1_start'] + axis1_index * grid['axis1_step'], 7)
+
+                step_config = dict()
+                step_config[grid['axis0_name']] = {'move_abs': axis0_pos}
+                step_config[grid['axis1_name']] = {'move_abs': axis1_pos}
+                if grid['axis0_vel'] is not None:
+                    step_config[grid['axis0_name']]['move_vel'] = grid['axis0_vel']
+                if grid['axis1_vel'] is not None:
+                    step_config[grid['axis1_name']]['move_vel'] = grid['axis1_vel']
+
+                pathway.append(step_config)
+                back_map[path_index] = {grid['axis0_name']: axis0_pos,
+                                        grid['axis1_name']: axis1_pos,
+                                        'index': (axis0_index, axis1_index)}
+                path_index += 1
+        return len(pathway) - num_before
+
+    def _extend_2d_adaptive_pathway(self):
+        """ Refine the adaptive 2D pathway around the current extremum.
+
+        The grid stride is halved and all not yet measured points of the finer
+        grid within one old stride around the best measured point are appended
+        to self._pathway and self._backmap.
+
+        @return int: number of appended points, 0 if the full resolution is reached
+        """
+        grid = self._adaptive_2d_grid
+        measured = set(self._backmap[index]['index'] for index in range(len(self._pathway)))
+
+        while grid['stride'] > 1:
+            old_stride = grid['stride']
+            grid['stride'] = max(old_stride // 2, 1)
+
+            measured_list = list(measured)
+            values = np.array([self._2D_data_matrix[index] for index in measured_list])
+            if self.adaptive_2d_find_max:
+                best = measured_list[int(np.argmax(values))]
+            else:
+                best = measured_list[int(np.argmin(values))]
+
+            axis0_indices = [ii for ii in range(best[0] - old_stride, best[0] + old_stride + 1)
+                             if 0 <= ii < grid['axis0_num'] and ii % grid['stride'] == 0]
+            axis1_indices = [ii for ii in range(best[1] - old_stride, best[1] + old_stride + 1)
+                             if 0 <= ii < grid['axis1_num'] and ii % grid['stride'] == 0]
+
+            num_added = self._append_2d_adaptive_points(self._pathway, self._backmap,
+                                                        axis0_indices, axis1_indices, measured)
+            if num_added > 0:
+                self.log.debug('Adaptive alignment: refined around index {0} with stride {1}, '
+                               '{2} new points.'.format(best, grid['stride'], num_added))
+                return num_added
+        return 0
+
     def _create_2d_cont_pathway(self, pathway):
 
         # go through the passed 1D path and reduce the whole movement just to
@@ -870,7 +997,7 @@ class MagnetLogic(GenericLogic):
         self._do_premeasurement_proc()
         pos = self._magnet_device.get_pos()
         end_pos = self._pathway[self._pathway_index]
-        self.log.debug('end_pos {0}'.format(end_pos))
+        self.log.debug('end_pos {0}'.format(end_pos), extra={'rate_limit': 1})
         differences = []
         for key in end_pos:
             differences.append((pos[key] - end_pos[key]['move_abs'])**2)
@@ -898,7 +1025,8 @@ class MagnetLogic(GenericLogic):
 
         self._2d_intended_fields.append(wanted_pos)
 
-        self.log.debug("Distance from desired position: {0}".format(distance))
+        self.log.debug("Distance from desired position: {0}".format(distance),
+                       extra={'rate_limit': 1})
         # perform here one of the chosen alignment measurements
         meas_val, add_meas_val = self._do_alignment_measurement()
 
@@ -910,6 +1038,10 @@ class MagnetLogic(GenericLogic):
         # increase the index
         self._pathway_index += 1
 
+        # in adaptive mode the pathway grows around the extremum found so far
+        if self._pathway_index >= len(self._pathway) and self.curr_2d_pathway_mode == 'adaptive':
+            self._extend_2d_adaptive_pathway()
+
         if (self._pathway_index) < len(self._pathway):
 
             #
@@ -924,9 +1056,11 @@ class MagnetLogic(GenericLogic):
 
             while self._check_is_moving():
                 time.sleep(self._checktime)
-                self.log.debug("Went into while loop in stepwise_loop_body")
+                self.log.debug("Went into while loop in stepwise_loop_body",
+                               extra={'rate_limit': 1})
 
-            self.log.debug("stepwise_loop_body reports magnet moving ? {0}".format(self._check_is_moving()))
+            self.log.debug("stepwise_loop_body reports magnet moving ? {0}".format(
+                self._check_is_moving()), extra={'rate_limit': 1})
 
             # this function will return to this function if position is reached:
             start_pos = dict()
@@ -52,10 +52,14 @@ class OptimizerLogic(GenericLogic):
     do_surface_subtraction = StatusVar('surface_subtraction', False)
     surface_subtr_scan_offset = StatusVar('surface_subtraction_offset', 1e-6)
     opt_channel = StatusVar('optimization_channel', 0)
+    adaptive_tolerance = StatusVar('adaptive_tolerance', 20e-9)
+    adaptive_max_iterations = StatusVar('adaptive_max_iterations', 3)
 
     # "private" signals to keep track of activities here in the optimizer logic
     _sigScanNextXyLine = QtCore.Signal()
     _sigScanZLine = QtCore.Signal()
+    _sigScanAxisLine = QtCore.Signal(str)
+    _sigScanAdaptive = QtCore.Signal()
     _sigCompletedXyOptimizerScan = QtCore.Signal()
     _sigDoNextOptimizationStep = QtCore.Signal()
     _sigFinishedAllOptimizationSteps = QtCore.Signal()
@@ -81,6 +85,9 @@ class OptimizerLogic(GenericLogic):
         # Keep track of who called the refocus
         self._caller_tag = ''
 
+        # Number of pixels (including return and move lines) of the last refocus
+        self.scanned_pixels = 0
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
 
@@ -123,10 +130,13 @@ class OptimizerLogic(GenericLogic):
 
         # Initialization of optimization sequence step counter
         self._optimization_step = 0
+        self._fallback_steps = list()
 
         # Sets connections between signals and functions
         self._sigScanNextXyLine.connect(self._refocus_xy_line, QtCore.Qt.QueuedConnection)
         self._sigScanZLine.connect(self.do_z_optimization, QtCore.Qt.QueuedConnection)
+        self._sigScanAxisLine.connect(self.do_line_optimization, QtCore.Qt.QueuedConnection)
+        self._sigScanAdaptive.connect(self.do_adaptive_optimization, QtCore.Qt.QueuedConnection)
         self._sigCompletedXyOptimizerScan.connect(self._set_optimized_xy_from_fit, QtCore.Qt.QueuedConnection)
 
         self._sigDoNextOptimizationStep.connect(self._do_next_optimization_step, QtCore.Qt.QueuedConnection)
@@ -144,13 +154,19 @@ class OptimizerLogic(GenericLogic):
 
     def check_optimization_sequence(self):
         """ Check the sequence of scan events for the optimization.
+
+        Valid steps are:
+            'XY': full 2D raster scan with a 2D gaussian fit
+            'X', 'Y', 'Z': single line scan through the current optimum with a 1D gaussian fit
+            'ADAPTIVE': iterative X, Y, Z line scans until the fitted center moves less than
+                        adaptive_tolerance or adaptive_max_iterations is reached
         """
 
-        # Check the supplied optimization sequence only contains 'XY' and 'Z'
-        if len(set(self.optimization_sequence).difference({'XY', 'Z'})) > 0:
+        # Check the supplied optimization sequence only contains known steps
+        if len(set(self.optimization_sequence).difference({'XY', 'Z', 'X', 'Y', 'ADAPTIVE'})) > 0:
             self.log.error('Requested optimization sequence contains unknown steps. Please provide '
-                           'a sequence containing only \'XY\' and \'Z\' strings. '
-                           'The default [\'XY\', \'Z\'] will be used.')
+                           'a sequence containing only \'XY\', \'X\', \'Y\', \'Z\' and '
+                           '\'ADAPTIVE\' strings. The default [\'XY\', \'Z\'] will be used.')
             self.optimization_sequence = ['XY', 'Z']
 
     def get_scanner_count_channels(self):
@@ -225,6 +241,8 @@ class OptimizerLogic(GenericLogic):
         #
         self._xy_scan_line_count = 0
         self._optimization_step = 0
+        self._fallback_steps = list()
+        self.scanned_pixels = 0
         self.check_optimization_sequence()
 
         scanner_status = self.start_scanner()
@@ -291,6 +309,16 @@ class OptimizerLogic(GenericLogic):
             len(self.get_scanner_count_channels())))
         self.z_fit_data = np.zeros(len(self._fit_zimage_Z_values))
 
+    def _scan_line(self, line):
+        """ Scan a line with the scanning device and keep track of the scanned pixels.
+
+        @param numpy.ndarray line: (n_axes, n_pixels) array of scanner positions
+
+        @return numpy.ndarray: the counts of the scanned line as returned by the hardware
+        """
+        self.scanned_pixels += np.shape(line)[1]
+        return self._scanning_device.scan_line(line)
+
     def _move_to_start_pos(self, start_pos):
         """Moves the scanner from its current position to the start position of the optimizer scan.
 
@@ -306,7 +334,7 @@ class OptimizerLogic(GenericLogic):
         else:
             move_to_start_line = np.vstack((lsx, lsy, lsz, np.ones(lsx.shape) * scanner_pos[3]))
 
-        counts = self._scanning_device.scan_line(move_to_start_line)
+        counts = self._scan_line(move_to_start_line)
         if np.any(counts == -1):
             return -1
 
@@ -351,7 +379,7 @@ class OptimizerLogic(GenericLogic):
         else:
             line = np.vstack((lsx, lsy, lsz, np.zeros(lsx.shape)))
 
-        line_counts = self._scanning_device.scan_line(line)
+        line_counts = self._scan_line(line)
         if np.any(line_counts == -1):
             self.log.error('The scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -366,7 +394,7 @@ class OptimizerLogic(GenericLogic):
         else:
             return_line = np.vstack((lsx, lsy, lsz, np.zeros(lsx.shape)))
 
-        return_line_counts = self._scanning_device.scan_line(return_line)
+        return_line_counts = self._scan_line(return_line)
         if np.any(return_line_counts == -1):
             self.log.error('The scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -430,6 +458,16 @@ class OptimizerLogic(GenericLogic):
         self._scan_z_line()
 
         # z-fit
+        self._fit_z_line()
+
+        self.sigImageUpdated.emit()
+        self._sigDoNextOptimizationStep.emit()
+
+    def _fit_z_line(self):
+        """ Fit the last z refocus line and set the optimized z position.
+
+        @return int: error code (0:OK, -1:fit failed or fitted center rejected)
+        """
         # If subtracting surface, then data can go negative and the gaussian fit offset constraints need to be adjusted
         if self.do_surface_subtraction:
             adjusted_param = {}
@@ -463,6 +501,7 @@ class OptimizerLogic(GenericLogic):
             self.optim_pos_z = self._initial_pos_z
             self.optim_sigma_z = 0.
             # interrupt here?
+            return -1
         else:  # move to new position
             #                @reviewer: Do we need this. With constraints not one of these cases will be possible....
             # checks if new pos is too far away
@@ -474,6 +513,7 @@ class OptimizerLogic(GenericLogic):
                     gauss, params = self._fit_logic.make_gaussianlinearoffset_model()
                     self.z_fit_data = gauss.eval(
                         x=self._fit_zimage_Z_values, params=result.params)
+                    return 0
                 else:  # new pos is too far away
                     # checks if new pos is too high
                     self.optim_sigma_z = 0.
@@ -489,10 +529,138 @@ class OptimizerLogic(GenericLogic):
                             self.optim_pos_z = self._initial_pos_z + 0.5 * self.refocus_Z_size
                         else:
                             self.optim_pos_z = self.z_range[0]  # moves to lowest possible value
+        return -1
+
+    def do_line_optimization(self, axis):
+        """ Optimize a single axis by a line scan through the current optimum.
+
+        @param str axis: the axis to optimize, 'X', 'Y' or 'Z'
+        """
+        if axis == 'Z':
+            self.do_z_optimization()
+            return
+
+        self._optimize_axis_line(axis)
 
         self.sigImageUpdated.emit()
         self._sigDoNextOptimizationStep.emit()
 
+    def _optimize_axis_line(self, axis):
+        """ Scan a line along x or y through the current optimum and fit a 1D gaussian to it.
+
+        @param str axis: the axis to optimize, 'X' or 'Y'
+
+        @return int: error code (0:OK, -1:error, fit failed or fitted center rejected)
+        """
+        if axis == 'X':
+            center, initial, scan_range = self.optim_pos_x, self._initial_pos_x, self.x_range
+        else:
+            center, initial, scan_range = self.optim_pos_y, self._initial_pos_y, self.y_range
+
+        vmin = np.clip(center - 0.5 * self.refocus_XY_size, scan_range[0], scan_range[1])
+        vmax = np.clip(center + 0.5 * self.refocus_XY_size, scan_range[0], scan_range[1])
+        values = np.linspace(vmin, vmax, num=self.optimizer_XY_res)
+
+        scan_x_line = self.optim_pos_x * np.ones(values.shape)
+        scan_y_line = self.optim_pos_y * np.ones(values.shape)
+        scan_z_line = self.optim_pos_z * np.ones(values.shape)
+        if axis == 'X':
+            scan_x_line = values
+        else:
+            scan_y_line = values
+
+        status = self._move_to_start_pos([scan_x_line[0], scan_y_line[0], scan_z_line[0]])
+        if status < 0:
+            self.log.error('Error during move to starting point.')
+            self.stop_refocus()
+            return -1
+
+        n_ch = len(self._scanning_device.get_scanner_axes())
+        if n_ch <= 3:
+            line = np.vstack((scan_x_line, scan_y_line, scan_z_line)[0:n_ch])
+        else:
+            line = np.vstack((scan_x_line, scan_y_line, scan_z_line, np.zeros(values.shape)))
+
+        line_counts = self._scan_line(line)
+        if np.any(line_counts == -1):
+            self.log.error('{0} scan went wrong, killing the scanner.'.format(axis))
+            self.stop_refocus()
+            return -1
+
+        result = self._fit_logic.make_gaussianlinearoffset_fit(
+            x_axis=values,
+            data=line_counts[:, self.opt_channel],
+            units='m',
+            estimator=self._fit_logic.estimate_gaussianlinearoffset_peak)
+
+        if result.success is False:
+            self.log.error('error in 1D Gaussian Fit of {0} line.'.format(axis))
+            return -1
+
+        new_center = result.best_values['center']
+        if abs(initial - new_center) >= self._max_offset \
+                or not scan_range[0] <= new_center <= scan_range[1]:
+            self.log.warning('Rejected the fitted {0} position {1:.3e}.'.format(axis, new_center))
+            return -1
+
+        if axis == 'X':
+            self.optim_pos_x = new_center
+            self.optim_sigma_x = result.best_values['sigma']
+        else:
+            self.optim_pos_y = new_center
+            self.optim_sigma_y = result.best_values['sigma']
+        return 0
+
+    def do_adaptive_optimization(self):
+        """ Iterative line scan optimization along x, y and z.
+
+        Instead of the full XY raster, single lines through the current optimum are scanned
+        along x, y and z. The iteration stops as soon as all fits succeeded and the fitted
+        center moved by less than adaptive_tolerance on all axes, so a well centered spot
+        needs only a single iteration. If that does not happen within adaptive_max_iterations,
+        the optimum is reset to the initial position and refocused by an XY raster and a Z scan.
+        """
+        max_iterations = max(int(self.adaptive_max_iterations), 1)
+        for iteration in range(max_iterations):
+            last_pos = np.array([self.optim_pos_x, self.optim_pos_y, self.optim_pos_z])
+            failed_axes = list()
+
+            for axis in ('X', 'Y', 'Z'):
+                if self.stopRequested:
+                    with self.threadlock:
+                        self.stopRequested = False
+                    self.finish_refocus()
+                    self.sigImageUpdated.emit()
+                    return
+                if axis == 'Z':
+                    self._initialize_z_refocus_image()
+                    self._scan_z_line()
+                    status = -1 if self.stopRequested else self._fit_z_line()
+                else:
+                    status = self._optimize_axis_line(axis)
+                if status < 0:
+                    failed_axes.append(axis)
+                self.sigImageUpdated.emit()
+
+            shift = np.abs(np.array([self.optim_pos_x, self.optim_pos_y, self.optim_pos_z]) - last_pos)
+            if not failed_axes and np.all(shift <= self.adaptive_tolerance):
+                self.log.debug('Adaptive refocus converged after {0:d} iteration(s) and {1:d} '
+                               'scanned pixels.'.format(iteration + 1, self.scanned_pixels))
+                break
+        else:
+            self.log.warning('Adaptive refocus did not converge within {0:d} iterations (failed '
+                             'axes: {1}), falling back to the raster refocus.'
+                             ''.format(max_iterations, ', '.join(failed_axes) or 'none'))
+            self.optim_pos_x = self._initial_pos_x
+            self.optim_pos_y = self._initial_pos_y
+            self.optim_pos_z = self._initial_pos_z
+            self.optim_sigma_x = 0.
+            self.optim_sigma_y = 0.
+            self.optim_sigma_z = 0.
+            self._fallback_steps = ['XY', 'Z']
+
+        self._sigDoNextOptimizationStep.emit()
+
     def finish_refocus(self):
         """ Finishes up and releases hardware after the optimizer scans."""
         self.kill_scanner()
@@ -506,6 +674,7 @@ class OptimizerLogic(GenericLogic):
                     self.optim_pos_x,
                     self.optim_pos_y,
                     self.optim_pos_z))
+        self.log.debug('Refocus scanned {0:d} pixels.'.format(self.scanned_pixels))
 
         # Signal that the optimization has finished, and "return" the optimal position along with
         # caller_tag
@@ -537,7 +706,7 @@ class OptimizerLogic(GenericLogic):
             line = np.vstack((scan_x_line, scan_y_line, scan_z_line, np.zeros(scan_x_line.shape)))
 
         # Perform scan
-        line_counts = self._scanning_device.scan_line(line)
+        line_counts = self._scan_line(line)
         if np.any(line_counts == -1):
             self.log.error('Z scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -569,7 +738,7 @@ class OptimizerLogic(GenericLogic):
                      scan_z_line,
                      np.zeros(scan_x_line.shape)))
 
-            line_bg_counts = self._scanning_device.scan_line(line_bg)
+            line_bg_counts = self._scan_line(line_bg)
             if np.any(line_bg_counts[0] == -1):
                 self.log.error('The scan went wrong, killing the scanner.')
                 self.stop_refocus()
@@ -620,16 +789,21 @@ class OptimizerLogic(GenericLogic):
         """Handle the steps through the specified optimization sequence
         """
 
+        # Fallback steps of a failed adaptive optimization run before the rest of the sequence
+        if self._fallback_steps:
+            this_step = self._fallback_steps.pop(0)
+
         # At the end fo the sequence, finish the optimization
-        if self._optimization_step == len(self.optimization_sequence):
+        elif self._optimization_step == len(self.optimization_sequence):
             self._sigFinishedAllOptimizationSteps.emit()
             return
 
-        # Read the next step in the optimization sequence
-        this_step = self.optimization_sequence[self._optimization_step]
+        else:
+            # Read the next step in the optimization sequence
+            this_step = self.optimization_sequence[self._optimization_step]
 
-        # Increment the step counter
-        self._optimization_step += 1
+            # Increment the step counter
+            self._optimization_step += 1
 
         # Launch the next step
         if this_step == 'XY':
@@ -638,6 +812,10 @@ class OptimizerLogic(GenericLogic):
         elif this_step == 'Z':
             self._initialize_z_refocus_image()
             self._sigScanZLine.emit()
+        elif this_step in ('X', 'Y'):
+            self._sigScanAxisLine.emit(this_step)
+        elif this_step == 'ADAPTIVE':
+            self._sigScanAdaptive.emit()
 
     def set_position(self, tag, x=None, y=None, z=None, a=None):
         """ Set focus position.
@@ -40,6 +40,9 @@ class PulseBlockElement(object):
     contain many Pulse_Block_Element Objects. These objects can be displayed in
     a GUI as single rows of a Pulse_Block.
     """
+    __slots__ = ('init_length_s', 'increment_s', 'pulse_function', 'digital_high',
+                 'analog_channels', 'digital_channels', 'channel_set')
+
     def __init__(self, init_length_s=10e-9, increment_s=0, pulse_function=None, digital_high=None):
         """
         The constructor for a Pulse_Block_Element needs to have:
@@ -108,11 +111,19 @@ class PulseBlockElement(object):
             return False
         if set(self.digital_high.items()) != set(other.digital_high.items()):
             return False
-        for chnl, func in self.pulse_function:
+        for chnl, func in self.pulse_function.items():
             if func != other.pulse_function[chnl]:
                 return False
         return True
 
+    def __getstate__(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+    def __setstate__(self, state):
+        # state is a dict of the slots, just like the __dict__ of elements pickled before
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
     def get_dict_representation(self):
         dict_repr = dict()
         dict_repr['init_length_s'] = self.init_length_s
@@ -134,6 +145,12 @@ class PulseBlockElement(object):
 class PulseBlock(object):
     """
     Collection of Pulse_Block_Elements which is called a Pulse_Block.
+
+    The element parameters are stored in numpy arrays (lengths, increments and digital channel
+    states) and an index into the distinct analog sampling function sets of the block. Equal
+    sampling functions are stored once per block as private copies. The PulseBlockElement objects
+    returned by element_list and indexing are created on access from these arrays with their own
+    copies of the sampling functions, so changing them does not alter the PulseBlock.
     """
     def __init__(self, name, element_list=None):
         """
@@ -144,15 +161,40 @@ class PulseBlock(object):
                                   Pulse_Block, e.g. [Pulse_Block_Element, Pulse_Block_Element, ...]
         """
         self.name = name
-        self.element_list = list() if element_list is None else element_list
-        self.init_length_s = 0.0
-        self.increment_s = 0.0
         self.analog_channels = set()
         self.digital_channels = set()
         self.channel_set = set()
-        self.refresh_parameters()
+        self._init_empty()
+        if element_list is not None:
+            self.extend(element_list)
         return
 
+    def _init_empty(self):
+        self._size = 0
+        self._lengths = np.zeros(0, dtype='float64')
+        self._increments = np.zeros(0, dtype='float64')
+        self._digital_order = tuple()
+        self._digital_states = np.zeros((0, 0), dtype=bool)
+        self._function_indices = np.zeros(0, dtype='int32')
+        # distinct analog sampling function sets as tuples of (channel, sampling function)
+        self._function_sets = list()
+        self._function_set_indices = dict()
+        # private sampling function copies of this block, with keys being the sampling function
+        # class and its parameter values. The instances must never be altered.
+        self._interned_functions = dict()
+
+    @property
+    def element_list(self):
+        return [self._create_element(index) for index in range(self._size)]
+
+    @property
+    def init_length_s(self):
+        return float(np.sum(self._lengths[:self._size]))
+
+    @property
+    def increment_s(self):
+        return float(np.sum(self._increments[:self._size]))
+
     def __repr__(self):
         repr_str = 'PulseBlock(name=\'{0}\', element_list=['.format(self.name)
         repr_str += ', '.join((repr(elem) for elem in self.element_list)) + '])'
@@ -160,7 +202,7 @@ class PulseBlock(object):
 
     def __str__(self):
         return_str = 'PulseBlock "{0}"\n\tnumber of elements: {1}\n\t'.format(
-            self.name, len(self.element_list))
+            self.name, len(self))
         return_str += 'initial length: {0}s\n\tlength increment: {1}s\n\t'.format(
             self.init_length_s, self.increment_s)
         return_str += 'active analog channels: {0}\n\tactive digital channels: {1}'.format(
@@ -169,80 +211,62 @@ class PulseBlock(object):
         return return_str
 
     def __len__(self):
-        return len(self.element_list)
+        return self._size
 
     def __getitem__(self, key):
-        if not isinstance(key, (slice, int)):
+        if isinstance(key, slice):
+            return [self._create_element(index) for index in range(self._size)[key]]
+        if not isinstance(key, int):
             raise TypeError('PulseBlock indices must be int or slice, not {0}'.format(type(key)))
-        return self.element_list[key]
+        if key < 0:
+            key += self._size
+        if not 0 <= key < self._size:
+            raise IndexError('PulseBlock element list index out of range')
+        return self._create_element(key)
 
     def __setitem__(self, key, value):
         if isinstance(key, int):
             if not isinstance(value, PulseBlockElement):
                 raise TypeError('PulseBlock element list entries must be of type PulseBlockElement,'
                                 ' not {0}'.format(type(value)))
-            if not self.channel_set:
-                self.channel_set = value.channel_set.copy()
-                self.analog_channels = {chnl for chnl in self.channel_set if chnl.startswith('a')}
-                self.digital_channels = {chnl for chnl in self.channel_set if chnl.startswith('d')}
-            elif value.channel_set != self.channel_set:
-                raise ValueError('Usage of different sets of analog and digital channels in the '
-                                 'same PulseBlock is prohibited. Used channel sets are:\n{0}\n{1}'
-                                 ''.format(self.channel_set, value.channel_set))
-
-            self.init_length_s -= self.element_list[key].init_length_s
-            self.increment_s -= self.element_list[key].increment_s
-            self.init_length_s += value.init_length_s
-            self.increment_s += value.increment_s
+            if key < 0:
+                key += self._size
+            if not 0 <= key < self._size:
+                raise IndexError('PulseBlock element list index out of range')
+            self._check_channels(value)
+            self._write_elements(key, [value])
         elif isinstance(key, slice):
-            add_length = 0
-            add_increment = 0
+            value = list(value)
             for element in value:
                 if not isinstance(element, PulseBlockElement):
                     raise TypeError('PulseBlock element list entries must be of type '
-                                    'PulseBlockElement, not {0}'.format(type(value)))
-                if not self.channel_set:
-                    self.channel_set = element.channel_set.copy()
-                    self.analog_channels = {chnl for chnl in self.channel_set if
-                                            chnl.startswith('a')}
-                    self.digital_channels = {chnl for chnl in self.channel_set if
-                                             chnl.startswith('d')}
-                elif element.channel_set != self.channel_set:
-                    raise ValueError(
-                        'Usage of different sets of analog and digital channels in the '
-                        'same PulseBlock is prohibited. Used channel sets are:\n{0}\n{1}'
-                        ''.format(self.channel_set, element.channel_set))
-
-                add_length += element.init_length_s
-                add_increment += element.increment_s
-
-            for element in self.element_list[key]:
-                self.init_length_s -= element.init_length_s
-                self.increment_s -= element.increment_s
-
-            self.init_length_s += add_length
-            self.increment_s += add_increment
+                                    'PulseBlockElement, not {0}'.format(type(element)))
+                self._init_channels(element)
+                self._check_channels(element)
+            indices = range(self._size)[key]
+            if key.step in (None, 1):
+                # contiguous slice, the number of elements may change
+                start = indices.start
+                stop = max(indices.stop, start)
+                self._remove_range(start, stop)
+                self._insert_elements(start, value)
+            else:
+                if len(indices) != len(value):
+                    raise ValueError('attempt to assign sequence of size {0} to extended slice of '
+                                     'size {1}'.format(len(value), len(indices)))
+                for index, element in zip(indices, value):
+                    self._write_elements(index, [element])
         else:
             raise TypeError('PulseBlock indices must be int or slice, not {0}'.format(type(key)))
-        self.element_list[key] = copy.deepcopy(value)
         return
 
     def __delitem__(self, key):
         if not isinstance(key, (slice, int)):
             raise TypeError('PulseBlock indices must be int or slice, not {0}'.format(type(key)))
 
-        if isinstance(key, int):
-            items_to_delete = [self.element_list[key]]
-        else:
-            items_to_delete = self.element_list[key]
-
-        for element in items_to_delete:
-            self.init_length_s -= element.init_length_s
-            self.increment_s -= element.increment_s
-        del self.element_list[key]
-        if len(self.element_list) == 0:
-            self.init_length_s = 0.0
-            self.increment_s = 0.0
+        keep = np.ones(self._size, dtype=bool)
+        keep[key] = False
+        self._keep_elements(keep)
         return
 
     def __eq__(self, other):
@@ -252,14 +276,149 @@ class PulseBlock(object):
             return True
         if self.channel_set != other.channel_set:
             return False
-        if (self.init_length_s, self.increment_s) != (other.init_length_s, other.increment_s):
-            return False
         if len(self) != len(other):
             return False
-        for i, element in enumerate(self.element_list):
-            if element != other[i]:
-                return False
-        return True
+        size = self._size
+        if not np.array_equal(self._lengths[:size], other._lengths[:size]):
+            return False
+        if not np.array_equal(self._increments[:size], other._increments[:size]):
+            return False
+        columns = [other._digital_order.index(chnl) for chnl in self._digital_order]
+        if not np.array_equal(self._digital_states[:size], other._digital_states[:size, columns]):
+            return False
+        # Compare the sampling function sets via their index in the other block
+        set_map = np.empty(len(self._function_sets), dtype='int32')
+        for index, function_set in enumerate(self._function_sets):
+            set_map[index] = other._get_function_set_index(function_set, add=False)
+        return np.array_equal(set_map[self._function_indices[:size]],
+                              other._function_indices[:size])
+
+    def _create_element(self, index):
+        function_set = self._function_sets[self._function_indices[index]]
+        return PulseBlockElement(
+            init_length_s=float(self._lengths[index]),
+            increment_s=float(self._increments[index]),
+            pulse_function=OrderedDict((chnl, copy.deepcopy(func)) for chnl, func in function_set),
+            digital_high=OrderedDict(zip(self._digital_order,
+                                         self._digital_states[index].tolist())))
+
+    def _check_channels(self, element):
+        if self.channel_set and element.channel_set != self.channel_set:
+            raise ValueError('Usage of different sets of analog and digital channels in the '
+                             'same PulseBlock is prohibited. Used channel sets are:\n{0}\n{1}'
+                             ''.format(self.channel_set, element.channel_set))
+
+    def _get_function_set_index(self, function_set, add=True):
+        """
+        Get the index of a set of analog sampling functions, adding it if it is new.
+
+        @param tuple function_set: tuple of (channel, sampling function) pairs
+        @param bool add: add the set if it is not present yet, otherwise return -1
+        @return int: index in self._function_sets
+        """
+        function_set = tuple((chnl, self._intern_function(func)) if add else (chnl, func)
+                             for chnl, func in function_set)
+        key = tuple(sorted((chnl, type(func), id(func)) for chnl, func in function_set))
+        index = self._function_set_indices.get(key)
+        if index is None:
+            if not add:
+                for index, other_set in enumerate(self._function_sets):
+                    if dict(other_set) == dict(function_set):
+                        return index
+                return -1
+            index = len(self._function_sets)
+            self._function_sets.append(function_set)
+            self._function_set_indices[key] = index
+        return index
+
+    def _intern_function(self, func):
+        """
+        Get the private copy of a sampling function with the same parameters.
+
+        @param SamplingBase func: sampling function instance
+        @return SamplingBase: copy of func owned by this block
+        """
+        try:
+            key = (type(func), ) + tuple(getattr(func, param) for param in func.params)
+            interned = self._interned_functions.get(key)
+        except TypeError:
+            # unhashable parameter values
+            return copy.deepcopy(func)
+        if interned is None:
+            interned = copy.deepcopy(func)
+            self._interned_functions[key] = interned
+        return interned
+
+    def _reserve(self, size):
+        """ Grow the storage arrays to hold at least size elements. """
+        capacity = len(self._lengths)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 16)
+        for attr in ('_lengths', '_increments', '_function_indices', '_digital_states'):
+            old = getattr(self, attr)
+            new = np.zeros((capacity, ) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+    def _init_channels(self, element):
+        """ Take over the channel configuration of the first element of an empty block. """
+        if self.channel_set:
+            return
+        self.channel_set = element.channel_set.copy()
+        self.analog_channels = {chnl for chnl in self.channel_set if chnl.startswith('a')}
+        self.digital_channels = {chnl for chnl in self.channel_set if chnl.startswith('d')}
+        self._digital_order = tuple(element.digital_high)
+        self._digital_states = np.zeros((len(self._lengths), len(self._digital_order)),
+                                        dtype=bool)
+
+    def _element_arrays(self, elements):
+        """ Convert PulseBlockElements into (lengths, increments, digital states, function sets). """
+        lengths = np.array([element.init_length_s for element in elements], dtype='float64')
+        increments = np.array([element.increment_s for element in elements], dtype='float64')
+        digital_states = np.array(
+            [[element.digital_high[chnl] for chnl in self._digital_order] for element in elements],
+            dtype=bool).reshape((len(elements), len(self._digital_order)))
+        function_indices = np.array(
+            [self._get_function_set_index(tuple(element.pulse_function.items()))
+             for element in elements], dtype='int32')
+        return lengths, increments, digital_states, function_indices
+
+    def _write_elements(self, position, elements):
+        lengths, increments, digital_states, function_indices = self._element_arrays(elements)
+        end = position + len(elements)
+        self._lengths[position:end] = lengths
+        self._increments[position:end] = increments
+        self._digital_states[position:end] = digital_states
+        self._function_indices[position:end] = function_indices
+
+    def _insert_elements(self, position, elements):
+        if not elements:
+            return
+        count = len(elements)
+        self._init_channels(elements[0])
+        self._reserve(self._size + count)
+        for attr in ('_lengths', '_increments', '_function_indices', '_digital_states'):
+            array = getattr(self, attr)
+            array[position + count:self._size + count] = array[position:self._size].copy()
+        self._size += count
+        self._write_elements(position, elements)
+
+    def _remove_range(self, start, stop):
+        count = stop - start
+        if count <= 0:
+            return
+        for attr in ('_lengths', '_increments', '_function_indices', '_digital_states'):
+            array = getattr(self, attr)
+            array[start:self._size - count] = array[stop:self._size].copy()
+        self._size -= count
+
+    def _keep_elements(self, keep):
+        size = int(np.count_nonzero(keep))
+        for attr in ('_lengths', '_increments', '_function_indices', '_digital_states'):
+            array = getattr(self, attr)
+            array[:size] = array[:self._size][keep]
+        self._size = size
 
     def refresh_parameters(self):
         """ Initialize the parameters which describe this Pulse_Block object.
@@ -267,49 +426,34 @@ class PulseBlock(object):
         The information is gained from all the Pulse_Block_Element objects,
         which are attached in the element_list.
         """
-        # the Pulse_Block parameters
-        self.init_length_s = 0.0
-        self.increment_s = 0.0
         self.channel_set = set()
-
-        for elem in self.element_list:
-            self.init_length_s += elem.init_length_s
-            self.increment_s += elem.increment_s
-
-            if not self.channel_set:
-                self.channel_set = elem.channel_set
-            elif self.channel_set != elem.channel_set:
-                raise ValueError('Usage of different sets of analog and digital channels in the '
-                                 'same PulseBlock is prohibited.\nPulseBlock creation failed!\n'
-                                 'Used channel sets are:\n{0}\n{1}'.format(self.channel_set,
-                                                                           elem.channel_set))
-                break
+        if self._size > 0:
+            self.channel_set = set(self._digital_order).union(
+                chnl for chnl, func in self._function_sets[self._function_indices[0]])
         self.analog_channels = {chnl for chnl in self.channel_set if chnl.startswith('a')}
         self.digital_channels = {chnl for chnl in self.channel_set if chnl.startswith('d')}
         return
 
     def pop(self, position=None):
-        if len(self.element_list) == 0:
+        if self._size == 0:
             raise IndexError('pop from empty PulseBlock')
 
         if position is None:
-            self.init_length_s -= self.element_list[-1].init_length_s
-            self.increment_s -= self.element_list[-1].increment_s
-            return self.element_list.pop()
+            position = self._size - 1
 
         if not isinstance(position, int):
             raise TypeError('PulseBlock.pop position argument expects integer, not {0}'
                             ''.format(type(position)))
 
         if position < 0:
-            position = len(self.element_list) + position
+            position = self._size + position
 
-        if len(self.element_list) <= position or position < 0:
+        if self._size <= position or position < 0:
             raise IndexError('PulseBlock element list index out of range')
 
-        self.init_length_s -= self.element_list[position].init_length_s
-        self.increment_s -= self.element_list[position].increment_s
-        return self.element_list.pop(position)
+        element = self._create_element(position)
+        self._remove_range(position, position + 1)
+        return element
 
     def insert(self, position, element):
         """ Insert a PulseBlockElement at the given position. The old element at this position and
@@ -323,50 +467,78 @@ class PulseBlock(object):
                              ''.format(type(element)))
 
         if position < 0:
-            position = len(self.element_list) + position
+            position = self._size + position
 
-        if len(self.element_list) < position or position < 0:
+        if self._size < position or position < 0:
             raise IndexError('PulseBlock element list index out of range')
 
-        if not self.channel_set:
-            self.channel_set = element.channel_set.copy()
-            self.analog_channels = {chnl for chnl in self.channel_set if chnl.startswith('a')}
-            self.digital_channels = {chnl for chnl in self.channel_set if chnl.startswith('d')}
-        elif element.channel_set != self.channel_set:
-            raise ValueError('Usage of different sets of analog and digital channels in the '
-                             'same PulseBlock is prohibited. Used channel sets are:\n{0}\n{1}'
-                             ''.format(self.channel_set, element.channel_set))
-
-        self.init_length_s += element.init_length_s
-        self.increment_s += element.increment_s
-
-        self.element_list.insert(position, copy.deepcopy(element))
+        self._init_channels(element)
+        self._check_channels(element)
+        self._insert_elements(position, [element])
         return
 
     def append(self, element):
         """
         """
-        self.insert(position=len(self.element_list), element=element)
+        self.insert(position=self._size, element=element)
         return
 
     def extend(self, iterable):
-        for element in iterable:
-            self.append(element=element)
+        elements = list(iterable)
+        for element in elements:
+            if not isinstance(element, PulseBlockElement):
+                raise ValueError('PulseBlock elements must be of type PulseBlockElement, not {0}'
+                                 ''.format(type(element)))
+            self._init_channels(element)
+            self._check_channels(element)
+        self._insert_elements(self._size, elements)
         return
 
     def clear(self):
-        del self.element_list[:]
-        self.init_length_s = 0.0
-        self.increment_s = 0.0
+        self._init_empty()
         self.analog_channels = set()
         self.digital_channels = set()
         self.channel_set = set()
         return
 
     def reverse(self):
-        self.element_list.reverse()
+        for attr in ('_lengths', '_increments', '_function_indices', '_digital_states'):
+            array = getattr(self, attr)
+            array[:self._size] = array[:self._size][::-1].copy()
         return
 
+    def __getstate__(self):
+        state = {'name': self.name,
+                 'channel_set': self.channel_set,
+                 'digital_order': self._digital_order,
+                 'lengths': self._lengths[:self._size].copy(),
+                 'increments': self._increments[:self._size].copy(),
+                 'digital_states': self._digital_states[:self._size].copy(),
+                 'function_indices': self._function_indices[:self._size].copy(),
+                 'function_sets': self._function_sets}
+        return state
+
+    def __setstate__(self, state):
+        if 'element_list' in state:
+            # PulseBlock pickled before the array based storage was introduced
+            self.__init__(state['name'], state['element_list'])
+            return
+        self.name = state['name']
+        self._init_empty()
+        self._size = len(state['lengths'])
+        self._lengths = state['lengths']
+        self._increments = state['increments']
+        self._digital_order = state['digital_order']
+        self._digital_states = state['digital_states'].reshape(
+            (self._size, len(self._digital_order)))
+        old_indices = state['function_indices']
+        set_map = np.array([self._get_function_set_index(function_set)
+                            for function_set in state['function_sets']], dtype='int32')
+        self._function_indices = set_map[old_indices] if self._size else old_indices
+        self.channel_set = set(state['channel_set'])
+        self.analog_channels = {chnl for chnl in self.channel_set if chnl.startswith('a')}
+        self.digital_channels = {chnl for chnl in self.channel_set if chnl.startswith('d')}
+
     def get_dict_representation(self):
         dict_repr = dict()
         dict_repr['name'] = self.name
@@ -376,6 +376,24 @@ class PulsedMasterLogic(GenericLogic):
     def fit_container(self):
         return self.pulsedmeasurementlogic().fc
 
+    def get_published_measurement_data(self, name, last_version=None):
+        """ Get a read-only snapshot of 'raw_data' or 'laser_data' of the measurement logic.
+
+        @param str name: name of the published data
+        @param int last_version: optional, version the caller already has
+
+        @return tuple(int, numpy.ndarray): version and snapshot, see GenericLogic.get_published_data
+        """
+        return self.pulsedmeasurementlogic().get_published_data(name, last_version)
+
+    def release_published_measurement_data(self, name, version):
+        """ Hand back a snapshot obtained with get_published_measurement_data.
+
+        @param str name: name of the published data
+        @param int version: version of the snapshot
+        """
+        self.pulsedmeasurementlogic().release_published_data(name, version)
+
     #######################################################################
     ###             Pulsed measurement methods                          ###
     #######################################################################
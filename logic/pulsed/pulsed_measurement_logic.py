@@ -1058,6 +1058,10 @@ class PulsedMeasurementLogic(GenericLogic):
                 return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data)
                 self.laser_data = return_dict['laser_counts_arr']
 
+                # the fast counter may reuse its data array, so the raw data is copied
+                self.publish_data('raw_data', self.raw_data, copy=True)
+                self.publish_data('laser_data', self.laser_data)
+
                 # analyze pulses and get data points for signal array. Also check if extraction
                 # worked (non-zero array returned).
                 if self.laser_data.any():
@@ -1109,19 +1113,21 @@ class PulsedMeasurementLogic(GenericLogic):
         # add old raw data from previous measurements if necessary
         if self._saved_raw_data.get(self._recalled_raw_data_tag) is not None:
             self.log.info('Found old saved raw data with tag "{0}".'
-                          ''.format(self._recalled_raw_data_tag))
+                          ''.format(self._recalled_raw_data_tag), extra={'rate_limit': 10})
             if not fc_data.any():
                 self.log.warning('Only zeros received from fast counter!\n'
-                                 'Using recalled raw data only.')
+                                 'Using recalled raw data only.', extra={'rate_limit': 10})
                 fc_data = self._saved_raw_data[self._recalled_raw_data_tag]
             elif self._saved_raw_data[self._recalled_raw_data_tag].shape == fc_data.shape:
-                self.log.debug('Recalled raw data has the same shape as current data.')
+                self.log.debug('Recalled raw data has the same shape as current data.',
+                               extra={'rate_limit': 10})
                 fc_data = self._saved_raw_data[self._recalled_raw_data_tag] + fc_data
             else:
                 self.log.warning('Recalled raw data has not the same shape as current data.'
-                                 '\nDid NOT add recalled raw data to current time trace.')
+                                 '\nDid NOT add recalled raw data to current time trace.',
+                                 extra={'rate_limit': 10})
         elif not fc_data.any():
-            self.log.warning('Only zeros received from fast counter!')
+            self.log.warning('Only zeros received from fast counter!', extra={'rate_limit': 10})
             fc_data = np.zeros(fc_data.shape, dtype='int64')
         return fc_data
 
@@ -1150,6 +1156,8 @@ class PulsedMeasurementLogic(GenericLogic):
         else:
             self.raw_data = np.zeros(number_of_bins, dtype='int64')
 
+        self.publish_data('raw_data', self.raw_data)
+        self.publish_data('laser_data', self.laser_data)
         self.sigMeasurementDataUpdated.emit()
         return
 
@@ -29,6 +29,8 @@ class Idle(SamplingBase):
     """
     Object representing an idle element (zero voltage)
     """
+    is_constant = True
+
     def __init__(self):
         pass
 
@@ -42,6 +44,8 @@ class DC(SamplingBase):
     """
     Object representing an DC element (constant voltage)
     """
+    is_constant = True
+
     params = OrderedDict()
     params['voltage'] = {'unit': 'V', 'init': 0.0, 'min': -np.inf, 'max': +np.inf, 'type': float}
 
@@ -91,6 +95,9 @@ class Sin(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_frequencies(self):
+        return (self.frequency, )
+
     def get_samples(self, time_array):
         phase_rad = np.pi * self.phase / 180
         # conversion for AWG to actually output the specified voltage
@@ -146,6 +153,9 @@ class DoubleSin(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_frequencies(self):
+        return self.frequency_1, self.frequency_2
+
     def get_samples(self, time_array):
         # First sine wave
         phase_rad = np.pi * self.phase_1 / 180
@@ -226,6 +236,9 @@ class TripleSin(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_frequencies(self):
+        return self.frequency_1, self.frequency_2, self.frequency_3
+
     def get_samples(self, time_array):
         # First sine wave
         phase_rad = np.pi * self.phase_1 / 180
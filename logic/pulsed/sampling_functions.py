@@ -33,6 +33,9 @@ class SamplingBase:
     Base class for all sampling functions
     """
     params = OrderedDict()
+    # True if the samples do not depend on time (e.g. constant voltages). Elements using only such
+    # functions can be sampled once and reused regardless of their position in a rotating frame.
+    is_constant = False
 
     def __repr__(self):
         kwargs = []
@@ -65,6 +68,16 @@ class SamplingBase:
         hash_other = hash(tuple(hash_list))
         return hash_self == hash_other
 
+    def get_frequencies(self):
+        """
+        Frequencies of the periodic components of the samples. Shifting the time by a multiple of
+        all periods does not change the samples.
+
+        @return tuple: frequencies in Hz (empty for constant functions) or None if the samples are
+                       not periodic
+        """
+        return tuple() if self.is_constant else None
+
     def get_dict_representation(self):
         dict_repr = dict()
         dict_repr['name'] = type(self).__name__
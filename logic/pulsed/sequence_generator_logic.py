@@ -20,6 +20,7 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import copy
 import numpy as np
 import os
 import pickle
@@ -68,6 +69,16 @@ class SequenceGeneratorLogic(GenericLogic):
     _sampling_functions_import_path = ConfigOption(name='additional_sampling_functions_path',
                                                    default=None,
                                                    missing='nothing')
+    # Maximum phase deviation in degrees of the periodic sampling functions, for which a waveform
+    # already sampled in the rotating frame is reused at a different offset. 0 disables the reuse.
+    _phase_tolerance = ConfigOption(name='rotating_frame_phase_tolerance',
+                                    default=1e-3,
+                                    missing='nothing')
+    # Compile the ensembles of predefined methods into PulseSequences of reusable waveforms if the
+    # pulse generator supports sequence mode.
+    _compile_predefined_ensembles = ConfigOption(name='compile_predefined_ensembles',
+                                                 default=False,
+                                                 missing='nothing')
 
     # status vars
     # Global parameters describing the channel usage and common parameters used during pulsed object
@@ -1010,6 +1021,17 @@ class SequenceGeneratorLogic(GenericLogic):
         for sequence in sequences:
             sequence.sampling_information = dict()
             self.save_sequence(sequence)
+        if self._compile_predefined_ensembles:
+            for ensemble in ensembles:
+                compiled = self.compile_pulse_block_ensemble(ensemble)
+                if compiled is None:
+                    continue
+                compiled_blocks, compiled_ensembles, compiled_sequence = compiled
+                for block in compiled_blocks:
+                    self.save_block(block)
+                for compiled_ensemble in compiled_ensembles:
+                    self.save_ensemble(compiled_ensemble)
+                self.save_sequence(compiled_sequence)
         self.sigPredefinedSequenceGenerated.emit(predefined_sequence_name)
         return
     # ---------------------------------------------------------------------------
@@ -1050,22 +1072,23 @@ class SequenceGeneratorLogic(GenericLogic):
             if laser_channel in channel_set:
                 if laser_channel.startswith('a'):
                     tmp_digital_high = type(
-                        block.element_list[-1].pulse_function[laser_channel]).__name__ != 'Idle'
+                        block[-1].pulse_function[laser_channel]).__name__ != 'Idle'
                 else:
-                    tmp_digital_high = block.element_list[-1].digital_high[laser_channel]
+                    tmp_digital_high = block[-1].digital_high[laser_channel]
         else:
             return ensemble_length_s, ensemble_length_bins, number_of_lasers
 
         # Loop over all blocks in the ensemble
         for block_name, reps in ensemble.block_list:
             block = self.get_block(block_name)
+            elements = block.element_list
             # Iterate over all repetitions of the current block
             for rep_no in range(reps + 1):
                 # ideal end time for the sequence up until this point in sec
                 ensemble_length_s += block.init_length_s + rep_no * block.increment_s
                 if laser_channel in channel_set:
                     # Iterate over the Block_Elements inside the current block
-                    for block_element in block.element_list:
+                    for block_element in elements:
                         # save bin position if transition from low to high has occured in
                         # laser channel
                         if laser_channel.startswith('a'):
@@ -1149,8 +1172,8 @@ class SequenceGeneratorLogic(GenericLogic):
             digital_channels = block.digital_channels
             analog_channels = block.analog_channels
             block = self.get_block(ensemble.block_list[-1][0])
-            if len(block.element_list) > 0:
-                tmp_digital_high = block.element_list[-1].digital_high.copy()
+            if len(block) > 0:
+                tmp_digital_high = block[-1].digital_high.copy()
             else:
                 tmp_digital_high = {chnl: False for chnl in digital_channels}
 
@@ -1170,16 +1193,17 @@ class SequenceGeneratorLogic(GenericLogic):
         for block_name, reps in ensemble.block_list:
             # Get the stored PulseBlock instance
             block = self.get_block(block_name)
+            elements = block.element_list
 
             # Temporary array to hold the length in bins for all elements in the block (incl. reps)
-            tmp_length_bins = np.zeros((reps + 1) * len(block.element_list), dtype='int64')
+            tmp_length_bins = np.zeros((reps + 1) * len(elements), dtype='int64')
 
             # Iterate over all repetitions of the current block while keeping track of the
             # current element index
             unrolled_element_index = 0
             for rep_no in range(reps + 1):
                 # Iterate over the Block_Elements inside the current block
-                for element in block.element_list:
+                for element in elements:
                     # save bin position if a transition from low to high or vice versa has occured
                     # in a digital channel
                     if tmp_digital_high != element.digital_high:
@@ -1326,6 +1350,196 @@ class SequenceGeneratorLogic(GenericLogic):
         # Return error code
         return -1 if ensembles_missing else 0
 
+    @staticmethod
+    def _get_frequencies(elements):
+        """
+        Collect the frequencies of the periodic sampling functions used in PulseBlockElements.
+
+        @param iterable elements: PulseBlockElement instances
+        @return set: frequencies in Hz, empty if the samples do not depend on their position in time
+                     (e.g. only Idle and DC) or None if any sampling function is not periodic
+        """
+        frequencies = set()
+        for element in elements:
+            for func in element.pulse_function.values():
+                func_frequencies = func.get_frequencies()
+                if func_frequencies is None:
+                    return None
+                frequencies.update(func_frequencies)
+        return frequencies
+
+    def _find_equivalent_offset(self, frequencies, offset_bin, sampled_offsets):
+        """
+        Find an already sampled offset of a waveform which results in the same samples, i.e. the
+        phases of all frequencies differ by less than the phase tolerance.
+
+        @param set frequencies: frequencies in Hz of the periodic functions in the waveform
+        @param int offset_bin: rotating frame offset of the waveform to sample
+        @param list sampled_offsets: list of (offset_bin, name_tag) of already sampled waveforms
+
+        @return str: name_tag of the equivalent waveform or None
+        """
+        if frequencies is None or self._phase_tolerance <= 0:
+            return None
+        for sampled_offset, name_tag in sampled_offsets:
+            for frequency in frequencies:
+                cycles = frequency * (offset_bin - sampled_offset) / self.__sample_rate
+                if abs(cycles - np.rint(cycles)) * 360 > self._phase_tolerance:
+                    break
+            else:
+                return name_tag
+        return None
+
+    def compile_pulse_block_ensemble(self, ensemble, name=None):
+        """
+        Compile a PulseBlockEnsemble into a PulseSequence of short reusable waveforms.
+
+        The ensemble is unrolled and cut into segments at the PulseBlockElement boundaries.
+        Segments of elements with constant length and offset independent samples (e.g. laser,
+        delay and waiting time of each measurement tick) are sampled once and played repeatedly,
+        while incrementing or phase sensitive elements end up in their own segments. Segments
+        shorter than the minimum waveform length of the pulse generator (or not matching its
+        waveform granularity) are merged with their neighbours. Consecutive identical segments are
+        played as repetitions of one sequence step.
+
+        The element lengths in bins are taken from analyze_block_ensemble, so the timing of the
+        sequence is identical to the sampled ensemble.
+
+        @param str|PulseBlockEnsemble ensemble: PulseBlockEnsemble instance or name of a saved
+                                                PulseBlockEnsemble to compile
+        @param str name: name of the created PulseSequence, defaults to the ensemble name
+
+        @return tuple: (list of created PulseBlocks, list of created PulseBlockEnsembles,
+                       created PulseSequence) or None if the pulse generator has no sequence mode
+                       or the sequence would not be smaller than the ensemble.
+        """
+        if isinstance(ensemble, str):
+            ensemble = self.get_ensemble(ensemble)
+            if not ensemble:
+                self.log.error('Unable to compile PulseBlockEnsemble. Not found in saved ensembles.')
+                return None
+        if self._sampling_ensemble_sanity_check(ensemble) < 0:
+            return None
+        if not self.pulsegenerator().has_sequence_mode():
+            return None
+        if name is None:
+            name = ensemble.name
+
+        constraints = self.pulse_generator_constraints
+        min_length = max(int(constraints.waveform_length.min), 1)
+        granularity = max(int(constraints.waveform_length.step), 1)
+        ensemble_info = self.analyze_block_ensemble(ensemble)
+        elements_length_bins = ensemble_info['elements_length_bins']
+
+        # Unroll the ensemble into segments of elements with the same reusability.
+        # Each segment is a list [reusable, length_bins, elements, element_keys]
+        segments = list()
+        element_index = 0
+        offset_bin = 0
+        for block_name, reps in ensemble.block_list:
+            elements = self.get_block(block_name).element_list
+            for rep_no in range(reps + 1):
+                for element in elements:
+                    length_bins = int(elements_length_bins[element_index])
+                    frequencies = self._get_frequencies((element, ))
+                    reusable = element.increment_s == 0 and (
+                        frequencies == set() or not ensemble.rotating_frame)
+                    # Periodic elements in the rotating frame can share a segment, its phase
+                    # equivalent offsets are sorted out while sampling the sequence.
+                    key = (tuple((chnl, repr(func)) for chnl, func in element.pulse_function.items()),
+                           tuple(sorted(element.digital_high.items())),
+                           length_bins,
+                           offset_bin if ensemble.rotating_frame and frequencies is None else None)
+                    if segments and segments[-1][0] == reusable:
+                        segments[-1][1] += length_bins
+                        segments[-1][2].append(element)
+                        segments[-1][3].append(key)
+                    else:
+                        segments.append([reusable, length_bins, [element], [key]])
+                    element_index += 1
+                    offset_bin += length_bins
+
+        # Merge segments the pulse generator can not play as waveform of their own. Prefer merging
+        # into a non-reusable neighbour to keep the reusable segments intact.
+        def is_playable(segment):
+            return segment[1] >= min_length and segment[1] % granularity == 0
+
+        index = 0
+        while index < len(segments) and len(segments) > 1:
+            if is_playable(segments[index]):
+                index += 1
+                continue
+            if index == len(segments) - 1:
+                merge_with_next = False
+            elif index == 0:
+                merge_with_next = True
+            else:
+                merge_with_next = not segments[index + 1][0] or segments[index - 1][0]
+            first = index if merge_with_next else index - 1
+            merged = [segments[first][0] and segments[first + 1][0],
+                      segments[first][1] + segments[first + 1][1],
+                      segments[first][2] + segments[first + 1][2],
+                      segments[first][3] + segments[first + 1][3]]
+            segments[first:first + 2] = [merged]
+            index = first
+        if not segments or not is_playable(segments[0]):
+            return None
+
+        # Run-length encode identical consecutive segments into sequence steps. In the rotating
+        # frame only segments without periodic functions can be repeated, a repetition of a
+        # periodic waveform would not advance its phase.
+        unique_segments = OrderedDict()
+        steps = list()
+        for reusable, length_bins, elements, keys in segments:
+            key = tuple(keys)
+            if key not in unique_segments:
+                unique_segments[key] = (length_bins, elements, keys)
+            repeatable = not ensemble.rotating_frame or self._get_frequencies(elements) == set()
+            if repeatable and steps and steps[-1][0] == key:
+                steps[-1][1] += 1
+            else:
+                steps.append([key, 1])
+
+        unique_samples = sum(length_bins for length_bins, _, _ in unique_segments.values())
+        if unique_samples >= ensemble_info['number_of_samples']:
+            return None
+        if 0 < constraints.sequence_steps.max < len(steps):
+            self.log.warning('Compilation of PulseBlockEnsemble "{0}" would need {1:d} sequence '
+                             'steps but the pulse generator only supports {2:d}.'
+                             ''.format(ensemble.name, len(steps), constraints.sequence_steps.max))
+            return None
+
+        # Create the PulseBlocks and PulseBlockEnsembles of the segments with fixed element lengths
+        created_blocks = list()
+        created_ensembles = list()
+        segment_names = dict()
+        for segment_no, (key, (length_bins, elements, keys)) in enumerate(unique_segments.items()):
+            segment_name = '{0}_seg{1:03d}'.format(name, segment_no)
+            block = PulseBlock(name=segment_name)
+            for element, element_key in zip(elements, keys):
+                segment_element = copy.deepcopy(element)
+                segment_element.init_length_s = element_key[2] / self.__sample_rate
+                segment_element.increment_s = 0
+                block.append(segment_element)
+            segment_ensemble = PulseBlockEnsemble(name=segment_name,
+                                                  block_list=[(block.name, 0)],
+                                                  rotating_frame=ensemble.rotating_frame)
+            created_blocks.append(block)
+            created_ensembles.append(segment_ensemble)
+            segment_names[key] = segment_name
+
+        sequence = PulseSequence(name=name, rotating_frame=ensemble.rotating_frame)
+        for key, repetitions in steps:
+            sequence.append(segment_names[key])
+            sequence[-1][1]['repetitions'] = repetitions - 1
+        sequence.measurement_information = copy.deepcopy(ensemble.measurement_information)
+
+        self.log.debug('Compiled PulseBlockEnsemble "{0}" ({1:d} samples) into PulseSequence "{2}" '
+                       'with {3:d} steps and {4:d} waveforms ({5:d} samples).'
+                       ''.format(ensemble.name, int(ensemble_info['number_of_samples']), name,
+                                 len(steps), len(unique_segments), unique_samples))
+        return created_blocks, created_ensembles, sequence
+
     @QtCore.Slot(str)
     def sample_pulse_block_ensemble(self, ensemble, offset_bin=0, name_tag=None):
         """ General sampling of a PulseBlockEnsemble object, which serves as the construction plan.
@@ -1445,11 +1659,11 @@ class SequenceGeneratorLogic(GenericLogic):
         written_waveforms = set()
         # Iterate over all blocks within the PulseBlockEnsemble object
         for block_name, reps in ensemble.block_list:
-            block = self.get_block(block_name)
+            elements = self.get_block(block_name).element_list
             # Iterate over all repetitions of the current block
             for rep_no in range(reps + 1):
                 # Iterate over the PulseBlockElement instances inside the current block
-                for element in block.element_list:
+                for element in elements:
                     digital_high = element.digital_high
                     pulse_function = element.pulse_function
                     element_length_bins = ensemble_info['elements_length_bins'][element_count]
@@ -1569,6 +1783,10 @@ class SequenceGeneratorLogic(GenericLogic):
         relationship between the different entries of the PulseSequence object.
         ATTENTION: The phase preservation within a single PulseBlockEnsemble is NOT affected by
                    this method.
+        In the rotating frame a PulseBlockEnsemble is only sampled again if its phase differs from
+        all already sampled versions of it. Ensembles of constant functions are sampled once and
+        ensembles of periodic functions are reused at offsets with an equivalent phase, within the
+        rotating_frame_phase_tolerance ConfigOption.
 
         More sophisticated sequence sampling method can be implemented here.
         """
@@ -1623,20 +1841,32 @@ class SequenceGeneratorLogic(GenericLogic):
         # will be created in general with a different offset_bin. Therefore, in order to keep track
         # of the sampled Pulse_Block_Ensembles one has to introduce a running number as an
         # additional name tag, so keep the sampled files separate.
+        # Ensembles without time dependent analog samples are the same at any offset and are
+        # sampled only once, also in the rotating frame. Ensembles of periodic functions are reused
+        # at offsets with an equivalent phase (see ConfigOption rotating_frame_phase_tolerance).
+        # Dictionary with ensemble names as keys and lists of (offset_bin, name_tag) as items
+        sampled_offsets = dict()
         offset_bin = 0  # that will be used for phase preservation
         for sequence_step, (ensemble_name, seq_param) in enumerate(sequence.ensemble_list):
-            if sequence.rotating_frame:
-                # to make something like 001
-                name_tag = ensemble_name + '_' + str(sequence_step).zfill(3)
-            else:
+            ensemble = self.get_ensemble(ensemble_name)
+            frequencies = self._get_frequencies(
+                element for block_name, reps in ensemble.block_list
+                for element in self.get_block(block_name).element_list)
+            if not sequence.rotating_frame or frequencies == set():
                 name_tag = ensemble_name
-                offset_bin = 0  # Keep the offset at 0
+            else:
+                name_tag = self._find_equivalent_offset(
+                    frequencies, offset_bin, sampled_offsets.get(ensemble_name, list()))
+                if name_tag is None:
+                    # to make something like 001
+                    name_tag = ensemble_name + '_' + str(sequence_step).zfill(3)
+                    sampled_offsets.setdefault(ensemble_name, list()).append((offset_bin, name_tag))
 
             # Only sample ensembles if they have not already been sampled
-            if sequence.rotating_frame or ensemble_name not in generated_ensembles:
-                offset_bin, waveform_list, ensemble_info = self.sample_pulse_block_ensemble(
+            if name_tag not in generated_ensembles:
+                dummy, waveform_list, ensemble_info = self.sample_pulse_block_ensemble(
                     ensemble=ensemble_name,
-                    offset_bin=offset_bin,
+                    offset_bin=offset_bin if sequence.rotating_frame else 0,
                     name_tag=name_tag)
 
                 if len(waveform_list) == 0:
@@ -1655,6 +1885,11 @@ class SequenceGeneratorLogic(GenericLogic):
                 # Add created waveform names to the set
                 written_waveforms.update(waveform_list)
 
+            # Keep track of the time passed in the rotating frame, including step repetitions
+            if sequence.rotating_frame:
+                offset_bin += generated_ensembles[name_tag]['number_of_samples'] * (
+                    seq_param['repetitions'] + 1)
+
             # Append written sequence step to sequence_param_dict_list
             sequence_param_dict_list.append(
                 (tuple(generated_ensembles[name_tag]['waveforms']), seq_param))
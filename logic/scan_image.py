@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the image container and figure drawing of confocal type raster scans.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+
+
+class ScanImage:
+    """ Raster scan image storing only the counts, with lazily generated coordinates.
+
+    The old scan images were float64 arrays of shape (rows, columns, 3 + channels)
+    holding the x, y and z position of every pixel next to the counts. Here the
+    counts are kept in a (channels, rows, columns) array of a compact dtype and the
+    positions are described by one 1D array per coordinate, which either varies along
+    the columns (e.g. x of a xy scan) or along the rows (e.g. z of a depth scan).
+
+    Indexing behaves like the old array, so code reading e.g. image[:, :, 3] or
+    image[0, 0, 0] keeps working. Count channels are returned as views, coordinate
+    channels are generated on access. Writing is possible to the count channels and,
+    row by row, to coordinates varying along the rows.
+    """
+
+    ROW = 0
+    COLUMN = 1
+
+    def __init__(self, num_rows, num_columns, num_channels, coordinates, dtype=np.float32):
+        """
+        @param int num_rows: number of image rows (lines)
+        @param int num_columns: number of pixels per line
+        @param int num_channels: number of count channels
+        @param list coordinates: three (direction, values) tuples for x, y and z. direction is
+                                 ScanImage.ROW or ScanImage.COLUMN, values is a 1D array of length
+                                 num_rows or num_columns respectively, or a scalar for a
+                                 constant coordinate.
+        @param dtype: numpy dtype of the counts
+        """
+        self.counts = np.zeros((num_channels, num_rows, num_columns), dtype=dtype)
+        # (rows, columns, channels) view on the counts, used for indexing
+        self._counts_view = np.moveaxis(self.counts, 0, -1)
+
+        self._coordinates = list()
+        for direction, values in coordinates:
+            length = num_rows if direction == self.ROW else num_columns
+            values = np.array(np.broadcast_to(values, (length, )), dtype=float)
+            self._coordinates.append((direction, values))
+
+    @property
+    def shape(self):
+        return self._counts_view.shape[:2] + (3 + self._counts_view.shape[2], )
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def dtype(self):
+        return self.counts.dtype
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + sum(values.nbytes for _, values in self._coordinates)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[:, :, :]
+        return array if dtype is None else array.astype(dtype)
+
+    def copy(self):
+        """ Return an independent copy of this image. """
+        new = ScanImage(self.shape[0], self.shape[1], self.shape[2] - 3,
+                        [(direction, values) for direction, values in self._coordinates],
+                        self.dtype)
+        new.counts[:] = self.counts
+        return new
+
+    def get_coordinate_axis(self, index):
+        """ Return the 1D values of a coordinate and the direction it varies in.
+
+        @param int index: 0 for x, 1 for y, 2 for z
+        @return tuple(int, np.array): ScanImage.ROW or ScanImage.COLUMN and the values
+        """
+        return self._coordinates[index]
+
+    def _normalize_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key, )
+        ellipses = [n for n, k in enumerate(key) if k is Ellipsis]
+        if len(ellipses) > 1:
+            raise IndexError('an index can only have a single ellipsis (\'...\')')
+        if ellipses:
+            n = ellipses[0]
+            key = key[:n] + (slice(None), ) * max(3 - len(key) + 1, 0) + key[n + 1:]
+        if len(key) > 3:
+            raise IndexError('too many indices for ScanImage')
+        return key + (slice(None), ) * (3 - len(key))
+
+    @staticmethod
+    def _counts_key(channel, channel_index):
+        """ Translate a channel index of the full image into an index of the counts view.
+        Slices stay slices so that the result of the indexing is a view.
+        """
+        if isinstance(channel, slice) and np.size(channel_index) > 0:
+            step = channel.step or 1
+            stop = channel_index[-1] - 3 + step
+            return slice(channel_index[0] - 3, stop if stop >= 0 else None, step)
+        return channel_index - 3
+
+    def __getitem__(self, key):
+        row, column, channel = self._normalize_key(key)
+
+        # fast path: count channels only, return a view
+        channel_index = np.arange(self.shape[2])[channel]
+        if np.size(channel_index) > 0 and np.all(channel_index >= 3):
+            return self._counts_view[row, column, self._counts_key(channel, channel_index)]
+
+        # generic path: build only the requested pixels
+        row_index = np.arange(self.shape[0])[row]
+        column_index = np.arange(self.shape[1])[column]
+        rows = np.atleast_1d(row_index)
+        columns = np.atleast_1d(column_index)
+        channels = np.atleast_1d(channel_index)
+
+        result = np.empty((rows.size, columns.size, channels.size))
+        for n, ch in enumerate(channels):
+            if ch < 3:
+                direction, values = self._coordinates[ch]
+                if direction == self.ROW:
+                    result[:, :, n] = values[rows][:, np.newaxis]
+                else:
+                    result[:, :, n] = values[columns][np.newaxis, :]
+            else:
+                result[:, :, n] = self._counts_view[np.ix_(rows, columns, [ch - 3])][:, :, 0]
+
+        # drop the dimensions which were indexed by an integer
+        squeeze = tuple(axis for axis, index in enumerate((row_index, column_index, channel_index))
+                        if np.ndim(index) == 0)
+        return result.squeeze(axis=squeeze) if squeeze else result
+
+    def __setitem__(self, key, value):
+        row, column, channel = self._normalize_key(key)
+        channel_index = np.arange(self.shape[2])[channel]
+
+        if np.all(channel_index >= 3):
+            self._counts_view[row, column, self._counts_key(channel, channel_index)] = value
+            return
+
+        channel_index = np.atleast_1d(channel_index)
+
+        if channel_index.size != 1:
+            raise ValueError('Coordinates and counts of a ScanImage can not be set together.')
+        direction, values = self._coordinates[channel_index[0]]
+        value = np.asarray(value, dtype=float)
+        if direction != self.ROW or value.size == 0 or np.any(value != value.flat[0]):
+            raise ValueError('ScanImage coordinates can only be set to a constant value per row.')
+        values[row] = value.flat[0]
+
+
+def draw_scan_figure(data, image_extent, scan_axis=None, cbar_range=None, percentile_range=None,
+                     crosshair_pos=None, mpl_style=None):
+    """ Create a 2-D color map figure of the scan image.
+
+    @param: array data: The NxM array of count values from a scan with NxM pixels.
+
+    @param: list image_extent: The scan range in the form [hor_min, hor_max, ver_min, ver_max]
+
+    @param: list axes: Names of the horizontal and vertical axes in the image
+
+    @param: list cbar_range: (optional) [color_scale_min, color_scale_max].  If not supplied then a default of
+                             data_min to data_max will be used.
+
+    @param: list percentile_range: (optional) Percentile range of the chosen cbar_range.
+
+    @param: list crosshair_pos: (optional) crosshair position as [hor, vert] in the chosen image axes.
+
+    @param: str mpl_style: (optional) matplotlib style to draw the figure with.
+
+    @return: fig fig: a matplotlib figure object to be saved to file.
+    """
+    if scan_axis is None:
+        scan_axis = ['X', 'Y']
+
+    # If no colorbar range was given, take full range of data
+    if cbar_range is None:
+        cbar_range = [np.min(data), np.max(data)]
+
+    # Scale color values using SI prefix
+    prefix = ['', 'k', 'M', 'G']
+    prefix_count = 0
+    image_data = data
+    draw_cb_range = np.array(cbar_range)
+    image_dimension = image_extent.copy()
+
+    while draw_cb_range[1] > 1000:
+        image_data = image_data/1000
+        draw_cb_range = draw_cb_range/1000
+        prefix_count = prefix_count + 1
+
+    c_prefix = prefix[prefix_count]
+
+
+    # Scale axes values using SI prefix
+    axes_prefix = ['', 'm', r'$\mathrm{\mu}$', 'n']
+    x_prefix_count = 0
+    y_prefix_count = 0
+
+    while np.abs(image_dimension[1]-image_dimension[0]) < 1:
+        image_dimension[0] = image_dimension[0] * 1000.
+        image_dimension[1] = image_dimension[1] * 1000.
+        x_prefix_count = x_prefix_count + 1
+
+    while np.abs(image_dimension[3] - image_dimension[2]) < 1:
+        image_dimension[2] = image_dimension[2] * 1000.
+        image_dimension[3] = image_dimension[3] * 1000.
+        y_prefix_count = y_prefix_count + 1
+
+    x_prefix = axes_prefix[x_prefix_count]
+    y_prefix = axes_prefix[y_prefix_count]
+
+    # Use qudi style
+    if mpl_style is not None:
+        plt.style.use(mpl_style)
+
+    # Create figure
+    fig, ax = plt.subplots()
+
+    # Create image plot
+    cfimage = ax.imshow(image_data,
+                        cmap=plt.get_cmap('inferno'), # reference the right place in qd
+                        origin="lower",
+                        vmin=draw_cb_range[0],
+                        vmax=draw_cb_range[1],
+                        interpolation='none',
+                        extent=image_dimension
+                        )
+
+    ax.set_aspect(1)
+    ax.set_xlabel(scan_axis[0] + ' position (' + x_prefix + 'm)')
+    ax.set_ylabel(scan_axis[1] + ' position (' + y_prefix + 'm)')
+    ax.spines['bottom'].set_position(('outward', 10))
+    ax.spines['left'].set_position(('outward', 10))
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.get_xaxis().tick_bottom()
+    ax.get_yaxis().tick_left()
+
+    # draw the crosshair position if defined
+    if crosshair_pos is not None:
+        trans_xmark = mpl.transforms.blended_transform_factory(
+            ax.transData,
+            ax.transAxes)
+
+        trans_ymark = mpl.transforms.blended_transform_factory(
+            ax.transAxes,
+            ax.transData)
+
+        ax.annotate('', xy=(crosshair_pos[0]*np.power(1000,x_prefix_count), 0),
+                    xytext=(crosshair_pos[0]*np.power(1000,x_prefix_count), -0.01), xycoords=trans_xmark,
+                    arrowprops=dict(facecolor='#17becf', shrink=0.05),
+                    )
+
+        ax.annotate('', xy=(0, crosshair_pos[1]*np.power(1000,y_prefix_count)),
+                    xytext=(-0.01, crosshair_pos[1]*np.power(1000,y_prefix_count)), xycoords=trans_ymark,
+                    arrowprops=dict(facecolor='#17becf', shrink=0.05),
+                    )
+
+    # Draw the colorbar
+    cbar = plt.colorbar(cfimage, shrink=0.8)#, fraction=0.046, pad=0.08, shrink=0.75)
+    cbar.set_label('Fluorescence (' + c_prefix + 'c/s)')
+
+    # remove ticks from colorbar for cleaner image
+    cbar.ax.tick_params(which=u'both', length=0)
+
+    # If we have percentile information, draw that to the figure
+    if percentile_range is not None:
+        cbar.ax.annotate(str(percentile_range[0]),
+                         xy=(-0.3, 0.0),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+        cbar.ax.annotate(str(percentile_range[1]),
+                         xy=(-0.3, 1.0),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+        cbar.ax.annotate('(percentile)',
+                         xy=(-0.3, 0.5),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+    return fig
@@ -22,17 +22,78 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 import copy
 import datetime
 import numpy as np
+import operator
 import os
 import pylab as pb
 import time
 
 from collections import OrderedDict
-from core.module import Connector
+from core.module import Connector, ConfigOption
 from core.util.network import netobtain
 from logic.generic_logic import GenericLogic
+from logic.trace_analysis_logic import IncrementalHistogram
 from qtpy import QtCore
 
 
+class SingleShotBinnings:
+    """ Sequence of all binnings of single shot laser pulse sums.
+
+    Entry k contains the sums of k + 1 consecutive rows of the first two laser pulses (or their
+    normalized difference), an incomplete group at the end is dropped. All binnings are derived
+    from one cumulative sum over the rows, a binning is only computed when it is accessed and
+    then cached.
+    """
+
+    def __init__(self, signal, max_bin, normalized=False):
+        """
+        @param numpy.ndarray signal: laser pulse sums, dimensionality is n_rows x n_laserpulses
+        @param int max_bin: largest number of rows added up, i.e. the number of binnings
+        @param bool normalized: entries are (pulse 1 - pulse 2)/(pulse 1 + pulse 2)
+        """
+        signal = np.asarray(signal)[:, :2]
+        self._cumsum = np.zeros((signal.shape[0] + 1, signal.shape[1]),
+                                dtype=np.result_type(signal.dtype, np.int64))
+        np.cumsum(signal, axis=0, out=self._cumsum[1:])
+        self._max_bin = max(int(max_bin), 0)
+        self._normalized = normalized
+        self._binnings = dict()
+
+    def __len__(self):
+        return self._max_bin
+
+    def __iter__(self):
+        for index in range(self._max_bin):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[ii] for ii in range(*index.indices(self._max_bin))]
+        index = operator.index(index)
+        if index < 0:
+            index += self._max_bin
+        if not 0 <= index < self._max_bin:
+            raise IndexError('SingleShotBinnings index out of range')
+        binning = self._binnings.get(index)
+        if binning is None:
+            width = index + 1
+            stop = (self._cumsum.shape[0] - 1) // width * width
+            binning = self._cumsum[width:stop + 1:width] - self._cumsum[0:stop + 1 - width:width]
+            if self._normalized:
+                binning = (binning[:, 0] - binning[:, 1]) / (binning[:, 0] + binning[:, 1])
+            self._binnings[index] = binning
+        return binning
+
+    def to_array(self):
+        """ Compute all binnings.
+
+        @return numpy.ndarray: object array containing the binnings
+        """
+        bin_array = np.empty(self._max_bin, dtype=object)
+        for index in range(self._max_bin):
+            bin_array[index] = self[index]
+        return bin_array
+
+
 class SingleShotLogic(GenericLogic):
     """ This class brings raw data coming from fastcounter measurements (gated or ungated)
         into trace form processable by the trace_analysis_logic.
@@ -54,10 +115,17 @@ class SingleShotLogic(GenericLogic):
     pulsedmasterlogic = Connector(interface='PulsedMasterLogic')
     odmrlogic = Connector(interface='ODMRLogic')
 
+    # interval in s to poll completed rows in streaming mode
+    stream_poll_interval = ConfigOption('stream_poll_interval', 1.0)
+
     # add possible signals here
     sigHistogramUpdated = QtCore.Signal()
     sigMeasurementFinished = QtCore.Signal()
     sigTraceUpdated = QtCore.Signal()
+    sigThresholdUpdated = QtCore.Signal(float, float)
+    sigStreamFinished = QtCore.Signal()
+    sigStartStreamTimer = QtCore.Signal()
+    sigStopStream = QtCore.Signal()
 
     def __init__(self, config, **kwargs):
         """ Create CounterLogic object with connectors.
@@ -78,6 +146,9 @@ class SingleShotLogic(GenericLogic):
         self._hist_num_bins = None
 
         self.data_dict = None
+        self.threshold = None
+        self.fidelity = None
+        self._stream = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -99,6 +170,14 @@ class SingleShotLogic(GenericLogic):
         self.trace = None
         self.sigMeasurementFinished.connect(self.ssr_measurement_analysis)
 
+        # QTimer must be created here instead of __init__ because otherwise the timer will not run
+        # in this thread.
+        self._stream_timer = QtCore.QTimer()
+        self._stream_timer.setSingleShot(True)
+        self._stream_timer.setInterval(int(self.stream_poll_interval * 1000))
+        self._stream_timer.timeout.connect(self._stream_poll, QtCore.Qt.QueuedConnection)
+        self.sigStartStreamTimer.connect(self._stream_timer.start, QtCore.Qt.QueuedConnection)
+        self.sigStopStream.connect(self._stop_stream, QtCore.Qt.QueuedConnection)
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
@@ -106,6 +185,11 @@ class SingleShotLogic(GenericLogic):
         @param object e: Event class object from Fysom. A more detailed
                          explanation can be found in method activation.
         """
+        if self._stream is not None:
+            self._stream_timer.stop()
+            self._finish_stream()
+        self.sigStartStreamTimer.disconnect()
+        self.sigStopStream.disconnect()
         return
 
     # =========================================================================
@@ -123,23 +207,9 @@ class SingleShotLogic(GenericLogic):
 
         if not self._fast_counter_device.is_gated():
             if fastcounter == 'fastcomtec':
-                settings = self._fast_counter_device.get_settings()
-                # check if settings object is coming from a remote connection
-                settings = netobtain(settings)
-                n_rows = settings.cycles
-                # looks like this is in ns, but I'm not completely sure
-                n_columns = settings.range
-                reps_per_row = settings.swpreset
+                return_dict.update(self._get_acquisition_settings())
                 raw_data = netobtain(self._fast_counter_device.get_data_trace(sweep_reset=True))
-
-
-                return_dict['n_rows'] = n_rows
-                return_dict['n_columns'] = n_columns
-                return_dict['reps_per_row'] = reps_per_row
                 return_dict['raw_data'] = raw_data
-                # needed to internally calculate the measurement time, unless the columns are
-                # always in ns ?
-                return_dict['bin_width'] = self._fast_counter_device.get_binwidth()
             else:
                 self.log.warning('other ungated counters are not implemented at the moment')
         else:
@@ -149,28 +219,48 @@ class SingleShotLogic(GenericLogic):
 
         return 0
 
-    def find_laser(self, smoothing=10.0, n_laserpulses=2):
+    def _get_acquisition_settings(self):
+        """
+        Read the shape of the single shot data from the fastcounter.
+        @return dict: n_rows, n_columns, reps_per_row and bin_width
+        """
+        settings = self._fast_counter_device.get_settings()
+        # check if settings object is coming from a remote connection
+        settings = netobtain(settings)
+        return_dict = OrderedDict()
+        return_dict['n_rows'] = settings.cycles
+        # looks like this is in ns, but I'm not completely sure
+        return_dict['n_columns'] = settings.range
+        return_dict['reps_per_row'] = settings.swpreset
+        # needed to internally calculate the measurement time, unless the columns are
+        # always in ns ?
+        return_dict['bin_width'] = self._fast_counter_device.get_binwidth()
+        return return_dict
+
+    def find_laser(self, smoothing=10.0, n_laserpulses=2, summed_pulses=None):
         """
         returns the start and stop indices of laserpulses
         @param smoothing: smoothing data to improve flank detection
         @param n_laserpulses: the number of laserpulses expected in the data
+        @param numpy.ndarray summed_pulses: optional, rows already added up. Otherwise the rows
+                                            of the raw data are added up.
         @return: list containing tupels of start and stop values of individual laser pulses
         """
+        if summed_pulses is None:
+            data = self.data_dict['raw_data']
+            n_rows = self.data_dict['n_rows']
+
+            # we want to add up the pulses along the cycles axis
+            shape = data.shape
+            if shape[0] == n_rows:
+                axis = 0
+            elif shape[1] == n_rows:
+                axis = 1
+            else:
+                self.log.debug('something went wrong in identifying the correct axis of data in '
+                               'find_laser of singleshot_logic')
 
-        data = self.data_dict['raw_data']
-        n_rows = self.data_dict['n_rows']
-
-        # we want to add up the pulses along the cycles axis
-        shape = data.shape
-        if shape[0] == n_rows:
-            axis = 0
-        elif shape[1] == n_rows:
-            axis = 1
-        else:
-            self.log.debug('something went wrong in identifying the correct axis of data in find_laser '
-                           'of singleshot_logic')
-
-        summed_pulses = np.sum(data, axis)
+            summed_pulses = np.sum(data, axis)
 
         # TODO make the type of pulsed extraction adjustable
         self._pe_logic.number_of_lasers = n_laserpulses
@@ -194,17 +284,17 @@ class SingleShotLogic(GenericLogic):
         @param float smoothing: If pulse detection doesn't work, change this value
         @return numpy array: dimensionality is n_rows x n_laserpulses
         """
-        sum_single_pulses = []
-        start_stop_tupel_list = self.find_laser(smoothing=smoothing, n_laserpulses=n_laserpulses)
-        if self.data_dict:
-            data = self.data_dict['raw_data']
-            for row in data:
-                laser_pulses = [np.sum(row[jj[0]:jj[1]]) for jj in start_stop_tupel_list]
-                sum_single_pulses.append(laser_pulses)
-        else:
+        if not self.data_dict:
             self.log.error('Pull data from fastcounting device using get_data function before trying to sum_laserpulse.')
-
-        return np.array(sum_single_pulses)
+            return np.array([])
+        start_stop_tupel_list = self.find_laser(smoothing=smoothing, n_laserpulses=n_laserpulses)
+        data = self.data_dict['raw_data']
+        # one pass over all rows for each laser pulse
+        sum_single_pulses = np.zeros((data.shape[0], len(start_stop_tupel_list)),
+                                     dtype=np.result_type(data.dtype, np.int64))
+        for jj, (start, stop) in enumerate(start_stop_tupel_list):
+            np.sum(data[:, start:stop], axis=1, out=sum_single_pulses[:, jj])
+        return sum_single_pulses
 
 
     def get_normalized_signal(self, smoothing=10.0):
@@ -217,73 +307,52 @@ class SingleShotLogic(GenericLogic):
         @return numpy array: 1D array containing the normalized signal
         """
 
-        sum_single_pulses = self.sum_laserpulse()
-        if sum_single_pulses.shape[1] == 2:
-            normalized_signal = np.array([(ii[0] - ii[1])/(ii[0] + ii[1]) for ii in sum_single_pulses])
-        else:
+        sum_single_pulses = self.sum_laserpulse(smoothing=smoothing)
+        if sum_single_pulses.ndim != 2 or sum_single_pulses.shape[1] != 2:
             self.log.warning('could not perform normalisation. Wrong number of laserpulses.')
+            return None
 
+        normalized_signal = (sum_single_pulses[:, 0] - sum_single_pulses[:, 1]) / \
+                            (sum_single_pulses[:, 0] + sum_single_pulses[:, 1])
         return normalized_signal
 
-    def calc_all_binnings(self, num_bins=100):
+    def calc_all_binnings(self, num_bins=100, lazy=False):
         """
         calculate reasonable binnings of the signal
         @param int num_bins: minimal number the binnings can have
+        @param bool lazy: return a SingleShotBinnings sequence computing only the accessed binnings
         @return list bin_list: Contains the arrays with the binned data.
                                Data is structured as follows: bin_list[0] is the
                                initial binning given by the measurement and then going up.
         """
-
-        if self.data_dict:
-            data = self.data_dict
-        else:
+        if not self.data_dict:
             self.log.error('Pull data from fastcounting device using get_data function '
                            'before trying to calc_all_binnings.')
+            return np.array([], dtype=object)
 
-        NN = data['n_rows']
         # this is just a guess value, at some point it doesn't make
         # sense anymore to further decrease the number of bins
-        max_bin = NN // num_bins
-        count_var = 1
-        bin_list = []
-        temp_list = []
-        signal = self.sum_laserpulse()
-        while count_var <= max_bin:
-            # check if the the first run through loop was done
-            if temp_list:
-                app_arr = np.array(temp_list)
-                bin_list.append(app_arr)
-                temp_list = []
-            jj = 0
-            while jj < NN:
-                sum_ind = np.linspace(jj, jj + count_var - 1, count_var, dtype=np.int)
-                # make sure we don't try to adress not reserved memory
-                jj += count_var
-                if sum_ind[-1] < NN:
-                    # normalize
-                    temp_list.append(np.array([np.sum(signal[sum_ind, 0]), np.sum(signal[sum_ind, 1])]))
-                else:
-                    jj = NN
-            count_var += 1
-
-        return np.array(bin_list)
-
-    def calc_all_binnings_normalized(self, num_bins=100):
+        max_bin = self.data_dict['n_rows'] // num_bins
+        bin_list = SingleShotBinnings(self.sum_laserpulse(), max_bin)
+        return bin_list if lazy else bin_list.to_array()
+
+    def calc_all_binnings_normalized(self, num_bins=100, lazy=False):
         """
         Calculate all normalized binnings from singleshot data
         @param integer num_bins: Tells how many data points should still remain ( in this sense restricts the maximum
                                  number of data points added up together )
+        @param bool lazy: return a SingleShotBinnings sequence computing only the accessed binnings
         @return list normalized_bin_list: The entries are numpy arrays that represent different binnings
                                           ( 1 to n values)
         """
+        if not self.data_dict:
+            self.log.error('Pull data from fastcounting device using get_data function '
+                           'before trying to calc_all_binnings_normalized.')
+            return np.array([], dtype=object)
 
-        bin_list = self.calc_all_binnings(num_bins=num_bins)
-        normalized_bin_list = []
-        for binning in bin_list:
-            normalized_binning = (binning[:, 0] - binning[:, 1])/(binning[:, 0] + binning[:, 1])
-            normalized_bin_list.append(normalized_binning)
-
-        return np.array(normalized_bin_list)
+        max_bin = self.data_dict['n_rows'] // num_bins
+        normalized_bin_list = SingleShotBinnings(self.sum_laserpulse(), max_bin, normalized=True)
+        return normalized_bin_list if lazy else normalized_bin_list.to_array()
 
 
     def get_timetrace(self):
@@ -297,19 +366,16 @@ class SingleShotLogic(GenericLogic):
         # what needs to be done here now is the basic evaluation steps like fit, threshold
         # readout fidelity
 
-        bin_list = self.calc_all_binnings(self, num_bins=100)
+        bin_list = self.calc_all_binnings(num_bins=100, lazy=True)
 
-        param_dict_list = []
-        fidelity_list = []
-        for ii in bin_list:
-            # what is a good estimate for the number of bins ?
-            hist_y_val, hist_x_val = np.histogram(ii, bins=50)
-            hist_data = np.array([hist_x_val, hist_y_val])
-            threshold_fit, fidelity, \
-            param_dict = self._traceanalysis_logic.calculate_threshold(hist_data=hist_data,
-                                                                       distr='gaussian_normalized')
-            param_dict_list.append(param_dict)
-            fidelity_list.append(fidelity)
+        # what is a good estimate for the number of bins ?
+        histograms = [np.histogram(ii, bins=50) for ii in bin_list]
+        # the thresholds of all binnings are estimated at once
+        threshold_list, fidelity_list, \
+        param_dict_list = self._traceanalysis_logic.calculate_thresholds(
+            bin_edges=np.array([hist[1] for hist in histograms]),
+            counts=np.array([hist[0] for hist in histograms]),
+            distr='gaussian_normalized')
 
         # now get the maximum fidelity, not really working up till now. The fidelity alone is not a good indicator
         # because the fit can still be bad. Need somehow a mixed measure of this. Will look for some heuristic.
@@ -464,8 +530,9 @@ class SingleShotLogic(GenericLogic):
             save_path1 = os.path.join(filepath, filelabel1)
             np.save(save_path1, bin_list)
 
-        meta_data_dict = copy.deepcopy(self.data_dict)
-        meta_data_dict.pop('raw_data')
+        # raw data can be a memory mapped file of a streamed measurement, do not copy it
+        meta_data_dict = OrderedDict((key, copy.deepcopy(value))
+                                     for key, value in self.data_dict.items() if key != 'raw_data')
         meta_path = os.path.join(filepath, timestamp_str + '_meta_data')
         np.save(meta_path,meta_data_dict)
         for key in meta_data_dict:
@@ -475,6 +542,216 @@ class SingleShotLogic(GenericLogic):
 
         return
 
+    # =========================================================================
+    #                           Streaming acquisition
+    # =========================================================================
+
+    def start_streaming(self, n_laserpulses=2, smoothing=10.0, normalized=True, num_bins=100,
+                        threshold_interval=10, tag=None):
+        """
+        Start polling the completed rows of a running single shot measurement.
+
+        Completed rows are appended to a memory mapped .npy file in the SingleShot data
+        directory, the laser pulses are summed and added to an IncrementalHistogram. Every
+        threshold_interval polls the threshold and fidelity are calculated from the histogram, so
+        long measurements show the fidelity live while the memory usage stays fixed. The
+        measurement itself has to be started before, e.g. by the pulser and fastcounter.
+
+        @param int n_laserpulses: the number of laserpulses in each row
+        @param float smoothing: If pulse detection doesn't work, change this value
+        @param bool normalized: histogram (pulse 1 - pulse 2)/(pulse 1 + pulse 2) instead of the
+                                counts of the first laser pulse
+        @param int num_bins: number of histogram bins of the normalized signal
+        @param int threshold_interval: number of polls between threshold calculations
+        @param str tag: optional tag of the raw data file name
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._stream is not None or self.module_state() == 'locked':
+            self.log.error('Single shot streaming or measurement already running.')
+            return -1
+        if self._fast_counter_device.is_gated():
+            self.log.error('Streaming is only implemented for ungated fastcounters.')
+            return -1
+        if normalized and n_laserpulses != 2:
+            self.log.error('Normalized single shot signal requires 2 laserpulses.')
+            return -1
+
+        settings = self._get_acquisition_settings()
+        timestamp_str = datetime.datetime.now().strftime('%Y%m%d-%H%M-%S')
+        filelabel = timestamp_str + '_raw_data.npy'
+        if tag:
+            filelabel = tag + '_' + filelabel
+        filepath = os.path.join(self._save_logic.get_path_for_module(module_name='SingleShot'),
+                                filelabel)
+
+        self.module_state.lock()
+        self._stream = {'settings': settings,
+                        'filepath': filepath,
+                        'raw_data': None,
+                        'rows_done': 0,
+                        'laser_sums': None,
+                        'windows': None,
+                        'n_laserpulses': n_laserpulses,
+                        'smoothing': smoothing,
+                        'normalized': normalized,
+                        'threshold_interval': max(int(threshold_interval), 1),
+                        'polls': 0}
+        if normalized:
+            self._stream['histogram'] = IncrementalHistogram(base_width=2 / num_bins, origin=-1.)
+        else:
+            # integer bins for counts
+            self._stream['histogram'] = IncrementalHistogram(base_width=1., origin=-0.5)
+        self.threshold = None
+        self.fidelity = None
+        self.sigStartStreamTimer.emit()
+        return 0
+
+    def stop_streaming(self):
+        """
+        Stop the streaming acquisition. The rows completed so far are processed and kept.
+
+        The stream is finished in the thread of this module, sigStreamFinished is emitted when
+        it is done.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._stream is None:
+            return 0
+        self.sigStopStream.emit()
+        return 0
+
+    def _stop_stream(self):
+        """
+        Stop the poll timer and finish the stream, runs in the thread of this module.
+        """
+        self._stream_timer.stop()
+        self._finish_stream()
+
+    def _stream_poll(self):
+        """
+        Process the rows completed since the last poll.
+        """
+        if self._stream is None:
+            return
+        stream = self._stream
+        n_rows = stream['settings']['n_rows']
+        try:
+            finished = self._fast_counter_device.get_status() == 1
+            raw_data = netobtain(self._fast_counter_device.get_data_trace())
+            if raw_data.ndim == 1:
+                raw_data = raw_data.reshape((n_rows, -1))
+            rows_done = self._get_completed_rows(raw_data, finished)
+            if rows_done > stream['rows_done']:
+                self._stream_add_rows(raw_data, stream['rows_done'], rows_done)
+        except:
+            self.log.exception('Polling single shot data failed, streaming stopped.')
+            self._finish_stream()
+            return
+
+        if stream['rows_done'] >= n_rows or finished:
+            self._finish_stream()
+        else:
+            self.sigStartStreamTimer.emit()
+
+    def _get_completed_rows(self, raw_data, finished):
+        """
+        Number of rows the fastcounter has completed.
+
+        @param numpy.ndarray raw_data: current data, n_rows x n_columns
+        @param bool finished: the measurement has stopped
+
+        @return int: number of completed rows
+        """
+        if finished:
+            return raw_data.shape[0]
+        if hasattr(self._fast_counter_device, 'get_current_sweeps'):
+            sweeps = self._fast_counter_device.get_current_sweeps()
+            reps_per_row = max(int(self._stream['settings']['reps_per_row']), 1)
+            return min(int(sweeps) // reps_per_row, raw_data.shape[0])
+        # without a sweep counter the last row with counts might still be running
+        rows_with_counts = np.flatnonzero(raw_data[self._stream['rows_done']:].any(axis=1))
+        if len(rows_with_counts) == 0:
+            return self._stream['rows_done']
+        return self._stream['rows_done'] + int(rows_with_counts[-1])
+
+    def _stream_add_rows(self, raw_data, start, stop):
+        """
+        Store the completed rows, sum the laser pulses and update histogram and threshold.
+        """
+        stream = self._stream
+        rows = raw_data[start:stop]
+        if stream['raw_data'] is None:
+            stream['raw_data'] = np.lib.format.open_memmap(
+                stream['filepath'], mode='w+', dtype=raw_data.dtype, shape=raw_data.shape)
+            stream['laser_sums'] = np.zeros((raw_data.shape[0], stream['n_laserpulses']),
+                                            dtype=np.result_type(raw_data.dtype, np.int64))
+        stream['raw_data'][start:stop] = rows
+
+        if stream['windows'] is None:
+            stream['windows'] = self.find_laser(smoothing=stream['smoothing'],
+                                                n_laserpulses=stream['n_laserpulses'],
+                                                summed_pulses=np.sum(raw_data[:stop], axis=0))
+            # laser pulses were unknown so far, sum all completed rows
+            start = 0
+            rows = raw_data[:stop]
+        laser_sums = stream['laser_sums'][start:stop]
+        for jj, (window_start, window_stop) in enumerate(stream['windows']):
+            np.sum(rows[:, window_start:window_stop], axis=1, out=laser_sums[:, jj])
+        stream['rows_done'] = stop
+
+        if stream['normalized']:
+            values = (laser_sums[:, 0] - laser_sums[:, 1]) / (laser_sums[:, 0] + laser_sums[:, 1])
+            # like numpy.histogram, 1 belongs to the last bin
+            values = np.minimum(values, np.nextafter(1., -1.))
+        else:
+            values = laser_sums[:, 0]
+        stream['histogram'].add(values)
+        self.hist_data = stream['histogram'].get_histogram()
+        self.sigHistogramUpdated.emit()
+
+        stream['polls'] += 1
+        if stream['polls'] % stream['threshold_interval'] == 0:
+            self._stream_update_threshold(stream)
+
+    def _stream_update_threshold(self, stream):
+        """
+        Calculate the threshold and the readout fidelity from the accumulated histogram.
+        """
+        if stream['histogram'].num_values == 0:
+            return
+        distr = 'gaussian_normalized' if stream['normalized'] else 'poissonian'
+        threshold, fidelity, param_dict = self._traceanalysis_logic.calculate_threshold(
+            hist_data=stream['histogram'].get_histogram(), distr=distr)
+        self.threshold = float(threshold)
+        self.fidelity = float(fidelity)
+        self.sigThresholdUpdated.emit(self.threshold, self.fidelity)
+
+    def _finish_stream(self):
+        """
+        Flush the raw data file, calculate the final threshold and make the streamed rows
+        available for the binning methods.
+        """
+        stream = self._stream
+        if stream is None:
+            return
+        self._stream = None
+        if stream['raw_data'] is not None:
+            stream['raw_data'].flush()
+            rows_done = stream['rows_done']
+            return_dict = OrderedDict(stream['settings'])
+            return_dict['n_rows'] = rows_done
+            return_dict['raw_data'] = stream['raw_data'][:rows_done]
+            return_dict['raw_data_file'] = stream['filepath']
+            self.data_dict = return_dict
+            try:
+                self._stream_update_threshold(stream)
+            except:
+                self.log.exception('Threshold calculation of the streamed data failed.')
+        if self.module_state() == 'locked':
+            self.module_state.unlock()
+        self.sigStreamFinished.emit()
+
     # Helper methods
 
     def _do_optimize_pos(self):
@@ -518,9 +795,9 @@ class SingleShotLogic(GenericLogic):
         @param record_length:
         @return:
         """
-        normalized_bin_list = self.calc_all_binnings_normalized(self, num_bins=100)
+        normalized_bin_list = self.calc_all_binnings_normalized(num_bins=100, lazy=True)
 
-        # for now take only the initial binning
+        # for now take only the initial binning, the other binnings are not computed
         data = normalized_bin_list[0]
         measurement = self.data_dict
         # also only the initial binning, needs to be adjusted then
@@ -530,7 +807,7 @@ class SingleShotLogic(GenericLogic):
         self.do_calculate_histogram(data)
 
         # update the trace in the gui
-        self._do_calculate_trace(time_axis, data)
+        self.do_calculate_trace(time_axis, data)
 
 
 
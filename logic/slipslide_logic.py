@@ -24,21 +24,14 @@ from collections import OrderedDict
 from copy import copy
 import datetime
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 from io import BytesIO
 
 from logic.generic_logic import GenericLogic
+from logic.confocal_logic import OldConfigFileError
+from logic.scan_image import draw_scan_figure
 from core.util.mutex import Mutex
 
 
-class OldConfigFileError(Exception):
-    """ Exception that is thrown when an old config file is loaded.
-    """
-    def __init__(self):
-        super().__init__('Old configuration file detected. Ignoring confocal history.')
-
-
 class ConfocalHistoryEntry(QtCore.QObject):
     """ This class contains all relevant parameters of a Confocal scan.
         It provides methods to extract, restore and serialize this data.
@@ -1235,123 +1228,9 @@ class ConfocalLogic(GenericLogic):
 
         @return: fig fig: a matplotlib figure object to be saved to file.
         """
-        if scan_axis is None:
-            scan_axis = ['X', 'Y']
-
-        # If no colorbar range was given, take full range of data
-        if cbar_range is None:
-            cbar_range = [np.min(data), np.max(data)]
-
-        # Scale color values using SI prefix
-        prefix = ['', 'k', 'M', 'G']
-        prefix_count = 0
-        image_data = data
-        draw_cb_range = np.array(cbar_range)
-        image_dimension = image_extent.copy()
-
-        while draw_cb_range[1] > 1000:
-            image_data = image_data/1000
-            draw_cb_range = draw_cb_range/1000
-            prefix_count = prefix_count + 1
-
-        c_prefix = prefix[prefix_count]
-
-
-        # Scale axes values using SI prefix
-        axes_prefix = ['', 'm', r'$\mathrm{\mu}$', 'n']
-        x_prefix_count = 0
-        y_prefix_count = 0
-
-        while np.abs(image_dimension[1]-image_dimension[0]) < 1:
-            image_dimension[0] = image_dimension[0] * 1000.
-            image_dimension[1] = image_dimension[1] * 1000.
-            x_prefix_count = x_prefix_count + 1
-
-        while np.abs(image_dimension[3] - image_dimension[2]) < 1:
-            image_dimension[2] = image_dimension[2] * 1000.
-            image_dimension[3] = image_dimension[3] * 1000.
-            y_prefix_count = y_prefix_count + 1
-
-        x_prefix = axes_prefix[x_prefix_count]
-        y_prefix = axes_prefix[y_prefix_count]
-
-        # Use qudi style
-        plt.style.use(self._save_logic.mpl_qd_style)
-
-        # Create figure
-        fig, ax = plt.subplots()
-
-        # Create image plot
-        cfimage = ax.imshow(image_data,
-                            cmap=plt.get_cmap('inferno'), # reference the right place in qd
-                            origin="lower",
-                            vmin=draw_cb_range[0],
-                            vmax=draw_cb_range[1],
-                            interpolation='none',
-                            extent=image_dimension
-                            )
-
-        ax.set_aspect(1)
-        ax.set_xlabel(scan_axis[0] + ' position (' + x_prefix + 'm)')
-        ax.set_ylabel(scan_axis[1] + ' position (' + y_prefix + 'm)')
-        ax.spines['bottom'].set_position(('outward', 10))
-        ax.spines['left'].set_position(('outward', 10))
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.get_xaxis().tick_bottom()
-        ax.get_yaxis().tick_left()
-
-        # draw the crosshair position if defined
-        if crosshair_pos is not None:
-            trans_xmark = mpl.transforms.blended_transform_factory(
-                ax.transData,
-                ax.transAxes)
-
-            trans_ymark = mpl.transforms.blended_transform_factory(
-                ax.transAxes,
-                ax.transData)
-
-            ax.annotate('', xy=(crosshair_pos[0]*np.power(1000,x_prefix_count), 0),
-                        xytext=(crosshair_pos[0]*np.power(1000,x_prefix_count), -0.01), xycoords=trans_xmark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-
-            ax.annotate('', xy=(0, crosshair_pos[1]*np.power(1000,y_prefix_count)),
-                        xytext=(-0.01, crosshair_pos[1]*np.power(1000,y_prefix_count)), xycoords=trans_ymark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-            print(crosshair_pos, x_prefix_count, y_prefix_count)
-
-        # Draw the colorbar
-        cbar = plt.colorbar(cfimage, shrink=0.8)#, fraction=0.046, pad=0.08, shrink=0.75)
-        cbar.set_label('Fluorescence (' + c_prefix + 'c/s)')
-
-        # remove ticks from colorbar for cleaner image
-        cbar.ax.tick_params(which=u'both', length=0)
-
-        # If we have percentile information, draw that to the figure
-        if percentile_range is not None:
-            cbar.ax.annotate(str(percentile_range[0]),
-                             xy=(-0.3, 0.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate(str(percentile_range[1]),
-                             xy=(-0.3, 1.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate('(percentile)',
-                             xy=(-0.3, 0.5),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
+        fig = draw_scan_figure(data, image_extent, scan_axis=scan_axis, cbar_range=cbar_range,
+                               percentile_range=percentile_range, crosshair_pos=crosshair_pos,
+                               mpl_style=self._save_logic.mpl_qd_style)
         self.signal_draw_figure_completed.emit()
         return fig
 
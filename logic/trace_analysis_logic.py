@@ -21,12 +21,302 @@ from scipy.signal import gaussian
 from scipy.ndimage import filters
 import scipy.integrate as integrate
 from scipy.interpolate import InterpolatedUnivariateSpline
+from scipy.special import gammaln, ndtr, xlogy
 from collections import OrderedDict
 
 from core.module import Connector
 from logic.generic_logic import GenericLogic
 
 
+def make_hist_data(hist_x_val, hist_y_val):
+    """ Combine bin edges and counts into the hist_data format.
+    @param np.array hist_x_val: 1D array of the bin edges, one entry longer than hist_y_val
+    @param np.array hist_y_val: 1D array of the counts
+    @return np.array: object array with the entries hist_x_val and hist_y_val
+    """
+    hist_data = np.empty(2, dtype=object)
+    hist_data[0] = hist_x_val
+    hist_data[1] = hist_y_val
+    return hist_data
+
+
+class IncrementalHistogram:
+    """ Histogram accumulating the counts of arriving data at a fixed base resolution.
+
+    Base bin i covers [origin + i * base_width, origin + (i + 1) * base_width). Adding data costs
+    O(new data), a coarser binning is derived by merging base bins in O(number of base bins),
+    so growing traces never have to be histogrammed again. The range grows with the data.
+    """
+
+    def __init__(self, base_width=1., origin=0.):
+        """
+        @param float base_width: width of the finest bins, e.g. 1 for photon counts
+        @param float origin: edge of one base bin, e.g. -0.5 to center bins on integers
+        """
+        if base_width <= 0:
+            raise ValueError('Base width of an IncrementalHistogram must be positive.')
+        self.base_width = float(base_width)
+        self.origin = float(origin)
+        self.clear()
+
+    def clear(self):
+        """ Remove all counts. """
+        self._counts = np.zeros(0, dtype='int64')
+        # base bin index of self._counts[0]
+        self._offset = 0
+        # occupied range of base bin indices [low, high)
+        self._low = None
+        self._high = None
+        self.num_values = 0
+
+    def add(self, data):
+        """ Add data to the histogram, non-finite values are ignored.
+        @param np.array data: new data points
+        """
+        data = np.asarray(data, dtype=float).ravel()
+        data = data[np.isfinite(data)]
+        if data.size == 0:
+            return
+        indices = np.floor((data - self.origin) / self.base_width).astype(np.int64)
+        # like numpy.histogram, correct rounding errors so that the bins match their edges
+        indices[data < self.origin + indices * self.base_width] -= 1
+        indices[data >= self.origin + (indices + 1) * self.base_width] += 1
+        low = int(indices.min())
+        high = int(indices.max()) + 1
+        self._reserve(low, high)
+        start = low - self._offset
+        self._counts[start:start + high - low] += np.bincount(indices - low, minlength=high - low)
+        self._low = low if self._low is None else min(self._low, low)
+        self._high = high if self._high is None else max(self._high, high)
+        self.num_values += data.size
+
+    def _reserve(self, low, high):
+        """ Grow the count array to contain the base bins [low, high). """
+        if self._low is None:
+            new_low, new_high = low, high
+        else:
+            new_low = min(low, self._offset)
+            new_high = max(high, self._offset + len(self._counts))
+        if new_low >= self._offset and new_high <= self._offset + len(self._counts):
+            return
+        # double the capacity to keep growing amortized O(1)
+        size = max(new_high - new_low, 2 * len(self._counts))
+        padding = size - (new_high - new_low)
+        # leave the free space on the side(s) the data extends to
+        grow_down = self._low is not None and low < self._offset
+        grow_up = self._low is None or high > self._offset + len(self._counts)
+        if grow_down and grow_up:
+            below = padding // 2
+        elif grow_down:
+            below = padding
+        else:
+            below = 0
+        counts = np.zeros(size, dtype='int64')
+        new_offset = new_low - below
+        if len(self._counts):
+            start = self._offset - new_offset
+            counts[start:start + len(self._counts)] = self._counts
+        self._counts = counts
+        self._offset = new_offset
+
+    def get_histogram(self, num_bins=None, bin_width=None):
+        """ Get the histogram of all added data.
+        @param int num_bins: optional, merge base bins to get at least this number of bins
+        @param float bin_width: optional, merge base bins to get this bin width (rounded to
+                                a multiple of the base width). Ignored if num_bins is given.
+        @return np.array: hist_data, first entry are the bin edges and second entry are
+                          the counts, covering the range of the added data
+        """
+        if self._low is None:
+            return make_hist_data(np.array([self.origin, self.origin + self.base_width]),
+                                  np.zeros(1, dtype='int64'))
+        counts = self._counts[self._low - self._offset:self._high - self._offset]
+        factor = 1
+        if num_bins is not None and num_bins > 0:
+            factor = max(int(np.floor(len(counts) / num_bins)), 1)
+        elif bin_width is not None:
+            factor = max(int(round(bin_width / self.base_width)), 1)
+        if factor > 1:
+            padded = np.zeros(-(-len(counts) // factor) * factor, dtype='int64')
+            padded[:len(counts)] = counts
+            counts = padded.reshape(-1, factor).sum(axis=1)
+        else:
+            counts = counts.copy()
+        edges = self.origin + (self._low + np.arange(len(counts) + 1) * factor) * self.base_width
+        return make_hist_data(edges, counts)
+
+
+def poissonian(x, mu):
+    """ Poisson distribution, defined for non-integer x like the poissonian fit model.
+    @param np.array x: occurrences
+    @param np.array mu: expectation values, broadcast against x
+    @return np.array: probabilities
+    """
+    return np.exp(xlogy(x, mu) - gammaln(x + 1) - mu)
+
+
+def estimate_double_mixture(bin_edges, counts, distr='poissonian', max_iter=500, tol=1e-8,
+                            min_weight=1e-3):
+    """ Estimate a mixture of two peaks from histogram counts by expectation-maximization.
+
+    The initial guess is the Otsu split of the histogram, i.e. the split with the largest
+    variance between the two classes, which follows in closed form from cumulative sums. All
+    histograms are estimated together, so many histograms cost about as much as one.
+
+    @param np.array bin_edges: bin edges, 1D for a common binning or 2D with one row per histogram
+    @param np.array counts: histogram counts, 1D or 2D with one row per histogram
+    @param str distr: 'poissonian' or 'gaussian_normalized'
+    @param int max_iter: maximum number of iterations
+    @param float tol: convergence tolerance of the log-likelihood per count
+    @param float min_weight: smallest fraction of counts a peak must have
+
+    @return dict: 'weight', 'mean' and 'sigma' arrays of shape (histograms, 2) with the peaks
+                  sorted by their mean, 'converged' bool array and 'iterations' int array
+    """
+    counts = np.atleast_2d(np.asarray(counts, dtype=float))
+    edges = np.atleast_2d(np.asarray(bin_edges, dtype=float))
+    edges = np.broadcast_to(edges, (counts.shape[0], edges.shape[1]))
+    x = (edges[:, :-1] + edges[:, 1:]) / 2
+    total = counts.sum(axis=1)
+    gaussian = distr == 'gaussian_normalized'
+    # binning noise as smallest width of a gaussian peak
+    min_var = ((edges[:, -1] - edges[:, 0]) / counts.shape[1]) ** 2 / 12
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Otsu split: class 0 are the bins up to and including the split index
+        cum_counts = np.cumsum(counts, axis=1)[:, :-1]
+        cum_sum = np.cumsum(counts * x, axis=1)[:, :-1]
+        cum_sqr = np.cumsum(counts * x ** 2, axis=1)[:, :-1]
+        counts_1 = total[:, None] - cum_counts
+        sum_1 = cum_sum[:, -1:] + (counts * x)[:, -1:] - cum_sum
+        sqr_1 = cum_sqr[:, -1:] + (counts * x ** 2)[:, -1:] - cum_sqr
+        between = cum_counts * counts_1 * (sum_1 / counts_1 - cum_sum / cum_counts) ** 2
+        split = np.argmax(np.where(np.isfinite(between), between, -1), axis=1)
+        rows = np.arange(len(counts))
+
+        def at_split(array):
+            return array[rows, split]
+
+        class_counts = np.stack([at_split(cum_counts), at_split(counts_1)], axis=1)
+        sums = np.stack([at_split(cum_sum), at_split(sum_1)], axis=1)
+        sqrs = np.stack([at_split(cum_sqr), at_split(sqr_1)], axis=1)
+        weight = class_counts / total[:, None]
+        mean = sums / class_counts
+        var = np.maximum(sqrs / class_counts - mean ** 2, min_var[:, None])
+
+        converged = np.zeros(len(counts), dtype=bool)
+        iterations = np.full(len(counts), max_iter)
+        log_likelihood = np.full(len(counts), -np.inf)
+        for iteration in range(1, max_iter + 1):
+            # E-step: responsibilities of both peaks for every bin
+            if gaussian:
+                log_p = (-0.5 * np.log(2 * np.pi * var[:, None, :])
+                         - (x[:, :, None] - mean[:, None, :]) ** 2 / (2 * var[:, None, :]))
+            else:
+                log_p = (xlogy(x[:, :, None], mean[:, None, :]) - gammaln(x[:, :, None] + 1)
+                         - mean[:, None, :])
+            log_p += np.log(weight[:, None, :])
+            log_norm = np.logaddexp(log_p[..., 0], log_p[..., 1])
+            resp = np.exp(log_p - log_norm[..., None])
+
+            last_log_likelihood = log_likelihood
+            log_likelihood = np.where(counts > 0, counts * log_norm, 0).sum(axis=1) / total
+            done = ~converged & (np.abs(log_likelihood - last_log_likelihood) <= tol)
+            iterations[done] = iteration
+            converged |= done
+            if not np.any(~converged & np.isfinite(log_likelihood)):
+                break
+
+            # M-step, converged histograms keep their peaks
+            active = ~converged[:, None]
+            weighted = counts[..., None] * resp
+            class_counts = weighted.sum(axis=1)
+            weight = np.where(active, class_counts / total[:, None], weight)
+            new_mean = (weighted * x[..., None]).sum(axis=1) / class_counts
+            if gaussian:
+                new_var = (weighted * (x[..., None] - new_mean[:, None, :]) ** 2).sum(axis=1)
+                var = np.where(active, np.maximum(new_var / class_counts, min_var[:, None]), var)
+            mean = np.where(active, new_mean, mean)
+
+        sigma = np.sqrt(var) if gaussian else np.sqrt(mean)
+        order = np.argsort(mean, axis=1)
+        weight = weight[rows[:, None], order]
+        mean = mean[rows[:, None], order]
+        sigma = sigma[rows[:, None], order]
+        converged &= (np.all(np.isfinite(mean), axis=1) & np.all(np.isfinite(sigma), axis=1)
+                      & (weight.min(axis=1) >= min_weight) & (mean[:, 0] < mean[:, 1]))
+
+    return {'weight': weight, 'mean': mean, 'sigma': sigma, 'converged': converged,
+            'iterations': iterations}
+
+
+def mixture_threshold(bin_edges, mixture, distr='poissonian'):
+    """ Calculate threshold and readout fidelity of two peaks like the fit based path of
+    TraceAnalysisLogic.calculate_threshold.
+
+    For poissonian peaks the threshold is the bin edge where the weighted distributions cross
+    and the fidelity is calculated from the overlap of both peaks summed over the bin edges. For
+    gaussian peaks on the interval (-1, 1) the threshold is the intersection of both peaks.
+
+    @param np.array bin_edges: bin edges, 1D for a common binning or 2D with one row per histogram
+    @param dict mixture: peaks as returned by estimate_double_mixture
+    @param str distr: 'poissonian' or 'gaussian_normalized'
+
+    @return tuple(np.array, np.array, np.array): thresholds, fidelities and normalized
+                                                 fidelities (only for poissonian peaks)
+    """
+    weight, mean, sigma = mixture['weight'], mixture['mean'], mixture['sigma']
+    edges = np.atleast_2d(np.asarray(bin_edges, dtype=float))
+    edges = np.broadcast_to(edges, (len(mean), edges.shape[1]))
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        if distr == 'gaussian_normalized':
+            # intersection of both weighted gaussians, a * t**2 + b * t + c = 0
+            var0, var1 = sigma[:, 0] ** 2, sigma[:, 1] ** 2
+            a = 1 / (2 * var0) - 1 / (2 * var1)
+            b = mean[:, 1] / var1 - mean[:, 0] / var0
+            c = (mean[:, 0] ** 2 / (2 * var0) - mean[:, 1] ** 2 / (2 * var1)
+                 - np.log(weight[:, 1] * sigma[:, 0] / (weight[:, 0] * sigma[:, 1])))
+            root = np.sqrt(b ** 2 - 4 * a * c)
+            linear = np.isclose(a, 0)
+            candidates = np.stack([np.where(linear, -c / b, (-b + root) / (2 * a)),
+                                   np.where(linear, -c / b, (-b - root) / (2 * a))], axis=1)
+            between = (candidates > mean[:, :1]) & (candidates < mean[:, 1:])
+            threshold = np.where(between[:, 0], candidates[:, 0],
+                                 np.where(between[:, 1], candidates[:, 1], np.nan))
+
+            def cdf(value, index):
+                return ndtr((value - mean[:, index]) / sigma[:, index])
+
+            # fraction of each peak on the wrong side of the threshold within (-1, 1)
+            error_1 = (cdf(threshold, 1) - cdf(-1, 1)) / (cdf(1, 1) - cdf(-1, 1))
+            error_0 = (cdf(1, 0) - cdf(threshold, 0)) / (cdf(1, 0) - cdf(-1, 0))
+            fidelity = 1 - (error_0 + error_1) / 2
+            return threshold, fidelity, np.full(len(mean), np.nan)
+
+        dist_0 = poissonian(edges, mean[:, :1])
+        dist_1 = poissonian(edges, mean[:, 1:])
+        difference = weight[:, :1] * dist_0 - weight[:, 1:] * dist_1
+        # the first change of sign, the first bin edge if there is none
+        change = (((difference[:, :-1] < 0) & (difference[:, 1:] >= 0))
+                  | ((difference[:, :-1] > 0) & (difference[:, 1:] <= 0)))
+        index = np.argmax(change, axis=1)
+        rows = np.arange(len(mean))
+        threshold = edges[rows, index]
+
+        zeros = np.zeros((len(mean), 1))
+        cum_0 = np.concatenate([zeros, np.cumsum(dist_0, axis=1)], axis=1)
+        cum_1 = np.concatenate([zeros, np.cumsum(dist_1, axis=1)], axis=1)
+        area_0, area_1 = cum_0[:, -1], cum_1[:, -1]
+        low_0 = cum_0[rows, index]
+        low_1 = cum_1[rows, index]
+        high_0, high_1 = area_0 - low_0, area_1 - low_1
+        fidelity = 1 - (low_1 / low_0 + high_0 / high_1) / 2
+        normalized_fidelity = 1 - ((low_1 / area_1) / (low_0 / area_0)
+                                   + (high_0 / area_0) / (high_1 / area_1)) / 2
+        return threshold, fidelity, normalized_fidelity
+
+
 class TraceAnalysisLogic(GenericLogic):
     """ Perform a gated counting measurement with the hardware.  """
 
@@ -60,6 +350,11 @@ class TraceAnalysisLogic(GenericLogic):
         self.fidelity_left = 0
         self.fidelity_right = 0
 
+        # state of the streaming HMM forward pass
+        self._hmm_stream = None
+        # IncrementalHistogram of growing traces
+        self._hist_stream = None
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -88,7 +383,12 @@ class TraceAnalysisLogic(GenericLogic):
         self._hist_num_bins = num_bins
 
         if update:
-            self.do_calculate_histogram()
+            if self._hist_stream is not None:
+                # merging base bins, the trace is not needed again
+                self.hist_data = self._hist_stream.get_histogram(self._hist_num_bins)
+                self.sigHistogramUpdated.emit()
+            else:
+                self.do_calculate_histogram()
 
     def do_calculate_histogram(self, mode='normal'):
         """ Passes all the needed parameters to the appropriated methods.
@@ -144,11 +444,37 @@ class TraceAnalysisLogic(GenericLogic):
             else:
                 hist_y_val, hist_x_val = np.histogram(trace, num_bins)
 
-        self.hist_data = np.array([hist_x_val, hist_y_val])
+        self.hist_data = make_hist_data(hist_x_val, hist_y_val)
         self.sigHistogramUpdated.emit()
 
         return self.hist_data
 
+    def start_histogram_stream(self, base_width=1., origin=-0.5):
+        """ Start an incremental histogram of a growing trace, e.g. a counter log or single shot
+        stream. Only new data is passed to update_histogram_stream and the number of bins can be
+        changed without the trace.
+        @param float base_width: finest bin width, the default suits photon counts
+        @param float origin: edge of one base bin, the default centers bins on integers
+        """
+        self._hist_stream = IncrementalHistogram(base_width=base_width, origin=origin)
+
+    def update_histogram_stream(self, new_data):
+        """ Add new trace data to the incremental histogram.
+        @param np.array new_data: 1D array of new trace values
+        @return np.array: hist_data with the current number of bins
+        """
+        if self._hist_stream is None:
+            self.log.error('No histogram stream started. Call start_histogram_stream first.')
+            return self.hist_data
+        self._hist_stream.add(new_data)
+        self.hist_data = self._hist_stream.get_histogram(self._hist_num_bins)
+        self.sigHistogramUpdated.emit()
+        return self.hist_data
+
+    def stop_histogram_stream(self):
+        """ Stop the incremental histogram, hist_data keeps the last histogram. """
+        self._hist_stream = None
+
     def analyze_flip_prob(self, trace, num_bins=None, threshold=None):
         """General method, which analysis how often a value was changed from
            one data point to another in relation to a certain threshold.
@@ -481,22 +807,83 @@ class TraceAnalysisLogic(GenericLogic):
         fit_result = None
         return hist_fit_x, hist_fit_y, param_dict, fit_result
 
+    def get_run_lengths(self, trace, threshold, dt=1.):
+        """ Digitise a trace at the threshold and return the duration of all consecutive runs.
+        @param np.array trace: 1D trace of data
+        @param float threshold: values greater or equal are high (1), all others low (0)
+        @param float dt: duration of a single trace point
+        @return np.array: 1D array of signed run durations in chronological order. High runs
+                          are positive, low runs are negative, i.e. a run of n low points gives
+                          -n * dt.
+        """
+        digital_trace = np.asarray(trace) >= threshold
+        if digital_trace.size == 0:
+            return np.array([])
+
+        run_starts = np.concatenate(([0], np.flatnonzero(digital_trace[1:] != digital_trace[:-1]) + 1))
+        run_lengths = np.diff(np.append(run_starts, digital_trace.size))
+        return np.where(digital_trace[run_starts], run_lengths, -run_lengths) * dt
+
+    def get_run_lengths_chunked(self, trace, threshold, dt=1., chunk_size=2**24):
+        """ Same as get_run_lengths, but processes the trace in chunks.
+        @param np.array or str trace: 1D trace of data. Can also be a np.memmap or the path to a
+                                      .npy file, which is then memory-mapped, so that traces
+                                      larger than the memory can be analysed.
+        @param float threshold: values greater or equal are high (1), all others low (0)
+        @param float dt: duration of a single trace point
+        @param int chunk_size: number of trace points read at once
+        @return np.array: 1D array of signed run durations, identical to get_run_lengths
+        """
+        if isinstance(trace, str):
+            trace = np.load(trace, mmap_mode='r')
+
+        runs = []
+        # the last run of a chunk might continue in the next chunk, so it is kept back
+        pending_run = 0
+        for start in range(0, len(trace), chunk_size):
+            chunk_runs = self.get_run_lengths(trace[start:start + chunk_size], threshold)
+            if pending_run != 0:
+                if np.sign(chunk_runs[0]) == np.sign(pending_run):
+                    chunk_runs[0] += pending_run
+                else:
+                    runs.append(np.array([pending_run]))
+            runs.append(chunk_runs[:-1])
+            pending_run = chunk_runs[-1]
+        if pending_run != 0:
+            runs.append(np.array([pending_run]))
+
+        if not runs:
+            return np.array([])
+        return np.concatenate(runs) * dt
+
     def analyze_lifetime(self, trace, dt, method='postselect',
-                         distr='gaussian_normalized', state='|-1>', num_bins=50):
+                         distr=None, state='|-1>', num_bins=50, chunk_size=None):
         """ Perform an lifetime analysis of a 1D time trace. The analysis is
-            based on the method provided ( for now only post select is implemented ).
+            based on the method provided, either 'postselect' (threshold and run lengths) or
+            'hmm' (poissonian hidden Markov model, see fit_hmm).
         @param numpy array trace: 1 D array
         @param string method: The method used for the lifetime analysis
-        @param string distr: distribution used for analysis
+        @param string distr: distribution used for analysis. The 'hmm' method needs a trace of
+                             counts, i.e. 'poissonian'. Defaults to 'gaussian_normalized' for
+                             the 'postselect' method and to 'poissonian' for the 'hmm' method.
         @param string state: State that the mw was applied to
         @param int num_bins: number of bins used in the histogram to determine the threshold before digitalisation
                              of data
+        @param int chunk_size: optional, if given the trace is digitised in chunks of this size
+                               (see get_run_lengths_chunked). Then the trace can also be a
+                               np.memmap or the path to a .npy file.
         @return: dictionary containing the lifetimes of the different states |0>, |1>, |-1> in the case of the HMM method
                  For the postselect method only lifetime for bright and darkstate is returned, keys are 'bright_state' and
                  'dark_state'
         """
         lifetime_dict = {}
 
+        if distr is None:
+            distr = 'poissonian' if method == 'hmm' else 'gaussian_normalized'
+
+        if isinstance(trace, str):
+            trace = np.load(trace, mmap_mode='r')
+
         if method == 'postselect':
             if distr == 'gaussian_normalized':
                 hist_y_val, hist_x_val = np.histogram(trace, num_bins)
@@ -505,50 +892,10 @@ class TraceAnalysisLogic(GenericLogic):
                                                                                distr='gaussian_normalized')
                 threshold = threshold_fit
 
-            # helper functions to get and analyze the timetrace
-            def analog_digitial_converter(cut_off, data):
-                digital_trace = []
-                for data_point in data:
-                    if data_point >= cut_off:
-                        digital_trace.append(1)
-                    else:
-                        digital_trace.append(0)
-                return digital_trace
-
-            def time_in_high_low(digital_trace, dt):
-                """
-                What I need this function to do is to get all consecutive {1, ... , n} 1s or 0s and add
-                them up and put into a list to later make a histogram from them.
-                """
-                occurances = []
-                index = 0
-                index2 = 0
-
-                while (index < len(digital_trace)):
-                    occurances.append(0)
-                    # start following the consecutive 1s
-                    while (digital_trace[index] == 1):
-                        occurances[index2] += 1
-                        if index == (len(digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * dt
-                        else:
-                            index += 1
-                    if digital_trace[index - 1] == 1:
-                        index2 += 1
-                        occurances.append(0)
-                    # start following the consecutive 0s
-                    while (digital_trace[index] == 0):
-                        occurances[index2] -= 1
-                        if index == (len(digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * dt
-                        else:
-                            index += 1
-                    index2 += 1
-
-            digital_trace = analog_digitial_converter(threshold, trace)
-            time_array = time_in_high_low(digital_trace, dt)
+            if chunk_size is None:
+                time_array = self.get_run_lengths(trace, threshold, dt)
+            else:
+                time_array = self.get_run_lengths_chunked(trace, threshold, dt, chunk_size)
 
             # now we need to make a histogram as well as a fit
             # what would be a good estimate for the number of bins
@@ -557,15 +904,12 @@ class TraceAnalysisLogic(GenericLogic):
             # number of steps in between, rather not use that for now
             # est_bins = np.int(longest/dt)
 
-            time_array_high = np.array([ii for ii in filter(lambda x: x > 0, time_array)])
-            time_array_low = np.array([ii for ii in filter(lambda x: x < 0, time_array)])
+            time_array_high = time_array[time_array > 0]
+            time_array_low = time_array[time_array < 0]
 
             # get lifetime of bright state
             time_hist_high = np.histogram(time_array_high, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_high[0][0:num_bins]))]
-
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
+            indices = np.flatnonzero(time_hist_high[0][0:num_bins] > 0)
             self.log.debug('threshold {0}'.format(threshold))
             self.log.debug('time_array:{0}'.format(time_array))
             self.log.debug('time_array_high:{0}'.format(time_array_high))
@@ -587,10 +931,8 @@ class TraceAnalysisLogic(GenericLogic):
 
             # get lifetime of dark state
             time_hist_low = np.histogram(time_array_low, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_low[0][0:num_bins]))]
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
-            values = np.array([val[1] for val in vals])
+            indices = np.flatnonzero(time_hist_low[0][0:num_bins] > 0)
+            values = time_hist_low[0][indices]
             # positive axis
             mirror_axis = -time_hist_low[1][indices]
             result = self._fit_logic.make_decayexponential_fit(mirror_axis,
@@ -605,8 +947,323 @@ class TraceAnalysisLogic(GenericLogic):
             # also give back the data used for the fit
             lifetime_dict['dark_raw'] = np.array([mirror_axis, values])
 
+        elif method == 'hmm':
+            if distr != 'poissonian':
+                self.log.error('The HMM lifetime analysis needs a trace of counts '
+                               '(distr=\'poissonian\'), not {0}.'.format(distr))
+                return lifetime_dict
+            if np.any(trace < 0) or np.any(np.mod(trace, 1) != 0):
+                self.log.error('The HMM lifetime analysis needs a trace of counts, the trace '
+                               'contains negative or non-integer values.')
+                return lifetime_dict
+            hmm_dict = self.fit_hmm(trace, num_states=2)
+            lifetimes = self.get_hmm_lifetimes(hmm_dict['transition_matrix'], dt)
+            for state, lifetime in enumerate(lifetimes):
+                lifetime_dict['state_{0:d}'.format(state)] = lifetime
+            # the state with the higher count rate is the bright state
+            bright = np.argmax(hmm_dict['rates'])
+            lifetime_dict['bright_state'] = lifetimes[bright]
+            lifetime_dict['dark_state'] = lifetimes[1 - bright]
+            lifetime_dict['result_hmm'] = hmm_dict
+
         return lifetime_dict
 
+    ###########################################################################
+    #                  Poissonian hidden Markov model methods                 #
+    ###########################################################################
+
+    def get_hmm_log_emission(self, trace, rates):
+        """ Poissonian log-likelihood of every trace point for every hidden state.
+        @param np.array trace: 1D array of (photon) counts
+        @param np.array rates: 1D array with the mean counts of each state
+        @return np.array: 2D array of shape (len(trace), len(rates))
+        """
+        counts = np.asarray(trace, dtype=float)[:, np.newaxis]
+        rates = np.maximum(np.asarray(rates, dtype=float), 1e-12)[np.newaxis, :]
+        return counts * np.log(rates) - rates - gammaln(counts + 1)
+
+    @staticmethod
+    def _hmm_scan(elements, combine, reverse=False):
+        """ Inclusive scan of an associative operation, vectorized over blocks of the elements.
+        First all blocks are scanned at once, stepping through the positions within a block.
+        Then the result of each block is combined into all elements of the next block.
+        @param np.array elements: (T, ...) array of the elements to combine
+        @param callable combine: combine(earlier, later) of two equally long stacks of elements
+        @param bool reverse: element t combines the elements t to T - 1 instead of 0 to t
+        @return np.array: (T, ...) array of the combined elements
+        """
+        if reverse:
+            result = np.array(elements[::-1])
+            scan_combine = lambda earlier, later: combine(later, earlier)
+        else:
+            result = np.array(elements)
+            scan_combine = combine
+
+        block = max(int(np.sqrt(len(result))), 1)
+        for position in range(1, block):
+            current = result[position::block]
+            result[position::block] = scan_combine(
+                result[position - 1::block][:len(current)], current)
+        for start in range(block, len(result), block):
+            current = result[start:start + block]
+            result[start:start + block] = scan_combine(
+                np.broadcast_to(result[start - 1], current.shape), current)
+        return result[::-1] if reverse else result
+
+    @staticmethod
+    def _hmm_matrix_product(earlier, later):
+        """ Products of two stacks of non-negative matrices, each scaled to a maximum of one. """
+        product = np.matmul(earlier, later)
+        scale = product.max(axis=(1, 2))
+        return product / np.where(scale > 0, scale, 1)[:, np.newaxis, np.newaxis]
+
+    @staticmethod
+    def _hmm_max_plus_product(earlier, later):
+        """ Max-plus products of two stacks of log matrices, each shifted to a maximum of zero. """
+        product = (earlier[:, :, :, np.newaxis] + later[:, np.newaxis, :, :]).max(axis=2)
+        return product - product.max(axis=(1, 2))[:, np.newaxis, np.newaxis]
+
+    @staticmethod
+    def _hmm_index_composition(earlier, later):
+        """ Compositions of two stacks of index maps, earlier[k][later[k][j]] for every k. """
+        return earlier[np.arange(len(earlier))[:, np.newaxis], later]
+
+    def _hmm_forward(self, log_emission, log_trans, log_start, continued=False):
+        """ Normalized forward pass.
+        The filtered state probabilities are the normalized products of the transition matrices
+        weighted with the emission probabilities, which are calculated by a parallel scan.
+        @param np.array log_emission: (T, N) log emission probabilities
+        @param np.array log_trans: (N, N) log transition matrix, [from, to]
+        @param np.array log_start: (N,) log state probabilities of the first point, or if
+                                   continued is True, the log filtered state probabilities of
+                                   the point before the first one
+        @param bool continued: whether the first point is reached by a transition from log_start
+        @return tuple(np.array, np.array): (T, N) log filtered state probabilities and the (T,)
+                                           log normalization of each step. The sum of the
+                                           latter is the log-likelihood of the trace.
+        """
+        if len(log_emission) == 0:
+            return np.empty(log_emission.shape), np.empty(0)
+        emission_max = log_emission.max(axis=1)
+        emission = np.exp(log_emission - emission_max[:, np.newaxis])
+        trans = np.exp(log_trans)
+        start = np.exp(log_start)
+
+        matrices = trans[np.newaxis, :, :] * emission[:, np.newaxis, :]
+        if not continued:
+            matrices[0] = np.diag(emission[0])
+        products = self._hmm_scan(matrices, self._hmm_matrix_product)
+        filtered = np.matmul(start / start.max(), products)
+        filtered /= filtered.sum(axis=1, keepdims=True)
+
+        # the normalization is the probability of each point given all points before
+        predicted = np.empty(filtered.shape)
+        predicted[0] = np.dot(start, trans) if continued else start
+        predicted[1:] = np.dot(filtered[:-1], trans)
+        log_norm = np.log((predicted * emission).sum(axis=1)) + emission_max
+        with np.errstate(divide='ignore'):
+            return np.log(filtered), log_norm
+
+    def _hmm_backward(self, log_emission, log_trans):
+        """ Backward pass, calculated by a parallel scan like the forward pass.
+        @param np.array log_emission: (T, N) log emission probabilities
+        @param np.array log_trans: (N, N) log transition matrix, [from, to]
+        @return np.array: (T, N) log backward variables, normalized to a sum of one at every point
+        """
+        beta = np.ones(log_emission.shape)
+        if len(log_emission) > 1:
+            emission = np.exp(log_emission[1:] - log_emission[1:].max(axis=1)[:, np.newaxis])
+            matrices = np.exp(log_trans)[np.newaxis, :, :] * emission[:, np.newaxis, :]
+            products = self._hmm_scan(matrices, self._hmm_matrix_product, reverse=True)
+            beta[:-1] = products.sum(axis=2)
+        beta /= beta.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore'):
+            return np.log(beta)
+
+    def fit_hmm(self, trace, num_states=2, rates=None, transition_matrix=None, max_iter=100,
+                tolerance=1e-6):
+        """ Estimate a poissonian hidden Markov model with the Baum-Welch (forward-backward)
+            algorithm.
+        @param np.array trace: 1D array of (photon) counts
+        @param int num_states: number of hidden states
+        @param np.array rates: optional, initial mean counts of the states. Per default they are
+                               taken from equally spaced quantiles of the trace.
+        @param np.array transition_matrix: optional, initial (N, N) transition matrix [from, to]
+        @param int max_iter: maximum number of Baum-Welch iterations
+        @param float tolerance: stop when the log-likelihood improves less than this
+        @return dict: 'rates', 'transition_matrix', 'prior', 'log_likelihood', 'iterations' and
+                      'state_probabilities' (the (T, N) posterior state probabilities)
+        """
+        trace = np.asarray(trace, dtype=float)
+        if rates is None:
+            rates = np.percentile(trace, 100 * (np.arange(num_states) + 0.5) / num_states)
+        rates = np.asarray(rates, dtype=float)
+        num_states = len(rates)
+        if transition_matrix is None:
+            transition_matrix = np.full((num_states, num_states), 0.1 / max(num_states - 1, 1))
+            np.fill_diagonal(transition_matrix, 0.9 if num_states > 1 else 1.)
+        log_trans = np.log(transition_matrix)
+        log_prior = np.full(num_states, -np.log(num_states))
+
+        log_likelihood = -np.inf
+        for iteration in range(1, max_iter + 1):
+            log_emission = self.get_hmm_log_emission(trace, rates)
+            log_filtered, log_norm = self._hmm_forward(log_emission, log_trans, log_prior)
+            log_beta = self._hmm_backward(log_emission, log_trans)
+            new_log_likelihood = log_norm.sum()
+
+            # posterior state probabilities of every point
+            gamma = np.exp(log_filtered + log_beta)
+            gamma /= gamma.sum(axis=1, keepdims=True)
+
+            # expected transition counts summed over all time steps, the two-slice posteriors
+            # are normalized for every step
+            log_xi = (log_filtered[:-1, :, np.newaxis] + log_trans[np.newaxis, :, :]
+                      + (log_emission[1:] + log_beta[1:])[:, np.newaxis, :])
+            log_xi -= np.logaddexp.reduce(
+                log_xi.reshape(len(log_xi), -1), axis=1)[:, np.newaxis, np.newaxis]
+            xi_sum = np.exp(log_xi).sum(axis=0)
+
+            rates = (gamma * trace[:, np.newaxis]).sum(axis=0) / np.maximum(gamma.sum(axis=0), 1e-300)
+            transition_matrix = xi_sum / np.maximum(xi_sum.sum(axis=1, keepdims=True), 1e-300)
+            log_trans = np.log(np.maximum(transition_matrix, 1e-300))
+            log_prior = np.log(np.maximum(gamma[0], 1e-300))
+
+            converged = abs(new_log_likelihood - log_likelihood) < tolerance
+            log_likelihood = new_log_likelihood
+            if converged:
+                break
+        else:
+            self.log.warning('HMM estimation did not converge within {0:d} iterations.'
+                             ''.format(max_iter))
+
+        hmm_dict = dict()
+        hmm_dict['rates'] = rates
+        hmm_dict['transition_matrix'] = transition_matrix
+        hmm_dict['prior'] = np.exp(log_prior)
+        hmm_dict['log_likelihood'] = log_likelihood
+        hmm_dict['iterations'] = iteration
+        hmm_dict['state_probabilities'] = gamma
+        return hmm_dict
+
+    def get_hmm_viterbi_path(self, trace, rates, transition_matrix, prior=None):
+        """ Most likely sequence of hidden states for a poissonian hidden Markov model.
+        @param np.array trace: 1D array of (photon) counts
+        @param np.array rates: 1D array with the mean counts of each state
+        @param np.array transition_matrix: (N, N) transition matrix [from, to]
+        @param np.array prior: optional, initial state probabilities, default is uniform
+        @return np.array: 1D integer array with the state index of every trace point
+        """
+        log_emission = self.get_hmm_log_emission(trace, rates)
+        log_trans = np.log(np.maximum(transition_matrix, 1e-300))
+        num_points, num_states = log_emission.shape
+        if prior is None:
+            prior = np.full(num_states, 1 / num_states)
+
+        # scores of the best paths ending in every state, up to a constant for every point
+        score = np.empty(log_emission.shape)
+        score[0] = np.log(np.maximum(prior, 1e-300)) + log_emission[0]
+        if num_points > 1:
+            matrices = log_trans[np.newaxis, :, :] + log_emission[1:, np.newaxis, :]
+            products = self._hmm_scan(matrices, self._hmm_max_plus_product)
+            score[1:] = (score[0][np.newaxis, :, np.newaxis] + products).max(axis=1)
+
+        # the best predecessor of every state, followed back from the best final state by
+        # composing the backpointers with a reverse scan
+        backpointer = np.empty((num_points, num_states), dtype=int)
+        backpointer[:-1] = np.argmax(score[:-1, :, np.newaxis] + log_trans[np.newaxis, :, :],
+                                     axis=1)
+        backpointer[-1] = np.arange(num_states)
+        backpointer = self._hmm_scan(backpointer, self._hmm_index_composition, reverse=True)
+        return backpointer[:, np.argmax(score[-1])]
+
+    def get_hmm_lifetimes(self, transition_matrix, dt):
+        """ Mean dwell time of every state of a Markov chain.
+        @param np.array transition_matrix: (N, N) transition matrix [from, to]
+        @param float dt: time between two trace points
+        @return np.array: 1D array with the lifetime of every state, in the time unit of dt
+        """
+        leave_prob = 1 - np.diag(transition_matrix)
+        with np.errstate(divide='ignore'):
+            return np.where(leave_prob > 0, dt / leave_prob, np.inf)
+
+    def start_hmm_stream(self, rates, transition_matrix, prior=None):
+        """ Start an incremental forward pass, e.g. for data arriving from SingleShotLogic.
+        @param np.array rates: 1D array with the mean counts of each state
+        @param np.array transition_matrix: (N, N) transition matrix [from, to]
+        @param np.array prior: optional, initial state probabilities, default is uniform
+        """
+        rates = np.asarray(rates, dtype=float)
+        if prior is None:
+            prior = np.full(len(rates), 1 / len(rates))
+        self._hmm_stream = dict()
+        self._hmm_stream['rates'] = rates
+        self._hmm_stream['log_trans'] = np.log(np.maximum(transition_matrix, 1e-300))
+        self._hmm_stream['log_filtered'] = np.log(np.maximum(prior, 1e-300))
+        self._hmm_stream['first_point'] = True
+        self._hmm_stream['log_likelihood'] = 0.
+        self._hmm_stream['num_points'] = 0
+        # expected state occupation and transition counts under the filtered distribution
+        self._hmm_stream['occupation'] = np.zeros(len(rates))
+        self._hmm_stream['transitions'] = np.zeros((len(rates), len(rates)))
+
+    def update_hmm_stream(self, new_data):
+        """ Continue the forward pass with new data without reprocessing the history.
+        @param np.array new_data: 1D array of new (photon) counts
+        @return np.array: (len(new_data), N) filtered state probabilities of the new points
+        """
+        if self._hmm_stream is None:
+            self.log.error('No HMM stream started. Call start_hmm_stream first.')
+            return np.empty((0, 0))
+
+        stream = self._hmm_stream
+        new_data = np.asarray(new_data, dtype=float)
+        if new_data.size == 0:
+            return np.empty((0, len(stream['rates'])))
+
+        log_emission = self.get_hmm_log_emission(new_data, stream['rates'])
+        log_trans = stream['log_trans']
+        prev = stream['log_filtered']
+        # the very first point of the stream uses the prior, all others continue the chain
+        log_filtered, log_norm = self._hmm_forward(log_emission, log_trans, prev,
+                                                   continued=not stream['first_point'])
+        if stream['first_point']:
+            stream['first_point'] = False
+            log_previous = log_filtered[:-1]
+            log_next_emission = log_emission[1:]
+        else:
+            log_previous = np.concatenate((prev[np.newaxis, :], log_filtered[:-1]))
+            log_next_emission = log_emission
+
+        # two-slice filtered distributions give the expected transition counts
+        if len(log_next_emission) > 0:
+            log_xi = (log_previous[:, :, np.newaxis] + log_trans[np.newaxis, :, :]
+                      + log_next_emission[:, np.newaxis, :])
+            log_xi -= np.logaddexp.reduce(
+                log_xi.reshape(len(log_xi), -1), axis=1)[:, np.newaxis, np.newaxis]
+            stream['transitions'] += np.exp(log_xi).sum(axis=0)
+
+        filtered = np.exp(log_filtered)
+        stream['occupation'] += filtered.sum(axis=0)
+        stream['log_filtered'] = log_filtered[-1]
+        stream['log_likelihood'] += log_norm.sum()
+        stream['num_points'] += len(new_data)
+        return filtered
+
+    def get_hmm_stream_lifetimes(self, dt):
+        """ Lifetimes estimated from all data passed to update_hmm_stream so far.
+        @param float dt: time between two trace points
+        @return np.array: 1D array with the lifetime of every state, in the time unit of dt
+        """
+        if self._hmm_stream is None:
+            self.log.error('No HMM stream started. Call start_hmm_stream first.')
+            return np.array([])
+        transitions = self._hmm_stream['transitions']
+        row_sum = transitions.sum(axis=1, keepdims=True)
+        transition_matrix = np.where(row_sum > 0, transitions / np.maximum(row_sum, 1e-300),
+                                     np.eye(len(transitions)))
+        return self.get_hmm_lifetimes(transition_matrix, dt)
+
     def do_gaussian_fit(self, axis, data):
         """ Perform a gaussian fit.
         @param axis:
@@ -738,16 +1395,18 @@ class TraceAnalysisLogic(GenericLogic):
             return hist_fit_x, hist_fit_y, param_dict, result
 
     def do_doublepossonian_fit(self, axis, data):
-        model, params = self._fit_logic.make_multiplepoissonian_model(no_of_functions=2)
+        model, params = self._fit_logic.make_poissoniandouble_model()
         if len(axis) < len(params):
             self.log.warning('Fit could not be performed because number of '
                              'parameters is smaller than data points')
             return self.do_no_fit()
 
         else:
-            result = self._fit_logic.make_doublepoissonian_fit(x_axis=axis,
-                                                               data=data,
-                                                               add_params=None)
+            result = self._fit_logic.make_poissoniandouble_fit(
+                x_axis=axis,
+                data=data,
+                estimator=self._fit_logic.estimate_poissoniandouble,
+                add_params=None)
 
             # 1000 points in x axis for smooth fit data
             hist_fit_x = np.linspace(axis[0], axis[-1], 1000)
@@ -815,7 +1474,7 @@ class TraceAnalysisLogic(GenericLogic):
 
         model, params = self._fit_logic.make_poissonian_model()
 
-        return model.eval(x=np.array(x_val), poissonian_mu=mu, poissonian_amplitude=amplitude)
+        return model.eval(x=np.array(x_val), mu=mu, amplitude=amplitude)
 
     def guess_threshold(self, hist_val=None, trace=None, max_ratio_value=0.1):
         """ Assume a distribution between two values and try to guess the threshold.
@@ -850,13 +1509,15 @@ class TraceAnalysisLogic(GenericLogic):
 
         return guessed_threshold
 
-    def calculate_threshold(self, hist_data=None, distr='poissonian'):
+    def calculate_threshold(self, hist_data=None, distr='poissonian', method='em'):
         """ Calculate the threshold by minimizing its overlap with the poissonian fits.
         @param np.array hist_data: 2D array which represent the x and y values
                                    of a histogram of a trace.
                string distr: tells the function on what distribution it should calculate
                              the threshold ( Added because it might happen that one normalizes data
                              between (-1,1) and then a poissonian distribution won't work anymore.
+               string method: 'em' estimates the two peaks by expectation-maximization and
+                              only fits them if that does not converge, 'fit' always fits them.
         @return tuple(float, float):
                     threshold: the calculated threshold between two overlapping
                                poissonian distributed peaks.
@@ -866,6 +1527,87 @@ class TraceAnalysisLogic(GenericLogic):
         distributions to the count histogram and minimize a threshold with
         respect to the overlap area:
         """
+        if method == 'em' and distr in ('poissonian', 'gaussian_normalized'):
+            thresholds, fidelities, param_dicts = self.calculate_thresholds(
+                hist_data[0], hist_data[1], distr=distr)
+            return thresholds[0], fidelities[0], param_dicts[0]
+        return self._fit_threshold(hist_data, distr)
+
+    def calculate_thresholds(self, bin_edges, counts, distr='poissonian'):
+        """ Calculate the thresholds and readout fidelities of many histograms at once.
+        @param np.array bin_edges: bin edges, 1D for a common binning or 2D with one row
+                                   per histogram
+        @param np.array counts: histogram counts, 1D or 2D with one row per histogram
+        @param str distr: 'poissonian' or 'gaussian_normalized'
+        @return tuple(np.array, np.array, list): thresholds, fidelities and param_dicts
+
+        The two peaks of all histograms are estimated together by
+        expectation-maximization, which takes milliseconds instead of a fit per
+        histogram. Only the histograms where the estimation does not converge are
+        fitted like calculate_threshold(method='fit') does.
+        """
+        counts = np.atleast_2d(np.asarray(counts))
+        edges = np.broadcast_to(np.atleast_2d(np.asarray(bin_edges, dtype=float)),
+                                (counts.shape[0], counts.shape[1] + 1))
+        mixture = estimate_double_mixture(edges, counts, distr=distr)
+        thresholds, fidelities, normalized_fidelities = mixture_threshold(edges, mixture,
+                                                                          distr=distr)
+        valid = (mixture['converged'] & np.isfinite(thresholds) & np.isfinite(fidelities))
+
+        # amplitudes of the peaks like the fit models use them
+        total = counts.sum(axis=1)
+        bin_width = (edges[:, -1] - edges[:, 0]) / counts.shape[1]
+        amplitudes = mixture['weight'] * (total * bin_width)[:, None]
+
+        thresholds = thresholds.astype(float)
+        fidelities = fidelities.astype(float)
+        param_dicts = list()
+        for index in range(len(counts)):
+            if total[index] == 0:
+                self.log.error('Histogram {0} is empty, no threshold can be calculated.'
+                               ''.format(index))
+                thresholds[index], fidelities[index] = np.nan, 0
+                param_dicts.append(dict())
+                continue
+            if not valid[index]:
+                self.log.debug('Expectation-maximization of histogram {0} did not converge, '
+                               'fitting it instead.'.format(index))
+                try:
+                    threshold, fidelity, param_dict = self._fit_threshold(
+                        make_hist_data(edges[index], counts[index]), distr)
+                except Exception:
+                    self.log.exception('Fit of histogram {0} failed.'.format(index))
+                    threshold, fidelity, param_dict = np.nan, 0, dict()
+                thresholds[index] = threshold
+                fidelities[index] = fidelity
+                param_dicts.append(param_dict)
+                continue
+
+            param_dict = OrderedDict()
+            for peak in range(2):
+                if distr == 'poissonian':
+                    param_dict['lambda_{0:d}'.format(peak)] = {
+                        'value': mixture['mean'][index, peak], 'unit': 'Counts/s'}
+                else:
+                    param_dict['sigma_{0:d}'.format(peak)] = {
+                        'value': mixture['sigma'][index, peak], 'unit': 'Counts/s'}
+                    param_dict['Center_{0:d}'.format(peak)] = {
+                        'value': mixture['mean'][index, peak], 'unit': 'Counts/s'}
+                param_dict['Amplitude_{0:d}'.format(peak)] = {
+                    'value': amplitudes[index, peak], 'unit': 'Occurrences'}
+            if distr == 'poissonian':
+                param_dict['normalized_fidelity'] = normalized_fidelities[index]
+            param_dict['em_iterations'] = {'value': mixture['iterations'][index], 'unit': ''}
+            param_dicts.append(param_dict)
+        return thresholds, fidelities, param_dicts
+
+    def _fit_threshold(self, hist_data, distr):
+        """ Calculate the threshold from a double poissonian or double gaussian fit.
+        @param np.array hist_data: 2D array which represent the x and y values
+                                   of a histogram of a trace.
+        @param str distr: 'poissonian' or 'gaussian_normalized'
+        @return tuple(float, float, dict): threshold, fidelity and param_dict
+        """
         # in any case calculate the hist data
         x_axis = hist_data[0][:-1] + (hist_data[0][1] - hist_data[0][0]) / 2.
         y_data = hist_data[1]
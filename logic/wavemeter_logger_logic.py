@@ -34,6 +34,71 @@ from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
 
 
+class GrowingArray:
+
+    """ Table of float rows, appending rows takes amortized constant time.
+
+    The rows are written into a preallocated buffer, which doubles its capacity when it is
+    full. Rows are never modified once written, so arrays returned by data stay valid while
+    another thread appends rows.
+    """
+
+    def __init__(self, columns=None, capacity=1024):
+        """ Create an empty table.
+
+        @param int columns: number of columns, None to take it from the first rows added
+        @param int capacity: number of rows to preallocate
+        """
+        self._lock = Mutex()
+        self._columns = columns
+        self._capacity = capacity
+        self._buffer = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self):
+        """ 2D array of all rows, a view of the buffer without copying. """
+        with self._lock:
+            if self._buffer is None:
+                return np.empty((0, 0 if self._columns is None else self._columns))
+            return self._buffer[:self._size]
+
+    def append(self, row):
+        """ Add a single row.
+
+        @param row: 1D array or list with one value per column
+        """
+        self.extend(np.asarray(row, dtype=float)[np.newaxis])
+
+    def extend(self, rows):
+        """ Add several rows.
+
+        @param rows: 2D array or list of rows
+        """
+        rows = np.asarray(rows, dtype=float)
+        if len(rows) == 0:
+            return
+        with self._lock:
+            if self._buffer is None:
+                self._buffer = np.empty((max(self._capacity, len(rows)), rows.shape[1]))
+            elif self._size + len(rows) > len(self._buffer):
+                buffer = np.empty((max(2 * len(self._buffer), self._size + len(rows)),
+                                   self._buffer.shape[1]))
+                buffer[:self._size] = self._buffer[:self._size]
+                self._buffer = buffer
+            self._buffer[self._size:self._size + len(rows)] = rows
+            self._size += len(rows)
+
+    def clear(self):
+        """ Remove all rows. """
+        with self._lock:
+            self._buffer = None
+            self._size = 0
+
+
 class HardwarePull(QtCore.QObject):
 
     """ Helper class for running the hardware communication in a separate thread. """
@@ -72,7 +137,7 @@ class HardwarePull(QtCore.QObject):
         # only wavelength >200 nm make sense, ignore the rest
         if self._parentclass.current_wavelength > 200:
             self._parentclass._wavelength_data.append(
-                np.array([time_stamp, self._parentclass.current_wavelength])
+                (time_stamp, self._parentclass.current_wavelength)
             )
 
         # check if we have a new min or max and save it if so
@@ -128,8 +193,12 @@ class WavemeterLoggerLogic(GenericLogic):
         self._bins = 200
         self._data_index = 0
 
-        self._recent_wavelength_window = [0, 0]
-        self.counts_with_wavelength = []
+        # (time, wavelength) of the wavemeter
+        self._wavelength_data = GrowingArray(columns=2)
+        # rows of the counter logic data, copied once when they are new
+        self._count_data = GrowingArray()
+        # count rows with the interpolated wavelength inserted as third column
+        self._counts_with_wavelength = GrowingArray()
 
         self._xmin = 650
         self._xmax = 750
@@ -141,7 +210,7 @@ class WavemeterLoggerLogic(GenericLogic):
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
-        self._wavelength_data = []
+        self._wavelength_data.clear()
 
         self.stopRequested = False
 
@@ -218,6 +287,15 @@ class WavemeterLoggerLogic(GenericLogic):
         if len(self.fc.fit_list) > 0:
             self._statusVariables['fits'] = self.fc.save_to_dict()
 
+    @property
+    def counts_with_wavelength(self):
+        """ Counts with interpolated wavelength.
+
+            @return np.array: rows of time, counts and wavelength, followed by the counts of
+                              further counter channels
+        """
+        return self._counts_with_wavelength.data
+
     def get_max_wavelength(self):
         """ Current maximum wavelength of the scan.
 
@@ -298,12 +376,12 @@ class WavemeterLoggerLogic(GenericLogic):
 
         if not resume:
             self._acqusition_start_time = self._counter_logic._saving_start_time
-            self._wavelength_data = []
+            self._wavelength_data.clear()
 
-            self.data_index = 0
+            self._data_index = 0
 
-            self._recent_wavelength_window = [0, 0]
-            self.counts_with_wavelength = []
+            self._count_data.clear()
+            self._counts_with_wavelength.clear()
 
             self.rawhisto = np.zeros(self._bins)
             self.sumhisto = np.ones(self._bins) * 1.0e-10
@@ -343,48 +421,43 @@ class WavemeterLoggerLogic(GenericLogic):
         Recent count values are those recorded AFTER the previous stitch operation, but BEFORE the
         most recent wavelength value (do not extrapolate beyond the current wavelength
         information).
+
+        All recent counts are stitched at once and only the new rows of the counter data are
+        converted to an array, so a loop takes the same time during hours of scanning.
         """
 
         # If there is not yet any wavelength data, then wait and signal next loop
         if len(self._wavelength_data) == 0:
             time.sleep(self._logic_update_timing * 1e-3)
             self.sig_data_updated.emit()
+            if self.module_state() == 'running':
+                self.sig_update_histogram_next.emit(False)
             return
 
-        # The end of the recent_wavelength_window is the time of the latest wavelength data
-        self._recent_wavelength_window[1] = self._wavelength_data[-1][0]
-
-        # (speed-up) We only need to worry about "recent" counts, because as the count data gets
-        # very long all the earlier points will already be attached to wavelength values.
-        count_recentness = 100  # TODO: calculate this from count_freq and wavemeter refresh rate
-
-        # TODO: Does this depend on things, or do we loop fast enough to get every wavelength value?
-        wavelength_recentness = np.min([5, len(self._wavelength_data)])
-
-        recent_counts = np.array(self._counter_logic._data_to_save[-count_recentness:])
-        recent_wavelengths = np.array(self._wavelength_data[-wavelength_recentness:])
-
-        # The latest counts are those recorded during the recent_wavelength_window
-        count_idx = [0, 0]
-        count_idx[0] = np.searchsorted(recent_counts[:, 0], self._recent_wavelength_window[0])
-        count_idx[1] = np.searchsorted(recent_counts[:, 0], self._recent_wavelength_window[1])
-
-        latest_counts = recent_counts[count_idx[0]:count_idx[1]]
-
-        # Interpolate to obtain wavelength values at the times of each count
-        interpolated_wavelengths = np.interp(latest_counts[:, 0],
-                                             xp=recent_wavelengths[:, 0],
-                                             fp=recent_wavelengths[:, 1]
-                                             )
-
-        # Stitch interpolated wavelength into latest counts array
-        latest_stitched_data = np.insert(latest_counts, 2, values=interpolated_wavelengths, axis=1)
-
-        # Add this latest data to the list of counts vs wavelength
-        self.counts_with_wavelength += latest_stitched_data.tolist()
-
-        # The start of the recent data window for the next round will be the end of this one.
-        self._recent_wavelength_window[0] = self._recent_wavelength_window[1]
+        self._update_count_data()
+        counts = self._count_data.data
+        wavelengths = self._wavelength_data.data
+
+        # The latest counts are those recorded before the latest wavelength data, every count
+        # before them has been stitched already.
+        count_start = len(self._counts_with_wavelength)
+        count_stop = max(np.searchsorted(counts[:, 0], wavelengths[-1, 0]), count_start) \
+            if len(counts) > 0 else count_start
+        latest_counts = counts[count_start:count_stop]
+
+        if len(latest_counts) > 0:
+            # Interpolate to obtain wavelength values at the times of each count, only the
+            # wavelength data around the latest counts is needed
+            wavelength_start = max(np.searchsorted(wavelengths[:, 0], latest_counts[0, 0]) - 1, 0)
+            interpolated_wavelengths = np.interp(latest_counts[:, 0],
+                                                 xp=wavelengths[wavelength_start:, 0],
+                                                 fp=wavelengths[wavelength_start:, 1]
+                                                 )
+
+            # Stitch interpolated wavelength into latest counts array and add it to the
+            # counts vs wavelength
+            self._counts_with_wavelength.extend(
+                np.insert(latest_counts, 2, values=interpolated_wavelengths, axis=1))
 
         # Run the old update histogram method to keep duplicate data
         self._update_histogram(complete_histogram)
@@ -398,73 +471,79 @@ class WavemeterLoggerLogic(GenericLogic):
         if self.module_state() == 'running':
             self.sig_update_histogram_next.emit(False)
 
+    def _update_count_data(self):
+        """ Copy the rows of the counter logic data, which are new since the last call. """
+        data_to_save = self._counter_logic._data_to_save
+        if len(data_to_save) < len(self._count_data):
+            # the counter logic started a new data stream
+            self._count_data.clear()
+        self._count_data.extend(data_to_save[len(self._count_data):])
+
     def _update_histogram(self, complete_histogram):
         """ Calculate new points for the histogram.
 
         @param bool complete_histogram: should the complete histogram be recalculated, or just the
                                         most recent data?
         @return:
+
+        All new wavelength values are binned at once.
         """
 
         # If things like num_of_bins have changed, then recalculate the complete histogram
         # Note: The histogram may be recalculated (bins changed, etc) from the stitched data.
         # There is no need to recompute the interpolation for the stitched data.
+        counts = self._count_data.data
         if complete_histogram:
-            count_window = len(self._counter_logic._data_to_save)
             self._data_index = 0
             self.log.info('Recalcutating Laser Scanning Histogram for: '
                           '{0:d} counts and {1:d} wavelength.'.format(
-                              count_window,
+                              len(counts),
                               len(self._wavelength_data)
                           )
                           )
-        else:
-            count_window = min(100, len(self._counter_logic._data_to_save))
 
-        if count_window < 2:
-            time.sleep(self._logic_update_timing * 1e-3)
-            self.sig_update_histogram_next.emit(False)
+        # only do something if there is count and wavelength data to work with
+        if len(counts) < 2:
+            return
+        wavelengths = self._wavelength_data.data[self._data_index:]
+        self._data_index += len(wavelengths)
+        if len(wavelengths) == 0:
             return
 
-        temp = np.array(self._counter_logic._data_to_save[-count_window:])
-
-        # only do something if there is wavelength data to work with
-        if len(self._wavelength_data) > 0:
-
-            for i in self._wavelength_data[self._data_index:]:
-                self._data_index += 1
-
-                if i[1] < self._xmin or i[1] > self._xmax:
-                    continue
-
-                # calculate the bin the new wavelength needs to go in
-                newbin = np.digitize([i[1]], self.histogram_axis)[0]
-                # if the bin make no sense, start from the beginning
-                if newbin > len(self.rawhisto) - 1:
-                    continue
-
-                # sum the counts in rawhisto and count the occurence of the bin in sumhisto
-                interpolation = np.interp(i[0], xp=temp[:, 0], fp=temp[:, 1])
-                self.rawhisto[newbin] += interpolation
-                self.sumhisto[newbin] += 1.0
-
-                self.envelope_histogram[newbin] = np.max([interpolation,
-                                                          self.envelope_histogram[newbin]
-                                                          ])
+        # calculate the bins the new wavelengths need to go in, ignore those out of range
+        newbins = np.digitize(wavelengths[:, 1], self.histogram_axis)
+        valid = ((wavelengths[:, 1] >= self._xmin) & (wavelengths[:, 1] <= self._xmax)
+                 & (newbins <= len(self.rawhisto) - 1))
+        wavelengths = wavelengths[valid]
+        newbins = newbins[valid]
+        if len(wavelengths) == 0:
+            return
 
-                datapoint = [i[1], i[0], interpolation]
-                if time.time() - self.last_point_time > 1:
-                    self.sig_new_data_point.emit(self.recent_avg)
-                    self.last_point_time = time.time()
-                    self.recent_count = 0
-                else:
-                    self.recent_count += 1
-                    for j in range(3):
-                        self.recent_avg[j] -= self.recent_avg[j] / self.recent_count
-                        self.recent_avg[j] += datapoint[j] / self.recent_count
+        # interpolate the counts at the times of the wavelengths from the counts around them
+        count_start = max(np.searchsorted(counts[:, 0], wavelengths[0, 0]) - 1, 0)
+        count_stop = np.searchsorted(counts[:, 0], wavelengths[-1, 0], side='right') + 1
+        interpolation = np.interp(wavelengths[:, 0],
+                                  xp=counts[count_start:count_stop, 0],
+                                  fp=counts[count_start:count_stop, 1])
+
+        # sum the counts in rawhisto and count the occurence of the bin in sumhisto
+        np.add.at(self.rawhisto, newbins, interpolation)
+        np.add.at(self.sumhisto, newbins, 1.0)
+        np.maximum.at(self.envelope_histogram, newbins, interpolation)
+
+        # the average of wavelength, time and counts is emitted once per second
+        if time.time() - self.last_point_time > 1:
+            self.sig_new_data_point.emit(self.recent_avg)
+            self.last_point_time = time.time()
+            self.recent_count = 0
+        datapoints = np.column_stack((wavelengths[:, 1], wavelengths[:, 0], interpolation))
+        total_count = self.recent_count + len(datapoints)
+        self.recent_avg = ((np.array(self.recent_avg) * self.recent_count
+                            + datapoints.sum(axis=0)) / total_count).tolist()
+        self.recent_count = total_count
 
-            # the plot data is the summed counts divided by the occurence of the respective bins
-            self.histogram = self.rawhisto / self.sumhisto
+        # the plot data is the summed counts divided by the occurence of the respective bins
+        self.histogram = self.rawhisto / self.sumhisto
 
     def save_data(self, timestamp=None):
         """ Save the counter trace data and writes it to a file.
@@ -514,7 +593,7 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        data['Time (s), Wavelength (nm)'] = self._wavelength_data
+        data['Time (s), Wavelength (nm)'] = self._wavelength_data.data
         # write the parameters:
         parameters = OrderedDict()
         parameters['Acquisition Timing (ms)'] = self._logic_acquisition_timing
@@ -560,7 +639,7 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        data['Measurement Time (s), Signal (counts/s), Interpolated Wavelength (nm)'] = np.array(self.counts_with_wavelength)
+        data['Measurement Time (s), Signal (counts/s), Interpolated Wavelength (nm)'] = self.counts_with_wavelength
 
         fig = self.draw_figure()
         # write the parameters:
@@ -589,8 +668,8 @@ class WavemeterLoggerLogic(GenericLogic):
         """
         # TODO: Draw plot for second APD if it is connected
 
-        wavelength_data = [entry[2] for entry in self.counts_with_wavelength]
-        count_data = np.array([entry[1] for entry in self.counts_with_wavelength])
+        wavelength_data = self.counts_with_wavelength[:, 2]
+        count_data = self.counts_with_wavelength[:, 1]
 
         # Index of max counts, to use to position "0" of frequency-shift axis
         count_max_index = count_data.argmax()
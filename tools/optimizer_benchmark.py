@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the optimizer sequences on the confocal scanner dummy.
+
+Places isolated emitters in the scanner dummy, starts every refocus at a random offset from
+an emitter and compares the number of scanned pixels and the distance of the found optimum
+to the true emitter position for the raster refocus and the adaptive line scan refocus.
+Run from the qudi directory: python tools/optimizer_benchmark.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+from qtpy import QtCore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hardware.confocal_scanner_dummy import ConfocalScannerDummy
+from logic.fit_logic import FitLogic
+from logic.optimizer_logic import OptimizerLogic
+
+
+def place_emitters(scanner, number, seed=0):
+    """ Put bright, well separated emitters on a grid in the middle of the scan range. """
+    rng = np.random.RandomState(seed)
+    grid = int(np.ceil(np.sqrt(number)))
+    xy = 20e-6 + 8e-6 * np.array([(i % grid, i // grid) for i in range(number)], dtype=float)
+    scanner._num_points = number
+    scanner._points = np.zeros((number, 7))
+    scanner._points[:, 0] = 4e5
+    scanner._points[:, 1:3] = xy + rng.uniform(-1e-6, 1e-6, (number, 2))
+    scanner._points[:, 3:5] = 0.35e-6
+    scanner._points_z = np.zeros((number, 4))
+    scanner._points_z[:, 0] = 1
+    scanner._points_z[:, 1] = rng.uniform(48e-6, 52e-6, number)
+    scanner._points_z[:, 2] = 0.7e-6
+    scanner._build_emitter_index()
+    return np.column_stack((scanner._points[:, 1:3], scanner._points_z[:, 1]))
+
+
+def refocus(app, optimizer, initial_pos):
+    """ Run a single refocus in the event loop and return the optimum it found. """
+    result = list()
+
+    def finished(tag, pos):
+        result.extend(pos[:3])
+        app.quit()
+
+    optimizer.sigRefocusFinished.connect(finished)
+    optimizer.start_refocus(initial_pos=list(initial_pos), caller_tag='benchmark')
+    app.exec_()
+    optimizer.sigRefocusFinished.disconnect(finished)
+    return np.array(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--emitters', type=int, default=25, help='number of emitters')
+    parser.add_argument('--offset', type=float, default=0.15e-6,
+                        help='standard deviation of the start offset per axis in m')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random start offsets')
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+    fit_logic = FitLogic(manager=None, name='fitlogic')
+    scanner = ConfocalScannerDummy(
+        manager=None, name='scanner', config={'clock_frequency': 1000, 'simulate_timing': False})
+    scanner.connectors['fitlogic'].connect(fit_logic)
+    scanner.module_state.activate()
+    optimizer = OptimizerLogic(manager=None, name='optimizer', config=dict())
+    optimizer.connectors['confocalscanner1'].connect(scanner)
+    optimizer.connectors['fitlogic'].connect(fit_logic)
+    optimizer.module_state.activate()
+    optimizer.hw_settle_time = 0
+
+    emitters = place_emitters(scanner, args.emitters)
+    rng = np.random.RandomState(args.seed)
+    starts = emitters + rng.normal(0, args.offset, emitters.shape)
+
+    print('{0} emitters, start offset {1:.2g} m per axis'.format(args.emitters, args.offset))
+    print('{0:>16} {1:>10} {2:>14} {3:>14}'.format(
+        'sequence', 'pixels', 'xy error (m)', 'z error (m)'))
+    for sequence in (['XY', 'Z'], ['ADAPTIVE']):
+        optimizer.optimization_sequence = sequence
+        pixels = list()
+        errors = list()
+        for emitter, start in zip(emitters, starts):
+            optimum = refocus(app, optimizer, start)
+            pixels.append(optimizer.scanned_pixels)
+            errors.append(np.abs(optimum - emitter))
+        errors = np.array(errors)
+        print('{0:>16} {1:10.0f} {2:14.3g} {3:14.3g}'.format(
+            '+'.join(sequence),
+            np.mean(pixels),
+            np.median(np.linalg.norm(errors[:, :2], axis=1)),
+            np.median(errors[:, 2])))
+
+    optimizer.module_state.deactivate()
+    scanner.module_state.deactivate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Stress test of the published data snapshots of GenericLogic.
+
+One writer thread publishes arrays filled with their version number as fast as possible while
+several reader threads take snapshots, check that every snapshot is read-only and consistent
+over its whole duration and hand it back. The number of publish buffers has to stay bounded.
+Run from the qudi directory: python tools/publish_data_stress_test.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic.generic_logic import GenericLogic
+
+
+class PublishingLogic(GenericLogic):
+    """ Minimal logic module publishing test data. """
+
+    def on_activate(self):
+        pass
+
+    def on_deactivate(self):
+        pass
+
+
+def writer(logic, args, stop, stats):
+    """ Publish arrays filled with their version until stop is set. """
+    shape = (args.rows, args.columns)
+    while not stop.is_set():
+        version = logic.get_published_version('data') + 1
+        copy = (version % args.copy_ratio) != 0
+        data = np.full(shape, version, dtype='int64')
+        if logic.publish_data('data', data, copy=copy) != version:
+            stats['errors'].append('version {0} not published in order'.format(version))
+        if copy:
+            # data published with copy may be modified at once
+            data[...] = -1
+        stats['buffers'] = max(stats['buffers'], len(logic._publish_buffers.get('data', [])))
+        stats['published'] += 1
+
+
+def reader(logic, args, stop, stats):
+    """ Take snapshots, check them while holding them and hand them back. """
+    last_version = None
+    while not stop.is_set():
+        version, data = logic.get_published_data('data', last_version)
+        if data is None:
+            continue
+        try:
+            if data.flags.writeable:
+                stats['errors'].append('snapshot {0} is writeable'.format(version))
+            for _ in range(args.checks):
+                if data[0, 0] != version or np.any(data != version):
+                    stats['errors'].append('snapshot {0} changed'.format(version))
+                    break
+                time.sleep(0)
+        finally:
+            logic.release_published_data('data', version)
+        last_version = version
+        stats['read'] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--readers', type=int, default=4, help='number of reader threads')
+    parser.add_argument('--duration', type=float, default=5, help='duration of the test in s')
+    parser.add_argument('--rows', type=int, default=64, help='rows of the published array')
+    parser.add_argument('--columns', type=int, default=1000,
+                        help='columns of the published array')
+    parser.add_argument('--checks', type=int, default=5,
+                        help='number of times a reader checks a snapshot before releasing it')
+    parser.add_argument('--copy-ratio', type=int, default=10,
+                        help='every n-th update hands over the array instead of copying it')
+    args = parser.parse_args()
+
+    logic = PublishingLogic(manager=None, name='publisher', config=dict())
+    stop = threading.Event()
+    writer_stats = {'published': 0, 'buffers': 0, 'errors': list()}
+    reader_stats = [{'read': 0, 'errors': list()} for _ in range(args.readers)]
+    threads = [threading.Thread(target=writer, args=(logic, args, stop, writer_stats))]
+    threads.extend(threading.Thread(target=reader, args=(logic, args, stop, stats))
+                   for stats in reader_stats)
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    errors = writer_stats['errors'] + [err for stats in reader_stats for err in stats['errors']]
+    held = sum(entry[2] for entry in logic._publish_buffers.get('data', []))
+    print('{0} updates published, {1} snapshots read by {2} readers'.format(
+        writer_stats['published'], sum(stats['read'] for stats in reader_stats), args.readers))
+    print('at most {0} publish buffers, {1} snapshots not released'.format(
+        writer_stats['buffers'], held))
+    if writer_stats['buffers'] > 2:
+        errors.append('more than two publish buffers')
+    if held != 0:
+        errors.append('snapshots left after all readers released theirs')
+    for err in errors[:20]:
+        print('ERROR:', err)
+    print('FAILED' if errors else 'OK')
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
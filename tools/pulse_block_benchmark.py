@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of building, comparing and pickling large PulseBlocks.
+
+Builds an XY8-N block element by element, as the predefined methods do, and measures the
+time of the common operations on it together with the memory the block occupies.
+Run from the qudi directory: python tools/pulse_block_benchmark.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import copy
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+qudi_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, qudi_dir)
+
+from logic.pulsed.pulse_objects import PulseBlockElement, PulseBlock
+from logic.pulsed.sampling_functions import SamplingFunctions
+
+SamplingFunctions.import_sampling_functions(
+    [os.path.join(qudi_dir, 'logic', 'pulsed', 'sampling_function_defs')])
+
+
+def xy8_block(xy8_order, tau=1e-6, pi_length=50e-9):
+    """ Build an XY8-N block with fresh elements, like a predefined method would. """
+    block = PulseBlock('xy8')
+    digital_high = {'d_ch1': False, 'd_ch2': False}
+    for _ in range(xy8_order):
+        for phase in (0, 90, 0, 90, 90, 0, 90, 0):
+            block.append(PulseBlockElement(
+                init_length_s=tau / 2,
+                pulse_function={'a_ch1': SamplingFunctions.Idle()},
+                digital_high=digital_high))
+            block.append(PulseBlockElement(
+                init_length_s=pi_length,
+                pulse_function={'a_ch1': SamplingFunctions.Sin(
+                    amplitude=0.25, frequency=2.87e9, phase=phase)},
+                digital_high=digital_high))
+            block.append(PulseBlockElement(
+                init_length_s=tau / 2,
+                pulse_function={'a_ch1': SamplingFunctions.Idle()},
+                digital_high=digital_high))
+    return block
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--order', type=int, default=1000, help='XY8 order N')
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    block, build_time = timed(lambda: xy8_block(args.order))
+    block_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    other = xy8_block(args.order)
+    _, compare_time = timed(lambda: block == other)
+    pickled, dump_time = timed(lambda: pickle.dumps(block))
+    _, load_time = timed(lambda: pickle.loads(pickled))
+    _, copy_time = timed(lambda: copy.deepcopy(block))
+    _, length_time = timed(lambda: (block.init_length_s, block.increment_s))
+
+    print('XY8-{0}: {1} elements'.format(args.order, len(block)))
+    print('build:       {0:8.1f} ms'.format(build_time * 1e3))
+    print('memory:      {0:8.1f} MB'.format(block_memory / 2**20))
+    print('compare:     {0:8.1f} ms'.format(compare_time * 1e3))
+    print('pickle:      {0:8.1f} ms, {1:.1f} MB'.format(dump_time * 1e3, len(pickled) / 2**20))
+    print('unpickle:    {0:8.1f} ms'.format(load_time * 1e3))
+    print('deepcopy:    {0:8.1f} ms'.format(copy_time * 1e3))
+    print('block length:{0:8.1f} ms'.format(length_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
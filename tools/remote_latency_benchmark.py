@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Latency benchmark of blocking and asynchronous remote module calls.
+
+Starts qudi remote module servers on the loopback interface, each sharing a dummy device,
+and polls all devices once per tick, either one blocking call after the other or with
+netasync. Run from the qudi directory: python tools/remote_latency_benchmark.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rpyc.utils.server import ThreadedServer
+from core.remote import RemoteObjectManager, RemoteConnectionPool, RemoteModule
+from core.util.network import netasync
+
+
+class DummyDevice:
+    """ Device answering after a fixed processing time. """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def get_value(self):
+        time.sleep(self.delay)
+        return 1.
+
+
+def start_server(port, delay):
+    manager = SimpleNamespace(
+        sharedModules=SimpleNamespace(storage={'device': DummyDevice(delay)}),
+        manager=None)
+    server = ThreadedServer(
+        RemoteObjectManager.makeRemoteService(manager),
+        hostname='localhost',
+        port=port,
+        protocol_config={'allow_all_attrs': True})
+    threading.Thread(target=server.start, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--devices', type=int, default=3, help='number of remote devices')
+    parser.add_argument('--ticks', type=int, default=200, help='number of polling ticks')
+    parser.add_argument('--delay', type=float, default=0.002,
+                        help='processing time of a device call in s')
+    parser.add_argument('--port', type=int, default=18900, help='port of the first server')
+    args = parser.parse_args()
+
+    servers = [start_server(args.port + i, args.delay) for i in range(args.devices)]
+    time.sleep(0.5)
+    pool = RemoteConnectionPool()
+    devices = [RemoteModule(pool, 'localhost', args.port + i, 'device').module
+               for i in range(args.devices)]
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        [device.get_value() for device in devices]
+    blocking = (time.perf_counter() - start) / args.ticks
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        futures = [netasync(device.get_value) for device in devices]
+        [future.result() for future in futures]
+    asynchronous = (time.perf_counter() - start) / args.ticks
+
+    print('{0} devices, {1} s processing time per call'.format(args.devices, args.delay))
+    print('blocking calls:     {0:.2f} ms per tick'.format(blocking * 1e3))
+    print('asynchronous calls: {0:.2f} ms per tick'.format(asynchronous * 1e3))
+
+    pool.close()
+    for server in servers:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the time per scan line of the confocal and fiber scanning logic.
+
+Scans xy images with the confocal scanner dummy (without simulated timing) line by line and
+with frame scanning. Prints the time per line and, for line by line scans, the time per line
+spent in the logic, i.e. without the time spent in the scanner. Run it on two revisions to
+compare their scan engines.
+Run from the qudi directory: python tools/scan_line_benchmark.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from qtpy import QtCore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hardware.confocal_scanner_dummy import ConfocalScannerDummy
+from logic import confocal_logic
+from logic import fiber_scanning_logic
+from logic.fit_logic import FitLogic
+from logic.save_logic import SaveLogic
+
+
+def time_scan_lines(scanner):
+    """ Sum up the time spent in scan_line of the scanner in scanner.scanner_time.
+
+    A frame scan runs in a thread of the scanner, so its time is not separated.
+    """
+    scan_line = scanner.scan_line
+    scanner.scanner_time = 0.
+
+    def timed_scan_line(line_path=None, pixel_clock=False):
+        start = time.perf_counter()
+        try:
+            return scan_line(line_path, pixel_clock)
+        finally:
+            scanner.scanner_time += time.perf_counter() - start
+
+    scanner.scan_line = timed_scan_line
+
+
+def scan_image(app, logic):
+    """ Scan a single xy image in the event loop and return the time it took. """
+
+    def updated():
+        if logic.module_state() != 'locked':
+            app.quit()
+
+    logic.signal_xy_image_updated.connect(updated)
+    start = time.perf_counter()
+    logic.start_scanning()
+    app.exec_()
+    duration = time.perf_counter() - start
+    logic.signal_xy_image_updated.disconnect(updated)
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--resolution', type=int, default=100,
+                        help='number of pixels per line and of lines of the image')
+    parser.add_argument('--repetitions', type=int, default=5,
+                        help='number of images scanned per setting')
+    parser.add_argument('--emitters', type=int, default=500,
+                        help='number of emitters of the scanner dummy')
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+    fit_logic = FitLogic(manager=None, name='fitlogic')
+    save_logic = SaveLogic(manager=None, name='savelogic', config=dict())
+    scanner = ConfocalScannerDummy(
+        manager=None,
+        name='scanner',
+        config={'clock_frequency': 1000,
+                'simulate_timing': False,
+                'number_of_emitters': args.emitters})
+    scanner.connectors['fitlogic'].connect(fit_logic)
+    scanner.module_state.activate()
+    time_scan_lines(scanner)
+
+    print('{0}x{0} pixels, {1} images per setting'.format(args.resolution, args.repetitions))
+    print('{0:>22} {1:>14} {2:>18} {3:>18}'.format(
+        'logic', 'mode', 'line time (ms)', 'logic time (ms)'))
+    for name, module in (('confocal_logic', confocal_logic),
+                         ('fiber_scanning_logic', fiber_scanning_logic)):
+        logic = module.ConfocalLogic(manager=None, name='scannerlogic', config=dict())
+        logic.connectors['confocalscanner1'].connect(scanner)
+        logic.connectors['savelogic'].connect(save_logic)
+        logic.module_state.activate()
+        logic._fiber_scan = False
+        logic.xy_resolution = args.resolution
+        logic.max_history_length = 2
+
+        modes = ['line', 'frame'] if hasattr(logic, 'frame_scanning') else ['line']
+        for mode in modes:
+            if hasattr(logic, 'frame_scanning'):
+                logic.frame_scanning = mode == 'frame'
+            # the first image only warms up the caches
+            scan_image(app, logic)
+            line_times = list()
+            logic_times = list()
+            for _ in range(args.repetitions):
+                scanner.scanner_time = 0.
+                duration = scan_image(app, logic)
+                line_times.append(duration / args.resolution)
+                logic_times.append((duration - scanner.scanner_time) / args.resolution)
+            logic_time = '-' if mode == 'frame' \
+                else '{0:.3f}'.format(1e3 * np.median(logic_times))
+            print('{0:>22} {1:>14} {2:18.3f} {3:>18}'.format(
+                name, mode, 1e3 * np.median(line_times), logic_time))
+        logic.module_state.deactivate()
+
+    scanner.module_state.deactivate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the threshold estimation of single shot readout histograms.
+
+Simulates count traces of two overlapping peaks, histograms them like TraceAnalysisLogic
+does and compares the expectation-maximization estimate of all histograms at once with the
+double poissonian or double gaussian fit of every histogram.
+Run from the qudi directory: python tools/threshold_benchmark.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic.fit_logic import FitLogic
+from logic.trace_analysis_logic import TraceAnalysisLogic
+
+
+def histograms(distr, number, points, seed=0):
+    """ Histograms of traces with a dark and a bright peak, bins like calculate_histogram. """
+    rng = np.random.RandomState(seed)
+    dark = int(points * 0.6)
+    if distr == 'poissonian':
+        traces = [np.concatenate([rng.poisson(5, dark), rng.poisson(20, points - dark)])
+                  for _ in range(number)]
+        # common integer bins for all traces
+        maximum = max(trace.max() for trace in traces)
+        edges = np.arange(maximum + 2) - 0.5
+        counts = np.array([np.bincount(trace, minlength=maximum + 1) for trace in traces])
+    else:
+        traces = [np.clip(np.concatenate([rng.normal(-0.4, 0.15, dark),
+                                          rng.normal(0.3, 0.15, points - dark)]), -1, 1)
+                  for _ in range(number)]
+        hists = [np.histogram(trace, 50) for trace in traces]
+        edges = np.array([hist[1] for hist in hists])
+        counts = np.array([hist[0] for hist in hists])
+    return np.broadcast_to(edges, (number, counts.shape[1] + 1)), counts
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--distr', default='poissonian',
+                        choices=('poissonian', 'gaussian_normalized'))
+    parser.add_argument('--histograms', type=int, default=200, help='number of histograms')
+    parser.add_argument('--points', type=int, default=5000, help='points per trace')
+    parser.add_argument('--fits', type=int, default=20,
+                        help='number of histograms to fit, the fit time is extrapolated')
+    args = parser.parse_args()
+
+    fit_logic = FitLogic(manager=None, name='fitlogic')
+    logic = TraceAnalysisLogic(manager=None, name='traceanalysis', config=dict())
+    logic._fit_logic = fit_logic
+    edges, counts = histograms(args.distr, args.histograms, args.points)
+
+    (em_thresholds, _, _), em_time = timed(
+        lambda: logic.calculate_thresholds(edges, counts, distr=args.distr))
+    _, single_time = timed(lambda: [
+        logic.calculate_threshold([edges[i], counts[i]], distr=args.distr)
+        for i in range(args.histograms)])
+    fits = min(args.fits, args.histograms)
+    fit_results, fit_time = timed(lambda: [
+        logic.calculate_threshold([edges[i], counts[i]], distr=args.distr, method='fit')
+        for i in range(fits)])
+    fit_thresholds = np.array([result[0] for result in fit_results], dtype=float)
+
+    print('{0} {1} histograms, {2} points each'.format(
+        args.histograms, args.distr, args.points))
+    print('EM, all at once:  {0:8.1f} ms'.format(em_time * 1e3))
+    print('EM, one by one:   {0:8.1f} ms'.format(single_time * 1e3))
+    print('fit, one by one:  {0:8.1f} ms (extrapolated from {1} fits)'.format(
+        fit_time / fits * args.histograms * 1e3, fits))
+    print('threshold difference EM - fit: {0:.3g} (median), {1:.3g} (max)'.format(
+        np.nanmedian(np.abs(em_thresholds[:fits] - fit_thresholds)),
+        np.nanmax(np.abs(em_thresholds[:fits] - fit_thresholds))))
+
+
+if __name__ == '__main__':
+    main()